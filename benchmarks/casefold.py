@@ -0,0 +1,67 @@
+# lines/sec through line dispatch and a few casefolding matchers in a 50k
+# member channel, with Server's casefold cache and with plain casefolding
+import random
+from time      import perf_counter
+from irctokens import tokenise
+from ircstates.casemap  import casefold
+from ircrobots.bot      import Bot
+from ircrobots.server   import Server
+from ircrobots.params   import ConnectionParams
+from ircrobots.matching import (Response, CompiledResponses, ANY, SELF,
+    Folded, Nick)
+
+MEMBERS  = 50000
+SPEAKERS = 2000 # most of the talking is done by a few members
+LINES    = 100000
+
+class UncachedServer(Server):
+    def casefold(self, s1: str) -> str:
+        return casefold(self.isupport.casemapping, s1)
+
+def _lines():
+    nicks = [f"User{i}[away]" for i in range(MEMBERS)]
+    setup = [":srv 001 bot :hi", ":bot!u@h JOIN #Big"]
+    for i in range(0, MEMBERS, 40):
+        setup.append(f":srv 353 bot = #Big :{' '.join(nicks[i:i+40])}")
+    setup.append(":srv 366 bot #Big :end")
+
+    lines = []
+    for _ in range(LINES):
+        nick = nicks[int(random.paretovariate(1.2)*SPEAKERS/10) % SPEAKERS]
+        lines.append(random.choice([
+            f":{nick}!u@h PRIVMSG #Big :hello there",
+            f":{nick}!u@h PRIVMSG Bot :hi bot",
+            f":{nick}!u@h NOTICE #big :hello"]))
+    return ([tokenise(line) for line in setup],
+        [tokenise(line) for line in lines])
+
+def _bench(server_type, setup, lines):
+    server = server_type(Bot(), "bench")
+    server.params = ConnectionParams("bot", "localhost", 6667)
+    for line in setup:
+        server._dispatch_line(line)
+
+    matchers = CompiledResponses(
+        Response("PRIVMSG", [Folded("#big"), ANY], source=Nick("User1[away]")),
+        Response("PRIVMSG", [SELF, ANY]),
+        Response("NOTICE",  [Folded("#BIG"), ANY]))
+
+    start = perf_counter()
+    for line in lines:
+        server._dispatch_line(line)
+        matchers.match(server, line)
+        while not server._process_queue.empty():
+            server._process_queue.get_nowait()
+    elapsed = perf_counter()-start
+    return elapsed, server
+
+def main():
+    setup, lines = _lines()
+    for server_type in [UncachedServer, Server]:
+        elapsed, server = _bench(server_type, setup, lines)
+        rate = f"{server.casefold_hit_rate()*100:.1f}% hits" if (
+            server_type is Server) else ""
+        print(f"{server_type.__name__:14} {LINES/elapsed:8.0f} lines/s {rate}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# tokens()/strip() against the old pop(0)/replace() versions, and spans(),
+# on long relayed lines that are coloured a word at a time
+import random
+from time   import perf_counter
+from typing import List
+from ircrobots import formatting
+from ircrobots.formatting import COLOR, FORMATTERS, BOLD, RESET
+
+LINES = 200
+WORDS = 400
+
+def _tokens_old(s: str) -> List[str]:
+    tokens: List[str] = []
+
+    s_copy = list(s)
+    while s_copy:
+        token = s_copy.pop(0)
+        if token == COLOR:
+            for i in range(2):
+                if s_copy and s_copy[0].isdigit():
+                    token += s_copy.pop(0)
+            if (len(s_copy) > 1 and
+                    s_copy[0] == "," and
+                    s_copy[1].isdigit()):
+                token += s_copy.pop(0)
+                token += s_copy.pop(0)
+                if s_copy and s_copy[0].isdigit():
+                    token += s_copy.pop(0)
+
+            tokens.append(token)
+        elif token in FORMATTERS:
+            tokens.append(token)
+    return tokens
+
+def _strip_old(s: str) -> str:
+    for token in _tokens_old(s):
+        s = s.replace(token, "", 1)
+    return s
+
+def _lines() -> List[str]:
+    lines = []
+    for _ in range(LINES):
+        words = []
+        for i in range(WORDS):
+            colour = f"{COLOR}{random.randrange(16):02},{random.randrange(16)}"
+            word   = random.choice(["relay", "hello", "ok", "what", "ü"])
+            words.append(colour+(BOLD if i % 3 == 0 else "")+word+RESET)
+        lines.append(" ".join(words))
+    return lines
+
+def _time(name: str, func, lines: List[str]):
+    start = perf_counter()
+    for line in lines:
+        func(line)
+    elapsed = perf_counter()-start
+    print(f"{name:12} {elapsed/len(lines)*1e6:10.1f}us/line")
+
+def main():
+    lines = _lines()
+    print(f"{len(lines[0])} characters, "
+        f"{len(formatting.tokens(lines[0]))} codes per line")
+    assert all(formatting.strip(l) == _strip_old(l) for l in lines)
+    _time("tokens (old)", _tokens_old,        lines)
+    _time("tokens",       formatting.tokens,  lines)
+    _time("strip (old)",  _strip_old,         lines)
+    _time("strip",        formatting.strip,   lines)
+    _time("spans",        formatting.spans,   lines)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# glob matches/sec against the old character-at-a-time matcher, with ban
+# style patterns over hostmasks. then hostmasks/sec against a ban list of
+# thousands of masks, trying each glob in turn against a GlobSet
+import random
+from time import perf_counter
+from ircrobots import glob
+
+PATTERNS = 200
+MASKS    = 2000
+BANS     = 5000
+
+def _match_old(pattern: str, s: str):
+    i, j = 0, 0
+
+    i_backup = -1
+    j_backup = -1
+    while j < len(s):
+        p = (pattern[i:] or [None])[0]
+
+        if p == "*":
+            i += 1
+            i_backup = i
+            j_backup = j
+
+        elif p in ["?", s[j]]:
+            i += 1
+            j += 1
+
+        else:
+            if i_backup == -1:
+                return False
+            else:
+                j_backup += 1
+                j = j_backup
+                i = i_backup
+
+    return i == len(pattern)
+
+def _word(length: int) -> str:
+    return "".join(random.choice("abcdefghijklmnop") for _ in range(length))
+
+def _masks():
+    masks = []
+    for _ in range(MASKS):
+        nick = _word(random.randrange(4, 12))
+        user = random.choice(["~", ""])+_word(random.randrange(3, 10))
+        host = random.choice([
+            f"{_word(6)}.{_word(8)}.example.com",
+            f"user/{_word(8)}",
+            ".".join(str(random.randrange(256)) for _ in range(4)),
+            f"{_word(4)}-{_word(4)}.dyn.isp.example.net"])
+        masks.append(f"{nick}!{user}@{host}")
+    return masks
+
+def _patterns():
+    patterns = []
+    for _ in range(PATTERNS):
+        patterns.append(random.choice([
+            f"*!*@*.{_word(8)}.example.com",
+            f"*!*{_word(3)}@*",
+            f"{_word(3)}*!*@*",
+            "*!*@user/*",
+            f"*!*@10.{random.randrange(256)}.*.*",
+            f"*!~*@*-*.dyn.isp.example.net",
+            f"?{_word(3)}*!*@*",
+            f"*{_word(2)}*{_word(2)}*!*@*"]))
+    return patterns
+
+def _bans() -> str:
+    # what a channel's ban list tends to look like
+    return random.choice([
+        f"*!*@{_word(6)}.{_word(8)}.example.com",
+        f"*!*@*.{_word(8)}.example.com",
+        f"*!*@user/{_word(8)}",
+        f"*!*@{random.randrange(256)}.{random.randrange(256)}.*",
+        f"{_word(5)}*!*@*",
+        f"{_word(6)}!*@*",
+        f"*!~{_word(6)}@*",
+        f"*!*{_word(5)}@*"])
+
+def main():
+    masks    = _masks()
+    patterns = _patterns()
+
+    compiled = [glob.compile(pattern) for pattern in patterns]
+    collapsed = [glob.collapse(pattern) for pattern in patterns]
+
+    start = perf_counter()
+    old = [[_match_old(p, m) for m in masks] for p in collapsed]
+    old_elapsed = perf_counter()-start
+
+    start = perf_counter()
+    new = [[g.match(m) for m in masks] for g in compiled]
+    new_elapsed = perf_counter()-start
+
+    assert old == new
+    count = PATTERNS*MASKS
+    print(f"old      {count/old_elapsed:12.0f} matches/s")
+    print(f"compiled {count/new_elapsed:12.0f} matches/s")
+
+    bans = [_bans() for _ in range(BANS)]
+    each = [glob.compile(ban) for ban in bans]
+    globs = glob.GlobSet(bans)
+
+    start = perf_counter()
+    old = [sorted(b for b, g in zip(bans, each) if g.match(m)) for m in masks]
+    each_elapsed = perf_counter()-start
+
+    start = perf_counter()
+    new = [sorted(globs.match(m)) for m in masks]
+    set_elapsed = perf_counter()-start
+
+    assert old == new
+    print(f"{BANS} bans, each glob {MASKS/each_elapsed:8.0f} hostmasks/s")
+    print(f"{BANS} bans, GlobSet    {MASKS/set_elapsed:8.0f} hostmasks/s")
+
+if __name__ == "__main__":
+    main()
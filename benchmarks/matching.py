@@ -0,0 +1,59 @@
+# matches/sec of ResponseOr against CompiledResponses with 1k matchers
+import random
+from time      import perf_counter
+from irctokens import tokenise
+from ircstates import Server
+from ircrobots.matching import (Response, Responses, ResponseOr,
+    CompiledResponses, ANY, SELF, Folded)
+
+MATCHERS = 1000
+LINES    = 20000
+
+def _matchers():
+    matchers = []
+    for i in range(MATCHERS):
+        kind = i % 4
+        if kind == 0:
+            matchers.append(Response("PRIVMSG", [f"#chan{i}", ANY]))
+        elif kind == 1:
+            matchers.append(Responses(["311", "318"], [SELF, Folded(f"nick{i}")]))
+        elif kind == 2:
+            matchers.append(Response("MODE", [f"#chan{i}", "+b", ANY]))
+        else:
+            matchers.append(Response("324", [SELF, f"#chan{i}"]))
+    return matchers
+
+def _lines():
+    lines = []
+    for _ in range(LINES):
+        i = random.randrange(MATCHERS*2)
+        lines.append(random.choice([
+            tokenise(f":n!u@h PRIVMSG #chan{i} :hello there"),
+            tokenise(f":srv 311 bot nick{i} user host * :real"),
+            tokenise(f":n!u@h MODE #chan{i} +b *!*@host"),
+            tokenise(f":srv 324 bot #chan{i} +nt"),
+            tokenise(f":srv 352 bot #chan{i} u h srv n H :0 r"),
+        ]))
+    return lines
+
+def _bench(name, matcher, server, lines):
+    start = perf_counter()
+    matched = sum(1 for line in lines if matcher.match(server, line))
+    took = perf_counter()-start
+    print(f"{name:20} {len(lines)/took:12.0f} matches/sec ({matched} hits)")
+
+def main():
+    server = Server("bench")
+    server.nickname = server.nickname_lower = "bot"
+
+    matchers = _matchers()
+    lines    = _lines()
+
+    _bench("ResponseOr",        ResponseOr(*matchers),        server, lines)
+    start = perf_counter()
+    compiled = CompiledResponses(*matchers)
+    print(f"compiled {MATCHERS} matchers in {perf_counter()-start:.4f}s")
+    _bench("CompiledResponses", compiled, server, lines)
+
+if __name__ == "__main__":
+    main()
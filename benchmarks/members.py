@@ -0,0 +1,50 @@
+# memory per channel member at each TrackingLevel
+import tracemalloc
+from irctokens import tokenise
+from ircrobots.bot    import Bot
+from ircrobots.server import Server
+from ircrobots.params import ConnectionParams, TrackingLevel
+
+MEMBERS  = 10000
+PER_LINE = 40
+
+def _lines():
+    lines = [":srv 001 bot :hi", ":bot!u@h JOIN #big"]
+    nicks = [f"user{i}!u{i}@host{i}.example" for i in range(MEMBERS)]
+    for i in range(0, MEMBERS, PER_LINE):
+        names = " ".join(nicks[i:i+PER_LINE])
+        lines.append(f":srv 353 bot = #big :{names}")
+    lines.append(":srv 366 bot #big :end")
+    # what FULL would go on to get from WHOX
+    for i in range(MEMBERS):
+        lines.append(f":srv 354 bot 135 u{i} 10.0.0.1 host{i}.example "
+            f"srv user{i} H acct{i} :real name {i}")
+    return [tokenise(line) for line in lines]
+
+def _bench(level, lines):
+    server = Server(Bot(), "bench")
+    server.params = ConnectionParams("bot", "localhost", 6667)
+    server.params.tracking = level
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for line in lines:
+        if level == TrackingLevel.FULL or not line.command == "354":
+            server._dispatch_line(line)
+    # nothing's consuming these; don't count them
+    while not server._process_queue.empty():
+        server._process_queue.get_nowait()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    used = sum(s.size_diff for s in after.compare_to(before, "filename"))
+    print(f"{level.name:6} {len(server.channels['#big'].users):6} members "
+        f"{used/1024:10.1f}KiB {used/MEMBERS:8.1f} bytes/member")
+
+def main():
+    lines = _lines()
+    for level in TrackingLevel:
+        _bench(level, lines)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# concurrent SCRAM-SHA-512 logins: how long they take and how long the
+# event loop goes without running, with PBKDF2 inline, in an executor and
+# from the key cache (a mass reconnect)
+import asyncio, base64, os
+from time import perf_counter
+from ircrobots import scram
+from ircrobots.scram import SCRAMAlgorithm, SCRAMContext
+
+LOGINS     = 20
+ITERATIONS = 100000
+
+def _server_first(context: SCRAMContext, salt: bytes) -> bytes:
+    nonce = context._client_nonce+base64.b64encode(os.urandom(16))
+    return b"r=%s,s=%s,i=%d" % (nonce, base64.b64encode(salt), ITERATIONS)
+
+async def _login(inline: bool, salt: bytes):
+    context = SCRAMContext(SCRAMAlgorithm.SHA_512, "user", "pencil")
+    context.client_first()
+    # what a server's reply would look like, after a round trip
+    await asyncio.sleep(0)
+    server_first = _server_first(context, salt)
+    if inline:
+        context.server_first(server_first)
+    else:
+        await context.server_first_async(server_first)
+
+async def _bench(inline: bool, salts):
+    stall   = 0.0
+    running = True
+    async def _ticker():
+        nonlocal stall
+        last = perf_counter()
+        while running:
+            await asyncio.sleep(0)
+            now   = perf_counter()
+            stall = max(stall, now-last)
+            last  = now
+
+    ticker = asyncio.ensure_future(_ticker())
+    start  = perf_counter()
+    await asyncio.gather(*(_login(inline, salt) for salt in salts))
+    elapsed = perf_counter()-start
+    running = False
+    await ticker
+    return elapsed, stall
+
+async def main():
+    # a different account (and so salt) for each login
+    salts = [os.urandom(16) for _ in range(LOGINS)]
+    for name, inline, clear in [
+            ("inline",   True,  True),
+            ("executor", False, True),
+            ("cached",   False, False)]:
+        if clear:
+            scram._KEYS.clear()
+        elapsed, stall = await _bench(inline, salts)
+        print(f"{name:8} {elapsed*1000:8.1f}ms total,"
+            f" event loop stalled for up to {stall*1000:6.1f}ms")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,61 @@
+# lines/sec and reader wake-ups of TCPTransport against LineTransport,
+# reading from a loopback server that sends lines split across packets
+import asyncio
+from time      import perf_counter
+from irctokens import StatefulDecoder
+from ircrobots.transport import TCPTransport, LineTransport
+
+LINES  = 20000
+PACKET = 64 # bytes, so most lines arrive in pieces
+
+def _data() -> bytes:
+    lines = []
+    for i in range(LINES):
+        lines.append(f":nick{i}!user@host.example PRIVMSG #chan :message {i}"
+            f" {'x'*(i%200)}\r\n")
+    return "".join(lines).encode("utf8")
+
+async def _bench(transport, data: bytes):
+    async def _serve(reader, writer):
+        for i in range(0, len(data), PACKET):
+            writer.write(data[i:i+PACKET])
+            await writer.drain()
+            # one packet at a time, like a server trickling lines out
+            await asyncio.sleep(0)
+        writer.close()
+
+    server = await asyncio.start_server(_serve, "127.0.0.1", 0)
+    port   = server.sockets[0].getsockname()[1]
+
+    reader, writer = await transport.connect("127.0.0.1", port, None)
+    decoder = StatefulDecoder()
+    lines   = 0
+    reads   = 0
+    empty   = 0 # reads that didn't give us a whole line
+
+    start = perf_counter()
+    while True:
+        got = decoder.push(await reader.read(65536))
+        if got is None:
+            break
+        reads += 1
+        lines += len(got)
+        if not got:
+            empty += 1
+    elapsed = perf_counter()-start
+
+    await writer.close()
+    server.close()
+    await server.wait_closed()
+    assert lines == LINES, lines
+    return elapsed, reads, empty
+
+async def main():
+    data = _data()
+    for transport in [TCPTransport(), LineTransport()]:
+        elapsed, reads, empty = await _bench(transport, data)
+        print(f"{type(transport).__name__:13} {LINES/elapsed:10.0f} lines/s"
+            f" {reads:7} reads ({empty} without a whole line)")
+
+if __name__ == "__main__":
+    asyncio.run(main())
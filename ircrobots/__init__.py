@@ -1,6 +1,7 @@
 from .bot    import Bot
 from .server import Server
 from .params import (ConnectionParams, SASLUserPass, SASLExternal, SASLSCRAM,
-    STSPolicy, ResumePolicy)
+    STSPolicy, ResumePolicy, ThrottleProfile, SendQueuePolicy,
+    TrackingLevel)
 from .ircv3  import Capability
 from .security import TLS
@@ -1,12 +1,17 @@
-from asyncio    import Future
-from typing     import (Any, Awaitable, Callable, Generator, Generic, Optional,
-    TypeVar)
+from asyncio     import Future
+from collections import deque, OrderedDict
+from time        import monotonic
+from typing      import (Any, Awaitable, Callable, Deque, Dict, Generator,
+    Generic, List, Optional, Tuple, TypeVar)
 
 from irctokens  import Line
 from .matching  import IMatchResponse
 from .interface import IServer
 from .ircv3     import TAG_LABEL
 
+# finished labeled responses kept for waiters that turn up late
+FINISHED_MAX = 64
+
 TEvent = TypeVar("TEvent")
 class MaybeAwait(Generic[TEvent]):
     def __init__(self, func: Callable[[], Awaitable[TEvent]]):
@@ -22,23 +27,233 @@ class WaitFor(object):
             deadline: float):
         self.response = response
         self.deadline = deadline
-        self._label:   Optional[str] = None
+        self.commands = response.commands()
+        self.label:    Optional[str] = None
         self._our_fut: "Future[Line]" = Future()
 
     def __await__(self) -> Generator[Any, None, Line]:
         return self._our_fut.__await__()
 
     def with_label(self, label: str):
-        self._label = label
+        self.label = label
+
+    def done(self) -> bool:
+        return self._our_fut.done()
 
     def match(self, server: IServer, line: Line):
-        if (self._label is not None and
-                line.tags is not None):
-            label = TAG_LABEL.get(line.tags)
-            if (label is not None and
-                    label == self._label):
-                return True
         return self.response.match(server, line)
 
     def resolve(self, line: Line):
-        self._our_fut.set_result(line)
+        if not self._our_fut.done():
+            self._our_fut.set_result(line)
+    def reject(self, error: Exception):
+        if not self._our_fut.done():
+            self._our_fut.set_exception(error)
+
+TYPE_BUCKET = Tuple[bool, Optional[str]]
+class WaitForRegistry(object):
+    # pending `WaitFor`s, indexed by the commands they could match so that
+    # each line is only tested against waiters that might want it.
+    # labeled waiters are kept apart; they only need to see lines that
+    # aren't part of a labeled response
+    def __init__(self):
+        self._buckets: Dict[TYPE_BUCKET, Dict[WaitFor, None]] = {}
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _keys(self, wait_for: WaitFor) -> List[TYPE_BUCKET]:
+        labeled = wait_for.label is not None
+        if wait_for.commands is None:
+            return [(labeled, None)]
+        else:
+            return [(labeled, c) for c in wait_for.commands]
+
+    def add(self, wait_for: WaitFor):
+        for key in self._keys(wait_for):
+            self._buckets.setdefault(key, {})[wait_for] = None
+        self._count += 1
+
+    def remove(self, wait_for: WaitFor):
+        removed = False
+        for key in self._keys(wait_for):
+            bucket = self._buckets.get(key, {})
+            if wait_for in bucket:
+                del bucket[wait_for]
+                removed = True
+                if not bucket:
+                    del self._buckets[key]
+        if removed:
+            self._count -= 1
+
+    def resolve(self,
+            server:  IServer,
+            line:    Line,
+            labeled: bool=False
+            ) -> bool:
+        # resolve (and forget) every waiter that matches `line`
+        keys: List[TYPE_BUCKET] = [(False, line.command), (False, None)]
+        if not labeled:
+            keys += [(True, line.command), (True, None)]
+
+        candidates: List[WaitFor] = []
+        for key in keys:
+            if key in self._buckets:
+                candidates.extend(self._buckets[key])
+
+        matched = [w for w in candidates if w.match(server, line)]
+        for wait_for in matched:
+            wait_for.resolve(line)
+            self.remove(wait_for)
+        return bool(matched)
+
+    def reject(self, error: Exception):
+        for bucket in self._buckets.values():
+            for wait_for in bucket:
+                wait_for.reject(error)
+        self._buckets.clear()
+        self._count = 0
+
+class LabeledResponse(object):
+    def __init__(self, label: str, deadline: float):
+        self.label    = label
+        self.deadline = deadline
+        self.finished = False
+        # every line of the response, in order
+        self.lines:  List[Line]  = []
+        # lines no waiter has looked at yet
+        self.unread: Deque[Line] = deque()
+
+        self.waits:  List[WaitFor] = []
+        self._done: "Future[List[Line]]" = Future()
+
+    def __await__(self) -> Generator[Any, None, List[Line]]:
+        return self._done.__await__()
+
+    def push(self, server: IServer, line: Line) -> bool:
+        self.lines.append(line)
+        for wait_for in self.waits:
+            if wait_for.match(server, line):
+                wait_for.resolve(line)
+                self.waits.remove(wait_for)
+                return True
+        else:
+            self.unread.append(line)
+            return False
+
+    def consume(self, server: IServer, wait_for: WaitFor) -> bool:
+        # lines that arrived before `wait_for` was registered. ones that
+        # don't match are discarded, just as they would have gone unseen
+        while self.unread:
+            line = self.unread.popleft()
+            if wait_for.match(server, line):
+                wait_for.resolve(line)
+                return True
+        return False
+
+    def finish(self):
+        self.finished = True
+        self.waits.clear()
+        if not self._done.done():
+            self._done.set_result(self.lines)
+
+class LabelRegistry(object):
+    # routes labeled-response lines (and the bodies of labeled batches)
+    # straight to the waiter that sent the labeled request.
+    # labeled waiters should also be in a `WaitForRegistry` to catch any
+    # responses that the server didn't label
+    def __init__(self):
+        self._labels:  Dict[str, LabeledResponse] = {}
+        self._batches: Dict[str, LabeledResponse] = {}
+        # a waiter for a response that's already finished gets the finished
+        # response, rather than a new one that'd never finish
+        self._finished: "OrderedDict[str, LabeledResponse]" = OrderedDict()
+
+    def response(self, label: str, deadline: float) -> LabeledResponse:
+        response = self._labels.get(label) or self._finished.get(label)
+        if response is None:
+            self._expire()
+            response = self._labels[label] = LabeledResponse(label, deadline)
+        else:
+            response.deadline = max(response.deadline, deadline)
+        return response
+
+    def _forget(self, response: LabeledResponse):
+        self._labels.pop(response.label, None)
+        self._finished[response.label] = response
+        while len(self._finished) > FINISHED_MAX:
+            self._finished.popitem(last=False)
+
+    def _expire(self):
+        now = monotonic()
+        for label, response in list(self._labels.items()):
+            if not response.waits and response.deadline < now:
+                del self._labels[label]
+
+    def add(self, server: IServer, label: str, wait_for: WaitFor) -> bool:
+        # returns True if `wait_for` was resolved by an already-read line
+        wait_for.with_label(label)
+        response = self.response(label, wait_for.deadline)
+        if response.consume(server, wait_for):
+            return True
+        elif not response.finished:
+            response.waits.append(wait_for)
+        return False
+
+    def remove(self, label: str, wait_for: WaitFor):
+        response = self._labels.get(label)
+        if response is not None:
+            if wait_for in response.waits:
+                response.waits.remove(wait_for)
+            if response.finished and not response.unread:
+                self._forget(response)
+
+    def _finish(self, response: LabeledResponse):
+        response.finish()
+        if not response.unread:
+            self._forget(response)
+
+    def route(self, server: IServer, line: Line) -> Tuple[bool, bool]:
+        # returns (part of a tracked labeled response?, resolved a waiter?)
+        if line.tags:
+            label = TAG_LABEL.get(line.tags)
+            if label is not None:
+                response = self._labels.get(label)
+                if response is None:
+                    return False, False
+                elif (line.command == "BATCH" and
+                        line.params and
+                        line.params[0].startswith("+")):
+                    # usually `labeled-response`, but any batch can be
+                    # the whole response to a labeled request
+                    self._batches[line.params[0][1:]] = response
+                    return True, False
+                elif line.command == "ACK":
+                    self._finish(response)
+                    return True, False
+                else:
+                    resolved = response.push(server, line)
+                    self._finish(response)
+                    return True, resolved
+
+            batch = line.tags.get("batch")
+            if batch is not None and batch in self._batches:
+                return True, self._batches[batch].push(server, line)
+
+        if (line.command == "BATCH" and
+                line.params and
+                line.params[0].startswith("-") and
+                line.params[0][1:] in self._batches):
+            self._finish(self._batches.pop(line.params[0][1:]))
+            return True, False
+        return False, False
+
+    def reject(self, error: Exception):
+        for response in self._labels.values():
+            for wait_for in response.waits:
+                wait_for.reject(error)
+            response.finish()
+        self._labels.clear()
+        self._batches.clear()
+        self._finished.clear()
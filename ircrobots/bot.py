@@ -1,17 +1,37 @@
 import asyncio, traceback
 import anyio
-from typing import Dict
+from typing import Any, Dict, Optional, Set
 
-from ircstates.server import ServerDisconnectedException
+from ircstates.numerics import RPL_WELCOME
+from ircstates.server   import ServerDisconnectedException
 
-from .server    import ConnectionParams, Server
+from .server    import ConnectionParams, Server, TokenBucket
+from .          import snapshot
+from .params    import STSPolicy
+from .sts       import STSStore
+from .matching  import Response, ANY
+from .scheduler import ConnectScheduler, jitter
 from .transport import TCPTransport
-from .interface import IBot, IServer, ITCPTransport
+from .interface import IBot, IServer, ITCPTransport, ITCPReader, ITCPWriter
 
 class Bot(IBot):
-    def __init__(self):
+    def __init__(self,
+            sts_path:    Optional[str]=None,
+            connect_max: int=4):
         self.servers: Dict[str, Server] = {}
         self._server_queue: asyncio.Queue[Server] = asyncio.Queue()
+        self.sts = STSStore(sts_path)
+        # how many servers can be connecting (up to RPL_WELCOME) at once
+        self.connects = ConnectScheduler(connect_max)
+        self._connecting: Set[Server] = set()
+        # whether `run()` is picking up servers as they're added
+        self._running = False
+        # the transport each server connected with, to reconnect with
+        self._transports: Dict[str, ITCPTransport] = {}
+        # servers to reconnect without waiting `params.reconnect`
+        self._reconnect_now: Set[IServer] = set()
+        # each server's throttle, so a reconnect after flooding stays slow
+        self._throttles: Dict[str, TokenBucket] = {}
 
     def create_server(self, name: str):
         return Server(self, name)
@@ -22,44 +42,126 @@ class Bot(IBot):
                 server.disconnected):
 
             reconnect = server.params.reconnect
+            delay     = jitter(reconnect)
+            if server in self._reconnect_now:
+                self._reconnect_now.remove(server)
+                delay = 0
 
+            transport = self._transports.get(server.name, TCPTransport())
             while True:
-                await asyncio.sleep(reconnect)
                 try:
-                    await self.add_server(server.name, server.params)
+                    await self.add_server(server.name, server.params,
+                        transport, delay=delay)
                 except Exception as e:
                     traceback.print_exc()
                     # let's try again, exponential backoff up to 5 mins
                     reconnect = min(reconnect*2, 300)
+                    delay     = jitter(reconnect)
                 else:
                     break
 
+    async def reconnect(self, server: IServer):
+        # drop `server`'s connection and connect again straight away, with
+        # its params as they are now. the caller is probably one of the
+        # server's own tasks, which are cancelled once it's disconnected,
+        # so the reconnect is left to `_run_server()`
+        self._reconnect_now.add(server)
+        await server.disconnect()
+
+    async def sts_policy(self, hostname: str, sts: STSPolicy):
+        self.sts.set(hostname, sts)
+
     async def disconnect(self, server: IServer):
         del self.servers[server.name]
+        self._transports.pop(server.name, None)
+        self._throttles.pop(server.name, None)
         await server.disconnect()
 
     async def add_server(self,
             name:      str,
             params:    ConnectionParams,
-            transport: ITCPTransport = TCPTransport()) -> Server:
+            transport: ITCPTransport = TCPTransport(),
+            delay:     float=0) -> Server:
+        # wait `delay` seconds and then our turn to connect
+        await self.connects.acquire(name, params.weight, delay)
+        try:
+            server = self.create_server(name)
+            self.servers[name]    = server
+            self._transports[name] = transport
+            if name in self._throttles:
+                server.throttle.inherit(self._throttles[name])
+            self._throttles[name] = server.throttle
+
+            if params.snapshot is not None:
+                data = snapshot.load(params.snapshot)
+                if data is not None:
+                    snapshot.restore(server, params, data)
+            if params.sts is None:
+                params.sts = self.sts.get(params.host)
+
+            await server.connect(transport, params)
+        except BaseException:
+            self.connects.release()
+            raise
+
+        if self._running:
+            # our turn is over once we're registered; see _registered()
+            self._connecting.add(server)
+        else:
+            # nothing reads from us until `run()`, so we can't register
+            # until then; don't hold up servers added after us
+            self.connects.release()
+        await self._server_queue.put(server)
+        return server
+
+    async def attach_server(self,
+            name:   str,
+            params: ConnectionParams,
+            reader: ITCPReader,
+            writer: ITCPWriter,
+            state:  Dict[str, Any],
+            unread: bytes=b"",
+            unsent: bytes=b"") -> Server:
+        # a connection that's already registered (see handover.py)
         server = self.create_server(name)
         self.servers[name] = server
-        await server.connect(transport, params)
+        await server.attach(reader, writer, params, state, unread, unsent)
         await self._server_queue.put(server)
         return server
 
+    async def _registered(self, server: Server):
+        try:
+            if not server.registered:
+                await server.wait_for(Response(RPL_WELCOME, [ANY]))
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self.connects.release()
+
     async def _run_server(self, server: Server):
         try:
             async with anyio.create_task_group() as tg:
+                if server in self._connecting:
+                    self._connecting.remove(server)
+                    await tg.spawn(self._registered, server)
                 await tg.spawn(server._read_lines)
+                await tg.spawn(server._process_lines)
                 await tg.spawn(server._send_lines)
+                if server.params.snapshot is not None:
+                    await tg.spawn(snapshot.autosave, server,
+                        server.params.snapshot,
+                        server.params.snapshot_interval)
         except ServerDisconnectedException:
             server.disconnected = True
 
         await self.disconnected(server)
 
     async def run(self):
-        async with anyio.create_task_group() as tg:
-            while not tg.cancel_scope.cancel_called:
-                server = await self._server_queue.get()
-                await tg.spawn(self._run_server, server)
+        self._running = True
+        try:
+            async with anyio.create_task_group() as tg:
+                while not tg.cancel_scope.cancel_called:
+                    server = await self._server_queue.get()
+                    await tg.spawn(self._run_server, server)
+        finally:
+            self._running = False
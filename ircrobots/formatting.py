@@ -1,4 +1,5 @@
-from typing import List
+from re     import DOTALL, compile as re_compile
+from typing import List, NamedTuple, Optional, Tuple
 
 BOLD      = "\x02"
 COLOR     = "\x03"
@@ -15,30 +16,104 @@ FORMATTERS = [
     RESET
 ]
 
+# a colour code's foreground and background are both optional, but a comma
+# only belongs to it if a background follows
+_COLOR   = "\x03[0-9]{0,2}(?:,[0-9]{1,2})?"
+# any formatting code
+RE_TOKEN = re_compile("%s|[%s]" % (_COLOR, "".join(FORMATTERS)))
+
 def tokens(s: str) -> List[str]:
-    tokens: List[str] = []
-
-    s_copy = list(s)
-    while s_copy:
-        token = s_copy.pop(0)
-        if token == COLOR:
-            for i in range(2):
-                if s_copy and s_copy[0].isdigit():
-                    token += s_copy.pop(0)
-            if (len(s_copy) > 1 and
-                    s_copy[0] == "," and
-                    s_copy[1].isdigit()):
-                token += s_copy.pop(0)
-                token += s_copy.pop(0)
-                if s_copy and s_copy[0].isdigit():
-                    token += s_copy.pop(0)
-
-            tokens.append(token)
-        elif token in FORMATTERS:
-            tokens.append(token)
-    return tokens
-
-def strip(s: str):
-    for token in tokens(s):
-        s = s.replace(token, "", 1)
-    return s
+    return RE_TOKEN.findall(s)
+
+def strip(s: str) -> str:
+    return RE_TOKEN.sub("", s)
+
+class Style(NamedTuple):
+    bold:       bool=False
+    italic:     bool=False
+    underline:  bool=False
+    invert:     bool=False
+    foreground: Optional[int]=None
+    background: Optional[int]=None
+
+def _add_span(spans: List[Tuple[str, Style]], text: str, style: Style):
+    if spans and spans[-1][1] == style:
+        spans[-1] = (spans[-1][0]+text, style)
+    else:
+        spans.append((text, style))
+
+def spans(s: str) -> List[Tuple[str, Style]]:
+    # `s` as runs of text and the style they're shown in, without the
+    # formatting codes. neighbouring runs never share a style
+    spans: List[Tuple[str, Style]] = []
+
+    bold = italic = underline = invert = False
+    foreground: Optional[int] = None
+    background: Optional[int] = None
+
+    last = 0
+    for match in RE_TOKEN.finditer(s):
+        if match.start() > last:
+            _add_span(spans, s[last:match.start()], Style(
+                bold, italic, underline, invert, foreground, background))
+        last = match.end()
+
+        token = match.group(0)
+        if token == BOLD:
+            bold = not bold
+        elif token == ITALIC:
+            italic = not italic
+        elif token == UNDERLINE:
+            underline = not underline
+        elif token == INVERT:
+            invert = not invert
+        elif token == RESET:
+            bold = italic = underline = invert = False
+            foreground = background = None
+        else:
+            fore, _, back = token[1:].partition(",")
+            if not fore and not back:
+                # a lone colour code clears both colours
+                foreground = background = None
+            if fore:
+                foreground = int(fore)
+            if back:
+                background = int(back)
+
+    if last < len(s):
+        _add_span(spans, s[last:], Style(
+            bold, italic, underline, invert, foreground, background))
+    return spans
+
+# a colour code or any single character; colour codes are never split
+RE_UNIT = re_compile("%s|." % _COLOR, DOTALL)
+
+def split(s: str, byte_limit: int) -> List[str]:
+    # split `s` in to chunks of no more than `byte_limit` utf8 bytes. splits
+    # after the last space that fits, if there is one, and never through a
+    # utf8 character or a formatting code. `"".join(chunks) == s`
+    chunks: List[str] = []
+
+    units: List[str] = []
+    sizes: List[int] = []
+    size       = 0
+    last_space = 0
+    for unit in RE_UNIT.findall(s):
+        unit_size = len(unit) if unit.isascii() else len(unit.encode("utf8"))
+        while units and (size+unit_size) > byte_limit:
+            cut = last_space or len(units)
+            chunks.append("".join(units[:cut]))
+            units = units[cut:]
+            sizes = sizes[cut:]
+            size  = sum(sizes)
+            last_space = 0
+
+        units.append(unit)
+        sizes.append(unit_size)
+        size += unit_size
+        if unit == " ":
+            last_space = len(units)
+
+    if units or not chunks:
+        chunks.append("".join(units))
+    return chunks
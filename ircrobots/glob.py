@@ -1,3 +1,7 @@
+from re     import DOTALL, compile as re_compile, escape as re_escape
+from typing import Dict, Iterable, Iterator, List, Optional, Pattern, Tuple
+from ircstates.casemap import CaseMap, casefold
+
 
 def collapse(pattern: str) -> str:
     out = ""
@@ -18,37 +22,235 @@ def collapse(pattern: str) -> str:
             i   += 1
     return out
 
-def _match(pattern: str, s: str):
-    i, j = 0, 0
+class _Segment(object):
+    # a run of a pattern between `*`s. `?` is the only wildcard left, so
+    # a segment always matches exactly `len(segment)` characters
+    def __init__(self, segment: str):
+        self.length = len(segment)
+        self.literal: Optional[str] = None
+        self.regex:   Optional[Pattern] = None
+        if "?" in segment:
+            self.regex = re_compile(
+                ".".join(re_escape(part) for part in segment.split("?")),
+                DOTALL)
+        else:
+            self.literal = segment
 
-    i_backup = -1
-    j_backup = -1
-    while j < len(s):
-        p = (pattern[i:] or [None])[0]
+    def match(self, s: str, pos: int) -> bool:
+        if self.regex is not None:
+            return self.regex.match(s, pos) is not None
+        else:
+            return s.startswith(self.literal, pos) # type: ignore
+    def find(self, s: str, start: int, end: int) -> int:
+        if self.regex is not None:
+            match = self.regex.search(s, start, end)
+            return -1 if match is None else match.start()
+        else:
+            return s.find(self.literal, start, end) # type: ignore
 
-        if p == "*":
-            i += 1
-            i_backup = i
-            j_backup = j
+class Glob(object):
+    # each `*` matches as little as it can: the first segment is anchored
+    # at the start, the last at the end and the rest go wherever they're
+    # first found. that's never wrong for `*`/`?` globs and never needs to
+    # backtrack
+    def __init__(self, pattern: str, casemap: Optional[CaseMap]=None):
+        self._casemap = casemap
+        if casemap is not None:
+            pattern = casefold(casemap, pattern)
+        self._pattern = pattern
 
-        elif p in ["?", s[j]]:
-            i += 1
-            j += 1
+        segments = [_Segment(segment) for segment in pattern.split("*")]
+        self._head   = segments[0]
+        self._middle = segments[1:-1]
+        self._tail   = segments[-1] if len(segments) > 1 else None
 
-        else:
-            if i_backup == -1:
+    def match(self, s: str) -> bool:
+        if self._casemap is not None:
+            s = casefold(self._casemap, s)
+
+        if self._tail is None:
+            # no `*` at all
+            return len(s) == self._head.length and self._head.match(s, 0)
+        elif not self._head.match(s, 0):
+            return False
+
+        start = self._head.length
+        end   = len(s)-self._tail.length
+        if end < start or not self._tail.match(s, end):
+            return False
+
+        for segment in self._middle:
+            found = segment.find(s, start, end)
+            if found == -1:
                 return False
+            start = found+segment.length
+        return True
+
+def compile(pattern: str, casemap: Optional[CaseMap]=None) -> Glob:
+    # `casemap` folds the pattern and everything matched against it, e.g.
+    # with `server.isupport.casemapping`
+    return Glob(collapse(pattern), casemap)
+
+_Key = Tuple[int, int, str]
+
+def _literals(pattern: str) -> Tuple[str, str]:
+    # the literal text before the first and after the last wildcard
+    prefix = pattern
+    for i, char in enumerate(pattern):
+        if char in "*?":
+            prefix = pattern[:i]
+            break
+    suffix = pattern
+    for i in range(len(pattern)-1, -1, -1):
+        if pattern[i] in "*?":
+            suffix = pattern[i+1:]
+            break
+    return prefix, suffix
+
+# where in a string a GlobSet can look for literal text
+WHOLE, USER, HOST   = range(3)
+EXACT, PREFIX, SUFFIX = range(3)
+
+def _fields(s: str) -> List[Tuple[int, str]]:
+    # `s`, and its username and hostname if it has them. only strings with
+    # one `!` and then one `@` count as hostmasks; if those are literal in
+    # a pattern, they can only line up with a hostmask's separators
+    fields = [(WHOLE, s)]
+    _, bang, userhost = s.partition("!")
+    user, at, host    = userhost.partition("@")
+    if bang and at and not "!" in userhost and not "@" in host:
+        fields.append((USER, user))
+        fields.append((HOST, host))
+    return fields
+
+class GlobSet(object):
+    # many globs matched at once. each glob is filed under the longest
+    # piece of literal text a string has to have to match it - all of the
+    # pattern, or the literal start or end of the pattern, its username or
+    # its hostname - and only the globs filed under what a string has get
+    # tried
+    def __init__(self,
+            patterns: Iterable[str]=[],
+            casemap:  Optional[CaseMap]=None):
+        self.casemap = casemap
+        # pattern -> (glob, (field, kind, key) it's filed under)
+        self._globs: Dict[str, Tuple[Glob, Optional[_Key]]] = {}
+
+        self._index: Dict[Tuple[int, int], Dict[str, Dict[str, Glob]]] = {}
+        # prefix/suffix lengths that are filed, and how many of each
+        self._lengths: Dict[Tuple[int, int], Dict[int, int]] = {}
+        # globs without any literal text to file them under
+        self._rest: Dict[str, Glob] = {}
+
+        for pattern in patterns:
+            self.add(pattern)
+
+    def __len__(self) -> int:
+        return len(self._globs)
+    def __contains__(self, pattern: str) -> bool:
+        return pattern in self._globs
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._globs))
+
+    def _fold(self, s: str) -> str:
+        if self.casemap is not None:
+            return casefold(self.casemap, s)
+        else:
+            return s
+
+    def _key(self, pattern: str) -> Optional[_Key]:
+        keys: List[_Key] = []
+        for field, value in _fields(pattern):
+            prefix, suffix = _literals(value)
+            if prefix == value:
+                keys.append((field, EXACT, value))
             else:
-                j_backup += 1
-                j = j_backup
-                i = i_backup
+                keys.append((field, PREFIX, prefix))
+                keys.append((field, SUFFIX, suffix))
 
-    return i == len(pattern)
+        key = max(keys, key=lambda k: (len(k[2]), k[1] == EXACT))
+        if key[2] or key[1] == EXACT:
+            return key
+        else:
+            return None
 
-class Glob(object):
-    def __init__(self, pattern: str):
-        self._pattern = pattern
-    def match(self, s: str) -> bool:
-        return _match(self._pattern, s)
-def compile(pattern: str) -> Glob:
-    return Glob(collapse(pattern))
+    def add(self, pattern: str):
+        if pattern in self._globs:
+            return
+        glob = compile(self._fold(pattern))
+        key  = self._key(glob._pattern)
+        self._globs[pattern] = (glob, key)
+
+        if key is None:
+            self._rest[pattern] = glob
+            return
+
+        field, kind, text = key
+        index = self._index.setdefault((field, kind), {})
+        index.setdefault(text, {})[pattern] = glob
+        if not kind == EXACT:
+            lengths = self._lengths.setdefault((field, kind), {})
+            lengths[len(text)] = lengths.get(len(text), 0)+1
+
+    def remove(self, pattern: str):
+        _, key = self._globs.pop(pattern)
+        if key is None:
+            del self._rest[pattern]
+            return
+
+        field, kind, text = key
+        index = self._index[(field, kind)]
+        del index[text][pattern]
+        if not index[text]:
+            del index[text]
+        if not kind == EXACT:
+            lengths = self._lengths[(field, kind)]
+            lengths[len(text)] -= 1
+            if not lengths[len(text)]:
+                del lengths[len(text)]
+
+    def _candidates(self, s: str) -> Iterator[Dict[str, Glob]]:
+        fields = _fields(s)
+        if len(fields) == 1 and (self._index.keys()-{
+                (WHOLE, EXACT), (WHOLE, PREFIX), (WHOLE, SUFFIX)}):
+            # not a hostmask, so username/hostname keys don't apply to it;
+            # try everything
+            for globs in self._index.values():
+                yield from globs.values()
+            yield self._rest
+            return
+
+        for field, value in fields:
+            exact = self._index.get((field, EXACT))
+            if exact and value in exact:
+                yield exact[value]
+
+            prefixes = self._index.get((field, PREFIX))
+            if prefixes:
+                for length in self._lengths[(field, PREFIX)]:
+                    if length <= len(value) and value[:length] in prefixes:
+                        yield prefixes[value[:length]]
+
+            suffixes = self._index.get((field, SUFFIX))
+            if suffixes:
+                for length in self._lengths[(field, SUFFIX)]:
+                    if length <= len(value) and value[-length:] in suffixes:
+                        yield suffixes[value[-length:]]
+        yield self._rest
+
+    def match(self, s: str) -> List[str]:
+        # every pattern that matches `s`
+        s = self._fold(s)
+        matches: List[str] = []
+        for globs in self._candidates(s):
+            for pattern, glob in globs.items():
+                if glob.match(s):
+                    matches.append(pattern)
+        return matches
+    def any(self, s: str) -> bool:
+        s = self._fold(s)
+        for globs in self._candidates(s):
+            for glob in globs.values():
+                if glob.match(s):
+                    return True
+        return False
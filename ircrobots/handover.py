@@ -0,0 +1,134 @@
+# hand live connections from one process to another, e.g. across a deploy,
+# without dropping them. the old process calls `send()`, the new one
+# `receive()`; sockets go over a unix socket with SCM_RIGHTS, along with
+# each server's state and whatever it had read but not handled.
+#
+# only plaintext connections can be handed over. a TLS session's keys and
+# sequence numbers live in the old process's SSL object and can't follow
+# the socket, so TLS servers are left behind; let them reconnect (with
+# `draft/resume` where the network has it)
+import array, asyncio, json, os, socket, struct
+from typing import Any, Dict, List, Tuple
+
+from .bot       import Bot
+from .server    import Server
+from .params    import ConnectionParams
+from .transport import TCPReader, TCPWriter, open_stream
+from .          import snapshot
+
+VERSION  = 1
+MAX_FDS  = 256
+LEN_SIZE = struct.calcsize("!I")
+
+class HandoverError(Exception):
+    pass
+
+def _send(path: str, payload: bytes, fds: List[int]):
+    ancdata: List[Tuple[int, int, bytes]] = []
+    if fds:
+        ancdata.append((socket.SOL_SOCKET, socket.SCM_RIGHTS,
+            array.array("i", fds).tobytes()))
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        sock.sendmsg([struct.pack("!I", len(payload))], ancdata)
+        sock.sendall(payload)
+
+def _recv_fds(sock: socket.socket) -> Tuple[bytes, List[int]]:
+    # `socket.recv_fds()` is 3.9+
+    fds = array.array("i")
+    header, ancdata, flags, _ = sock.recvmsg(
+        LEN_SIZE, socket.CMSG_SPACE(MAX_FDS*fds.itemsize))
+    for level, kind, data in ancdata:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            fds.frombytes(data[:len(data)-(len(data) % fds.itemsize)])
+    if flags & socket.MSG_CTRUNC:
+        for fd in fds:
+            os.close(fd)
+        raise HandoverError(f"more than {MAX_FDS} connections")
+    return header, list(fds)
+
+def _receive(path: str) -> Tuple[bytes, List[int]]:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as listen:
+        listen.bind(path)
+        listen.listen(1)
+        sock, _ = listen.accept()
+    with sock:
+        header, fds = _recv_fds(sock)
+        if not len(header) == LEN_SIZE:
+            raise HandoverError("truncated handover header")
+        size,   = struct.unpack("!I", header)
+        payload = b""
+        while len(payload) < size:
+            data = sock.recv(size-len(payload))
+            if not data:
+                raise HandoverError("truncated handover payload")
+            payload += data
+    os.unlink(path)
+    return payload, fds
+
+async def send(bot: Bot, path: str) -> List[str]:
+    # hand every plaintext server to whoever's listening on `path`, and
+    # return their names. we should exit soon after; anything we send in
+    # the meantime goes out on the handed-over connections
+    plain = [(name, server) for name, server in bot.servers.items()
+        if server.params.tls is None]
+    # let handlers finish with every line they've been given first, as
+    # their lines are already in the state we're about to snapshot
+    for _, server in plain:
+        await server.drain()
+
+    servers: List[Dict[str, Any]] = []
+    fds:     List[int] = []
+    for name, server in plain:
+        if bot.servers.get(name) is server:
+            # (still connected after draining)
+            # no awaits between detaching and snapshotting
+            fd, unread, unsent = server.detach()
+            servers.append({
+                "name":   name,
+                "state":  snapshot.snapshot(server),
+                "unread": unread.decode("latin-1"),
+                "unsent": unsent.decode("latin-1")
+            })
+            fds.append(fd)
+            # don't let the disconnect that follows trigger a reconnect
+            del bot.servers[name]
+
+    payload = json.dumps({"version": VERSION, "servers": servers})
+    loop    = asyncio.get_running_loop()
+    await loop.run_in_executor(None, _send, path, payload.encode("utf8"), fds)
+    return [server["name"] for server in servers]
+
+async def receive(bot: Bot,
+        path:   str,
+        params: Dict[str, ConnectionParams]
+        ) -> List[Server]:
+    # wait for connections on `path` and attach them to `bot`. `params` is
+    # the config for each server we could be given, by server name
+    loop = asyncio.get_running_loop()
+    payload_b, fds = await loop.run_in_executor(None, _receive, path)
+    payload = json.loads(payload_b)
+    if not payload.get("version") == VERSION:
+        for fd in fds:
+            os.close(fd)
+        raise HandoverError(f"unknown handover version {payload['version']}")
+
+    servers: List[Server] = []
+    for data, fd in zip(payload["servers"], fds):
+        sock = socket.socket(fileno=fd)
+        if not data["name"] in params:
+            # we don't know this one any more
+            sock.close()
+            continue
+
+        reader, writer = await open_stream(sock=sock)
+        servers.append(await bot.attach_server(
+            data["name"],
+            params[data["name"]],
+            TCPReader(reader),
+            TCPWriter(writer),
+            data["state"],
+            data["unread"].encode("latin-1"),
+            data["unsent"].encode("latin-1")))
+    return servers
@@ -1,19 +1,29 @@
-from asyncio import Future
-from typing  import Awaitable, Iterable, List, Optional, Set, Tuple, Union
+from asyncio import Future, TimerHandle
+from typing  import (Any, Awaitable, Dict, Hashable, Iterable, List,
+    Optional, Set, Tuple, Union)
 from enum    import IntEnum
 
 from ircstates import Server, Emit
 from irctokens import Line, Hostmask
 
-from .params   import ConnectionParams, SASLParams, STSPolicy, ResumePolicy
+from .params   import (ConnectionParams, SASLParams, STSPolicy, ResumePolicy,
+    TrackingLevel)
 from .security import TLS
 
 class ITCPReader(object):
     async def read(self, byte_count: int):
         pass
+    def unread(self) -> bytes:
+        pass
+class ITCPBufferReader(ITCPReader):
+    # readers that can read straight in to someone else's buffer
+    async def readinto(self, buffer: memoryview) -> int:
+        pass
 class ITCPWriter(object):
     def write(self, data: bytes):
         pass
+    def detach(self) -> int:
+        pass
 
     def get_peer(self) -> Tuple[str, int]:
         pass
@@ -46,10 +56,18 @@ class SentLine(object):
         self.id             = id
         self.priority       = priority
         self.line           = line
+        self.encoded        = f"{line.format()}\r\n".encode("utf8")
         self.future: "Future[SentLine]" = Future()
 
+        # monotonic time after which we'd rather not send this line, and
+        # the timer that fails `future` then
+        self.deadline: Optional[float] = None
+        self.timer:    Optional[TimerHandle] = None
+        # identical pending lines with the same key are only sent once
+        self.key: Optional[Hashable] = None
+
     def __lt__(self, other: "SentLine") -> bool:
-        return self.priority < other.priority
+        return (self.priority, self.id) < (other.priority, other.id)
 
 class ICapability(object):
     def available(self, capabilities: Iterable[str]) -> Optional[str]:
@@ -64,6 +82,9 @@ class ICapability(object):
 class IMatchResponse(object):
     def match(self, server: "IServer", line: Line) -> bool:
         pass
+    def commands(self) -> Optional[Set[str]]:
+        # commands this could ever match. `None` means "any command"
+        return None
 class IMatchResponseParam(object):
     def match(self, server: "IServer", arg: str) -> bool:
         pass
@@ -86,7 +107,12 @@ class IServer(Server):
     def send_raw(self, line: str, priority=SendPriority.DEFAULT
             ) -> Awaitable[SentLine]:
         pass
-    def send(self, line: Line, priority=SendPriority.DEFAULT
+    def send(self,
+            line:     Line,
+            priority: int=SendPriority.DEFAULT,
+            expire:   Optional[float]=None,
+            coalesce: bool=False,
+            label:    bool=False
             ) -> Awaitable[SentLine]:
         pass
 
@@ -94,8 +120,13 @@ class IServer(Server):
             response: Union[IMatchResponse, Set[IMatchResponse]]
             ) -> Awaitable[Line]:
         pass
+    def wait_for_labeled(self, sent_aw: Awaitable[SentLine]
+            ) -> Awaitable[List[Line]]:
+        pass
 
-    def set_throttle(self, rate: int, time: float):
+    def set_throttle(self, rate: int, time: float, burst: Optional[int]=None):
+        pass
+    def send_queue_depth(self) -> Tuple[int, int]:
         pass
 
     def server_address(self) -> Tuple[str, int]:
@@ -120,6 +151,33 @@ class IServer(Server):
         pass
     async def resume_policy(self, resume: ResumePolicy):
         pass
+    def want_who(self, channel: str) -> bool:
+        pass
+    def tracking_level(self, channel: str) -> TrackingLevel:
+        pass
+    def warm_start(self,
+            channels: Dict[str, Any],
+            users:    Dict[str, Any]):
+        pass
+
+    async def attach(self,
+            reader: ITCPReader,
+            writer: ITCPWriter,
+            params: ConnectionParams,
+            state:  Dict[str, Any],
+            unread: bytes=b"",
+            unsent: bytes=b""):
+        pass
+    async def drain(self):
+        pass
+    def detach(self) -> Tuple[int, bytes, bytes]:
+        pass
+    async def channels_synced(self, count: int, seconds: float):
+        pass
+    def sync_progress(self) -> Tuple[int, int]:
+        pass
+    def casefold_hit_rate(self) -> float:
+        pass
 
     def cap_agreed(self, capability: ICapability) -> bool:
         pass
@@ -137,6 +195,11 @@ class IBot(object):
 
     async def disconnect(self, server: IServer):
         pass
+    async def reconnect(self, server: IServer):
+        pass
+
+    async def sts_policy(self, hostname: str, sts: STSPolicy):
+        pass
 
     async def add_server(self, name: str, params: ConnectionParams) -> IServer:
         pass
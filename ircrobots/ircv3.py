@@ -68,6 +68,9 @@ CAP_ECHO   = Capability("echo-message")
 CAP_STS    = Capability("sts", "draft/sts")
 CAP_RESUME = Capability(None, "draft/resume-0.5", alias="resume")
 
+CAP_MULTILINE = Capability(None, "draft/multiline", alias="multiline")
+MULTILINE_CONCAT_TAG = "draft/multiline-concat"
+
 CAP_LABEL  = Capability("labeled-response", "draft/labeled-response-0.2")
 TAG_LABEL  = MessageTag("label", "draft/label")
 LABEL_TAG_MAP = {
@@ -88,6 +91,7 @@ CAPS: List[ICapability] = [
     Capability("message-tags", "draft/message-tags-0.2"),
     Capability("cap-notify"),
     Capability("batch"),
+    CAP_LABEL,
 
     Capability(None, "draft/rename", alias="rename"),
     Capability("setname", "draft/setname"),
@@ -185,8 +189,9 @@ class CAPContext(ServerContext):
                     params.port = int(sts_dict["port"])
                     params.tls  = TLSVerifyChain()
 
-                    await self.server.bot.disconnect(self.server)
-                    await self.server.bot.add_server(self.server.name, params)
+                    # the bot reconnects us; this task doesn't survive
+                    # the disconnect
+                    await self.server.bot.reconnect(self.server)
                     raise ServerDisconnectedException()
 
             elif "duration" in sts_dict:
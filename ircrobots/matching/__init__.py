@@ -1,3 +1,4 @@
 
 from .responses import *
 from .params    import *
+from .compiled  import *
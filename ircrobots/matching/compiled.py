@@ -0,0 +1,133 @@
+from typing      import Dict, List, Optional, Sequence, Set, Tuple
+from irctokens   import Line
+from ..interface import (IServer, IMatchResponse, IMatchResponseParam,
+    IMatchResponseHostmask)
+from .params     import Any, Literal, Self, Not, Folded, Formatless, Regex
+from .responses  import Responses, ResponseOr
+
+# rough relative cost of checking a param; cheapest are checked first.
+# `Any` is dropped entirely and `Literal`s are hashed
+_COSTS: Dict[type, int] = {
+    Self:       1,
+    Folded:     2,
+    Not:        3,
+    Formatless: 4,
+    Regex:      5,
+}
+_COST_DEFAULT = 3
+
+class _Compiled(object):
+    def __init__(self,
+            min_params: int,
+            checks:     List[Tuple[int, IMatchResponseParam]],
+            source:     Optional[IMatchResponseHostmask]):
+        self.min_params = min_params
+        self.checks     = checks
+        self.source     = source
+
+    def match(self, server: IServer, line: Line) -> bool:
+        if len(line.params) < self.min_params:
+            return False
+        for i, param in self.checks:
+            if not param.match(server, line.params[i]):
+                return False
+        if self.source is not None:
+            return (line.hostmask is not None and
+                self.source.match(server, line.hostmask))
+        return True
+
+# (param index, casefolded?)
+TYPE_KEY   = Tuple[Tuple[int, bool], ...]
+TYPE_TABLE = Dict[str, Dict[TYPE_KEY, Dict[Tuple[str, ...], List[_Compiled]]]]
+class CompiledResponses(IMatchResponse):
+    # a set of `Response`/`Responses` compiled in to a command-keyed
+    # dispatch table. within a command, responses are grouped by which
+    # params are literals (or `Folded` literals) so a line's literal params
+    # can be looked up with one hash. anything that isn't a `Responses` is
+    # checked as-is
+    def __init__(self, *responses: IMatchResponse):
+        self._responses = responses
+        self._specs: List[
+            Tuple[Sequence[str], TYPE_KEY, List[str], _Compiled]] = []
+        self._other: List[IMatchResponse] = []
+        # built lazily, per casemapping
+        self._tables: Dict[object, TYPE_TABLE] = {}
+
+        for response in responses:
+            self._add(response)
+
+    def __repr__(self) -> str:
+        return f"CompiledResponses({self._responses!r})"
+
+    def _add(self, response: IMatchResponse):
+        if isinstance(response, (ResponseOr, CompiledResponses)):
+            for child in response._responses:
+                self._add(child)
+        elif isinstance(response, Responses):
+            key:    List[Tuple[int, bool]] = []
+            values: List[str] = []
+            checks: List[Tuple[int, IMatchResponseParam]] = []
+            for i, param in enumerate(response._params):
+                if type(param) == Literal:
+                    key.append((i, False))
+                    values.append(param._value)
+                elif (type(param) == Folded and
+                        type(param._value) == Literal):
+                    key.append((i, True))
+                    values.append(param._value._value)
+                elif not type(param) == Any:
+                    checks.append((i, param))
+            checks.sort(key=lambda c: _COSTS.get(type(c[1]), _COST_DEFAULT))
+
+            compiled = _Compiled(len(response._params), checks,
+                response._source)
+            self._specs.append(
+                (response._commands, tuple(key), values, compiled))
+        else:
+            self._other.append(response)
+
+    def _table(self, server: IServer) -> TYPE_TABLE:
+        casemapping = server.isupport.casemapping
+        if not casemapping in self._tables:
+            table: TYPE_TABLE = {}
+            for commands, key, values, compiled in self._specs:
+                folded_values = tuple(
+                    server.casefold(v) if folded else v
+                    for (_, folded), v in zip(key, values))
+                for command in commands:
+                    table.setdefault(command, {}
+                        ).setdefault(key, {}
+                        ).setdefault(folded_values, []).append(compiled)
+            self._tables[casemapping] = table
+        return self._tables[casemapping]
+
+    def commands(self) -> Optional[Set[str]]:
+        commands: Set[str] = set()
+        for spec_commands, _, _, _ in self._specs:
+            commands.update(spec_commands)
+        for response in self._other:
+            other_commands = response.commands()
+            if other_commands is None:
+                return None
+            commands |= other_commands
+        return commands
+
+    def match(self, server: IServer, line: Line) -> bool:
+        by_key = self._table(server).get(line.command)
+        if by_key is not None:
+            param_count = len(line.params)
+            for key, by_values in by_key.items():
+                if key and key[-1][0] >= param_count:
+                    continue
+                values = tuple(
+                    server.casefold(line.params[i]) if folded
+                    else line.params[i]
+                    for i, folded in key)
+                for compiled in by_values.get(values, ()):
+                    if compiled.match(server, line):
+                        return True
+
+        for response in self._other:
+            if response.match(server, line):
+                return True
+        return False
@@ -1,9 +1,9 @@
 from re           import compile as re_compile
-from typing       import Optional, Pattern, Union
+from typing       import Iterable, List, Optional, Pattern, Union
 from irctokens    import Hostmask
 from ..interface  import (IMatchResponseParam, IMatchResponseValueParam,
     IMatchResponseHostmask, IServer)
-from ..glob       import Glob, compile as glob_compile
+from ..glob       import Glob, GlobSet, compile as glob_compile
 from .. import formatting
 
 class Any(IMatchResponseParam):
@@ -115,10 +115,40 @@ class Nick(IMatchResponseHostmask):
 class Mask(IMatchResponseHostmask):
     def __init__(self, mask: str):
         self._mask = mask
-        self._compiled: Optional[Glob]
+        self._compiled: Optional[Glob] = None
     def __repr__(self) -> str:
         return f"Mask({self._mask!r})"
     def match(self, server: IServer, hostmask: Hostmask):
         if self._compiled is None:
             self._compiled = glob_compile(self._mask)
         return self._compiled.match(str(hostmask))
+
+class Masks(IMatchResponseHostmask):
+    # any of a (potentially long) list of masks, e.g. bans or ignores.
+    # casefolded with the server's casemapping
+    def __init__(self, masks: Iterable[str]):
+        self._masks = list(masks)
+        self._set: Optional[GlobSet] = None
+    def __repr__(self) -> str:
+        return f"Masks({self._masks!r})"
+
+    def add(self, mask: str):
+        self._masks.append(mask)
+        if not self._set is None:
+            self._set.add(mask)
+    def remove(self, mask: str):
+        self._masks.remove(mask)
+        if not self._set is None and not mask in self._masks:
+            self._set.remove(mask)
+
+    def _globs(self, server: IServer) -> GlobSet:
+        casemap = server.isupport.casemapping
+        if self._set is None or not self._set.casemap == casemap:
+            self._set = GlobSet(self._masks, casemap)
+        return self._set
+
+    def matches(self, server: IServer, hostmask: Hostmask) -> List[str]:
+        # every one of our masks that matches `hostmask`
+        return self._globs(server).match(str(hostmask))
+    def match(self, server: IServer, hostmask: Hostmask):
+        return self._globs(server).any(str(hostmask))
@@ -1,4 +1,4 @@
-from typing      import List, Optional, Sequence, Union
+from typing      import List, Optional, Sequence, Set, Union
 from irctokens   import Line
 from ..interface import (IServer, IMatchResponse, IMatchResponseParam,
     IMatchResponseHostmask)
@@ -23,6 +23,9 @@ class Responses(IMatchResponse):
     def __repr__(self) -> str:
         return f"Responses({self._commands!r}: {self._params!r})"
 
+    def commands(self) -> Optional[Set[str]]:
+        return set(self._commands)
+
     def match(self, server: IServer, line: Line) -> bool:
         for command in self._commands:
             if (line.command == command and (
@@ -55,6 +58,15 @@ class ResponseOr(IMatchResponse):
         self._responses = responses
     def __repr__(self) -> str:
         return f"ResponseOr({self._responses!r})"
+
+    def commands(self) -> Optional[Set[str]]:
+        commands: Set[str] = set()
+        for response in self._responses:
+            response_commands = response.commands()
+            if response_commands is None:
+                return None
+            commands |= response_commands
+        return commands
     def match(self, server: IServer, line: Line) -> bool:
         for response in self._responses:
             if response.match(server, line):
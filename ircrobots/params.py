@@ -1,6 +1,7 @@
 from re          import compile as re_compile
-from typing      import List, Optional
+from typing      import Dict, List, Optional
 from dataclasses import dataclass, field
+from enum        import Enum
 
 from .security import TLS, TLSNoVerify, TLSVerifyChain
 
@@ -31,6 +32,29 @@ class ResumePolicy(object):
     address: str
     token:   str
 
+@dataclass
+class ThrottleProfile(object):
+    rate:   int   # lines
+    period: float # seconds
+    burst:  int   # lines we can save up and send at once
+
+class SendQueuePolicy(Enum):
+    # what `send()` does when the send queue is full. either way, it's
+    # decided when `send()` is called, not when it's awaited
+    WAIT     = 1 # holds the line back until there's room to queue it;
+                 # senders that await `send()` are held up until it's
+                 # sent. lines held back still take up memory, so senders
+                 # that don't await `send()` want DROP_LOW or RAISE
+    DROP_LOW = 2 # drops the oldest queued LOW priority line to make room,
+                 # or raises SendQueueFullError if there isn't one
+    RAISE    = 3 # raises SendQueueFullError
+
+class TrackingLevel(Enum):
+    # how much we keep track of about a channel's members
+    NONE  = 1 # only ourselves
+    NAMES = 2 # who's in the channel and their status, from NAMES
+    FULL  = 3 # everything; NAMES, WHO and list modes (e.g. bans)
+
 RE_IPV6HOST = re_compile(r"\[([a-fA-F0-9:]+)\]")
 
 _TLS_TYPES = {
@@ -55,9 +79,42 @@ class ConnectionParams(object):
     resume: Optional[ResumePolicy] = None
 
     reconnect:     int = 10 # seconds
+    # servers with more weight reconnect first after a netsplit
+    weight:        int = 0
+    # file to keep a snapshot of our state in, for a faster restart
+    snapshot:          Optional[str] = None
+    snapshot_interval: float = 60 # seconds
+    # read from the socket straight in to a reusable buffer, with
+    # transports that can (e.g. `LineTransport`)
+    read_buffer:   bool = False
+    # most lines to write to the socket at once
+    send_batch:    int = 5
+
+    # how much we'll queue up before `sendq_policy` kicks in. control lines
+    # (SendPriority.HIGH) are always queued
+    sendq_lines:  Optional[int] = None
+    sendq_bytes:  Optional[int] = None
+    sendq_policy: SendQueuePolicy = SendQueuePolicy.WAIT
+
+    # after registration. `None` picks by network or a safe default
+    throttle:        Optional[ThrottleProfile] = None
+    # once we're an oper, and so likely to be flood-exempt
+    throttle_exempt: Optional[ThrottleProfile] = None
     alt_nicknames: List[str] = field(default_factory=list)
 
+    # "#channel" or "#channel key"
     autojoin:  List[str] = field(default_factory=list)
+    # how many autojoin JOIN lines can be waiting on the server at once
+    join_window: int = 2
+
+    # how many channel WHOs can be waiting on the server at once, and
+    # roughly how many bytes of replies they can add up to
+    who_window: int = 4
+    who_budget: int = 131072
+
+    # per-channel tracking levels, falling back to `tracking`
+    tracking:         TrackingLevel = TrackingLevel.FULL
+    channel_tracking: Dict[str, TrackingLevel] = field(default_factory=dict)
 
     @staticmethod
     def from_hoststring(
@@ -173,7 +173,7 @@ class SASLContext(ServerContext):
         line = await self.server.wait_for(AUTHENTICATE_ANY)
 
         server_first = _b64db(line.params[0])
-        client_final = _b64eb(scram.server_first(server_first))
+        client_final = _b64eb(await scram.server_first_async(server_first))
         if not client_final == "":
             await self._send_auth_text(client_final)
             line = await self.server.wait_for(AUTHENTICATE_ANY)
@@ -0,0 +1,67 @@
+import asyncio, random
+from time   import monotonic
+from typing import List, Optional, Tuple
+
+JITTER = 0.5 # +/- this much of a delay, at random
+
+def jitter(delay: float) -> float:
+    return delay*random.uniform(1-JITTER, 1+JITTER)
+
+class _Waiting(object):
+    def __init__(self, name: str, weight: int, due: float):
+        self.name   = name
+        self.weight = weight
+        self.due    = due
+
+class ConnectScheduler(object):
+    # bot-wide limit on how many servers can be connecting at once, so
+    # that losing a hub doesn't mean every server reconnects at the same
+    # moment. servers that are due go heaviest `weight` first, then the
+    # longest waiting
+    def __init__(self, concurrency: int=4):
+        self.concurrency = concurrency
+        self._active     = 0
+        self._waiting: List[_Waiting] = []
+        self._changed    = asyncio.Event()
+
+    def active(self) -> int:
+        return self._active
+
+    def queue(self) -> List[Tuple[str, int, float]]:
+        # (name, weight, seconds until due) for everyone waiting to connect,
+        # next up first
+        now = monotonic()
+        return [(w.name, w.weight, max(0.0, w.due-now))
+            for w in sorted(self._waiting, key=lambda w: self._order(w, now))]
+
+    def _order(self, waiting: _Waiting, now: float) -> Tuple[bool, int, float]:
+        return (waiting.due > now, -waiting.weight, waiting.due)
+
+    def _next(self) -> Optional[_Waiting]:
+        now = monotonic()
+        due = [w for w in self._waiting if w.due <= now]
+        if due:
+            return min(due, key=lambda w: self._order(w, now))
+        return None
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def acquire(self, name: str, weight: int=0, delay: float=0):
+        waiting = _Waiting(name, weight, monotonic()+delay)
+        self._waiting.append(waiting)
+        try:
+            if delay > 0:
+                await asyncio.sleep(delay)
+            while (self._active >= self.concurrency or
+                    not self._next() is waiting):
+                await self._changed.wait()
+            self._active += 1
+        finally:
+            self._waiting.remove(waiting)
+            self._notify()
+
+    def release(self):
+        self._active -= 1
+        self._notify()
@@ -1,6 +1,6 @@
-import base64, hashlib, hmac, os
+import asyncio, base64, hashlib, hmac, os
 from enum import Enum
-from typing import Dict
+from typing import Dict, Optional, Tuple
 
 # IANA Hash Function Textual Names
 # https://tools.ietf.org/html/rfc5802#section-4
@@ -27,6 +27,27 @@ SCRAM_ERRORS = [
     "no-resources"
 ]
 
+# (algorithm, password, salt, iterations) -> (ClientKey, ServerKey).
+# RFC 5802 lets a client keep these rather than redo the PBKDF2 work on
+# every login, so reconnects don't pay for it again
+_KeyId = Tuple[SCRAMAlgorithm, bytes, bytes, int]
+_KEYS: Dict[_KeyId, Tuple[bytes, bytes]] = {}
+KEY_CACHE_MAX = 64
+
+def _scram_keys(key_id: _KeyId) -> Tuple[bytes, bytes]:
+    algo, password, salt, iterations = key_id
+    salted_password = hashlib.pbkdf2_hmac(algo.value,
+        password, salt, iterations, dklen=None)
+    return (
+        hmac.new(salted_password, b"Client Key", algo.value).digest(),
+        hmac.new(salted_password, b"Server Key", algo.value).digest()
+    )
+def _cache_keys(key_id: _KeyId, keys: Tuple[bytes, bytes]):
+    while len(_KEYS) >= KEY_CACHE_MAX:
+        # forget the oldest
+        del _KEYS[next(iter(_KEYS))]
+    _KEYS[key_id] = keys
+
 def _scram_nonce() -> bytes:
     return base64.b64encode(os.urandom(32))
 def _scram_escape(s: bytes) -> bytes:
@@ -62,7 +83,7 @@ class SCRAMContext(object):
         self._client_first    = b""
         self._client_nonce    = b""
 
-        self._salted_password = b""
+        self._server_key      = b""
         self._auth_message    = b""
 
     def _get_pieces(self, data: bytes) -> Dict[bytes, bytes]:
@@ -102,27 +123,56 @@ class SCRAMContext(object):
         else:
             return False
 
-    def server_first(self, data: bytes) -> bytes:
+    def _parse_first(self, data: bytes) -> Optional[Tuple[bytes, _KeyId]]:
+        # (nonce, key id), or None if the server's first message failed us
         self.state = SCRAMState.CLIENT_FINAL
 
         pieces = self._get_pieces(data)
         if self._assert_error(pieces):
-            return b""
+            return None
 
         nonce = pieces[b"r"] # server combines your nonce with it's own
         if (not nonce.startswith(self._client_nonce) or
                 nonce == self._client_nonce):
             self._fail("nonce-unacceptable")
-            return b""
+            return None
 
         salt = base64.b64decode(pieces[b"s"]) # salt is b64encoded
         iterations = int(pieces[b"i"])
+        return nonce, (self._algo, self._password, salt, iterations)
 
-        salted_password = hashlib.pbkdf2_hmac(self._algo.value,
-            self._password, salt, iterations, dklen=None)
-        self._salted_password = salted_password
-
-        client_key = self._hmac(salted_password, b"Client Key")
+    def server_first(self, data: bytes) -> bytes:
+        first = self._parse_first(data)
+        if first is None:
+            return b""
+        nonce, key_id = first
+
+        keys = _KEYS.get(key_id)
+        if keys is None:
+            keys = _scram_keys(key_id)
+            _cache_keys(key_id, keys)
+        return self._client_final(data, nonce, keys)
+
+    async def server_first_async(self, data: bytes) -> bytes:
+        # as `server_first()`, but with PBKDF2 (tens of milliseconds at
+        # high iteration counts) run off the event loop
+        first = self._parse_first(data)
+        if first is None:
+            return b""
+        nonce, key_id = first
+
+        keys = _KEYS.get(key_id)
+        if keys is None:
+            loop = asyncio.get_running_loop()
+            keys = await loop.run_in_executor(None, _scram_keys, key_id)
+            _cache_keys(key_id, keys)
+        return self._client_final(data, nonce, keys)
+
+    def _client_final(self,
+            data:  bytes,
+            nonce: bytes,
+            keys:  Tuple[bytes, bytes]) -> bytes:
+        client_key, self._server_key = keys
         stored_key = self._hash(client_key)
 
         channel = base64.b64encode(b"n,,")
@@ -144,8 +194,7 @@ class SCRAMContext(object):
 
         verifier = base64.b64decode(pieces[b"v"])
 
-        server_key = self._hmac(self._salted_password, b"Server Key")
-        server_signature = self._hmac(server_key, self._auth_message)
+        server_signature = self._hmac(self._server_key, self._auth_message)
 
         if server_signature == verifier:
             self.state = SCRAMState.SUCCESS
@@ -1,6 +1,8 @@
 import ssl
+from contextvars import ContextVar
 from dataclasses import dataclass
-from typing import Optional, Tuple
+from time        import perf_counter
+from typing      import Dict, Optional, Tuple
 
 @dataclass
 class TLS:
@@ -21,9 +23,57 @@ class TLSVerifyHash(TLSNoVerify):
 class TLSVerifySHA512(TLSVerifyHash):
     pass
 
-def tls_context(verify: bool=True) -> ssl.SSLContext:
-    ctx = ssl.create_default_context()
-    if not verify:
-        ctx.check_hostname = False
-        ctx.verify_mode = ssl.CERT_NONE
-    return ctx
+class TLSConnect(object):
+    # the connection a `TLSContext` is wrapping a socket for
+    def __init__(self, hostname: str, port: int):
+        self.key     = (hostname, port)
+        self.started: Optional[float] = None
+# set by whoever's connecting, as `wrap_bio()` doesn't get told
+TLS_CONNECT: "ContextVar[Optional[TLSConnect]]" = ContextVar(
+    "TLS_CONNECT", default=None)
+
+class TLSContext(ssl.SSLContext):
+    # offers the session from our last connection to the same host and
+    # port, so that the server can skip a full handshake
+    def __init__(self, protocol: int):
+        super().__init__()
+        self._last: Dict[Tuple[str, int], ssl.SSLObject] = {}
+
+    def wrap_bio(self, *args, **kwargs) -> ssl.SSLObject: # type: ignore
+        connect = TLS_CONNECT.get()
+        if connect is not None:
+            connect.started = perf_counter()
+            last = self._last.get(connect.key)
+            if (last is not None and
+                    kwargs.get("session") is None and
+                    last.session is not None and
+                    last.session.has_ticket):
+                kwargs["session"] = last.session
+
+        sslobj = super().wrap_bio(*args, **kwargs)
+        if connect is not None:
+            # TLSv1.3 tickets turn up after the handshake, so hold on to
+            # the object rather than its session as it is now
+            self._last[connect.key] = sslobj
+        return sslobj
+
+# (verify, client keypair) -> context. loading CAs isn't cheap
+_CONTEXTS: Dict[Tuple[bool, Optional[Tuple[str, str]]], ssl.SSLContext] = {}
+
+def tls_context(
+        verify:         bool=True,
+        client_keypair: Optional[Tuple[str, str]]=None
+        ) -> ssl.SSLContext:
+    key = (verify, client_keypair)
+    if not key in _CONTEXTS:
+        ctx = TLSContext(ssl.PROTOCOL_TLS_CLIENT)
+        if verify:
+            ctx.load_default_certs(ssl.Purpose.SERVER_AUTH)
+        else:
+            ctx.check_hostname = False
+            ctx.verify_mode = ssl.CERT_NONE
+        if client_keypair is not None:
+            client_cert, client_key = client_keypair
+            ctx.load_cert_chain(client_cert, keyfile=client_key)
+        _CONTEXTS[key] = ctx
+    return _CONTEXTS[key]
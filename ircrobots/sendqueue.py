@@ -0,0 +1,266 @@
+from asyncio     import Event, QueueEmpty
+from collections import deque
+from time        import monotonic
+from typing      import Callable, Deque, Dict, Hashable, Optional, Set, Tuple
+
+from irctokens   import Line
+from .interface  import SentLine, SendPriority
+
+AGE_TIME = 30 # seconds a line can wait before it moves up a priority level
+
+TARGETED = {"PRIVMSG", "NOTICE", "TAGMSG", "MODE", "KICK", "TOPIC", "INVITE"}
+def line_target(line: Line) -> str:
+    if line.command in TARGETED and line.params:
+        return line.params[0].lower()
+    else:
+        return ""
+
+class SendExpiredError(Exception):
+    pass
+class SendQueueFullError(Exception):
+    pass
+
+class _Level(object):
+    def __init__(self):
+        # FIFO for each target, with targets taking turns
+        self.targets: Dict[str, Deque[Tuple[float, SentLine]]] = {}
+        self.order:   Deque[str] = deque()
+        # every line in the order it arrived, for aging
+        self.arrivals: Deque[Tuple[float, str, SentLine]] = deque()
+        self.served:   Set[int] = set()
+        # the target each queued line (by id) is queued under
+        self.queued:   Dict[int, str] = {}
+
+    def put(self, target: str, line: SentLine, now: float):
+        if not target in self.targets:
+            self.targets[target] = deque()
+            self.order.append(target)
+        self.targets[target].append((now, line))
+        self.arrivals.append((now, target, line))
+        self.queued[line.id] = target
+
+    def oldest(self) -> float:
+        return self.arrivals[0][0]
+
+    def _served(self, target: str, line: SentLine):
+        if not self.targets[target]:
+            del self.targets[target]
+            self.order.remove(target)
+        del self.queued[line.id]
+
+        self.served.add(line.id)
+        # forget `arrivals` up to the first line that's still queued
+        while self.arrivals and self.arrivals[0][2].id in self.served:
+            self.served.remove(self.arrivals.popleft()[2].id)
+
+    def _pop(self, target: str) -> SentLine:
+        _, line = self.targets[target].popleft()
+        self._served(target, line)
+        return line
+
+    def remove(self, line: SentLine) -> bool:
+        target = self.queued.get(line.id)
+        if target is None:
+            return False
+        lines = self.targets[target]
+        for i, (_, queued) in enumerate(lines):
+            if queued is line:
+                del lines[i]
+                break
+        self._served(target, line)
+        return True
+
+    def pop_next(self) -> SentLine:
+        target = self.order[0]
+        self.order.rotate(-1)
+        return self._pop(target)
+
+    def pop_oldest(self) -> SentLine:
+        self.oldest()
+        return self._pop(self.arrivals[0][1])
+
+class SendQueue(object):
+    # lines are sent highest priority first. within a priority, targets
+    # take turns and each target's lines stay in order. lines that have
+    # waited longer than `AGE_TIME` move up one level, where they take
+    # turns with that level's lines - but never with HIGH.
+    # lines given to `put_wait()` are held back, in order, until there's
+    # room for them; they don't count towards `qsize()` or `qbytes()`
+    def __init__(self,
+            max_lines: Optional[int]=None,
+            max_bytes: Optional[int]=None):
+        self.max_lines = max_lines
+        self.max_bytes = max_bytes
+
+        self._levels: Dict[int, _Level] = {}
+        self._size    = 0
+        self._bytes   = 0
+        self._waiting = Event()
+        self._pending: Dict[Hashable, SentLine] = {}
+        # open batches, and the target their lines are queued under
+        self._batches: Dict[str, str] = {}
+        self._aged_turn = False
+        self._waiting_room: Deque[SentLine] = deque()
+
+    def qsize(self) -> int:
+        return self._size
+    def qbytes(self) -> int:
+        return self._bytes
+    def empty(self) -> bool:
+        return self._size == 0
+    def full(self, byte_count: int=0) -> bool:
+        # would adding `byte_count` more bytes put us over our limits?
+        return ((self.max_lines is not None and
+                self._size >= self.max_lines) or
+            (self.max_bytes is not None and
+                (self._bytes+byte_count) > self.max_bytes))
+
+    def waiting_room(self) -> int:
+        # lines held back by `put_wait()`
+        return len(self._waiting_room)
+
+    def pending(self, key: Hashable) -> Optional[SentLine]:
+        return self._pending.get(key)
+
+    def in_batch(self, line: Line) -> bool:
+        # is `line` the rest (or the end) of a batch we've started queuing?
+        if (line.command == "BATCH" and
+                line.params and
+                line.params[0].startswith("-")):
+            return line.params[0][1:] in self._batches
+        elif line.tags and "batch" in line.tags:
+            return line.tags["batch"] in self._batches
+        else:
+            return False
+
+    def _target(self, line: Line) -> str:
+        # a batch's lines all queue behind each other so that nothing for
+        # the same target can land in the middle of it
+        if line.command == "BATCH" and line.params:
+            ref = line.params[0][1:]
+            if line.params[0].startswith("+"):
+                # `BATCH +ref type [target ...]`
+                target = line.params[2].lower() if len(line.params) > 2 else ""
+                self._batches[ref] = target
+                return target
+            else:
+                return self._batches.pop(ref, "")
+        elif line.tags and line.tags.get("batch") in self._batches:
+            return self._batches[line.tags["batch"]]
+        else:
+            return line_target(line)
+
+    def put_nowait(self, line: SentLine):
+        if line.key is not None:
+            self._pending[line.key] = line
+
+        if not line.priority in self._levels:
+            self._levels[line.priority] = _Level()
+        self._levels[line.priority].put(
+            self._target(line.line), line, monotonic())
+        self._size  += 1
+        self._bytes += len(line.encoded)
+        self._waiting.set()
+
+    def put_wait(self, line: SentLine):
+        # queue `line` once there's room, after anything else waiting
+        if line.key is not None:
+            self._pending[line.key] = line
+        self._waiting_room.append(line)
+        self._make_room()
+    def _make_room(self):
+        while self._waiting_room:
+            line = self._waiting_room[0]
+            if line.future.done():
+                # (expired)
+                self._waiting_room.popleft()
+            elif self.full(len(line.encoded)):
+                break
+            else:
+                self.put_nowait(self._waiting_room.popleft())
+
+    def remove(self, line: SentLine) -> bool:
+        # take `line` out of the queue (or the waiting room), if it's there
+        level = self._levels.get(line.priority)
+        if level is not None and level.remove(line):
+            self._forget(line)
+            return True
+        elif line in self._waiting_room:
+            self._waiting_room.remove(line)
+            if self._pending.get(line.key) is line:
+                del self._pending[line.key]
+            return True
+        return False
+
+    def drop_oldest(self, priority: int, error: Exception) -> bool:
+        # drop the oldest line at `priority` or lower, failing its future
+        for level_priority in sorted(self._levels, reverse=True):
+            if level_priority < priority:
+                break
+            line = self._levels[level_priority].pop_oldest()
+            self._forget(line)
+            if not line.future.done():
+                line.future.set_exception(error)
+            return True
+        return False
+
+    def get_nowait(self) -> SentLine:
+        while self._size:
+            line = self._pop()
+            if (line.deadline is not None and
+                    line.deadline <= monotonic()):
+                expire(line)
+            else:
+                return line
+        raise QueueEmpty()
+
+    def _forget(self, line: SentLine):
+        if not self._levels[line.priority].targets:
+            del self._levels[line.priority]
+        if (line.key is not None and
+                self._pending.get(line.key) is line):
+            # (an expired line's key may have been taken by a new line)
+            del self._pending[line.key]
+
+        self._size  -= 1
+        self._bytes -= len(line.encoded)
+        self._make_room()
+
+    def _pop(self) -> SentLine:
+        priorities = sorted(self._levels)
+        level      = self._levels[priorities[0]]
+
+        line: Optional[SentLine] = None
+        if priorities[0] > SendPriority.HIGH and len(priorities) > 1:
+            aged = self._levels[priorities[1]]
+            if (monotonic()-aged.oldest()) >= AGE_TIME:
+                self._aged_turn = not self._aged_turn
+                if self._aged_turn:
+                    line = aged.pop_oldest()
+        if line is None:
+            line = level.pop_next()
+
+        self._forget(line)
+        return line
+
+    async def get(self) -> SentLine:
+        while True:
+            while not self._size:
+                self._waiting.clear()
+                await self._waiting.wait()
+            try:
+                return self.get_nowait()
+            except QueueEmpty:
+                # everything we had expired
+                pass
+
+def expired(line: SentLine) -> bool:
+    return (line.future.done() or
+        (line.deadline is not None and line.deadline <= monotonic()))
+
+def expire(line: SentLine):
+    if not line.future.done():
+        line.future.set_exception(
+            SendExpiredError(f"line expired before it was sent: {line.id}"))
+        # nobody has to await a line they sent and forgot about
+        line.future.exception()
@@ -1,37 +1,83 @@
 import asyncio
-from asyncio     import Future, PriorityQueue
-from typing      import (AsyncIterable, Awaitable, Deque, Dict, Iterable, List,
-    Optional, Set, Tuple, Union)
+from asyncio     import Event, Future, Queue, QueueEmpty
+from typing      import (Any, AsyncIterable, Awaitable, Deque, Dict, Hashable,
+    Iterable, List, Optional, Set, Tuple, Union, cast)
 from collections import deque
 from time        import monotonic
+from weakref     import WeakKeyDictionary
 
 import anyio
 from asyncio_rlock      import RLock
-from asyncio_throttle   import Throttler
 from async_timeout      import timeout as timeout_
 from ircstates          import Emit, Channel, ChannelUser
+from ircstates.casemap  import CaseMap, casefold
 from ircstates.numerics import *
 from ircstates.server   import ServerDisconnectedException
 from ircstates.names    import Name
 from irctokens          import build, Line, tokenise
 
 from .ircv3     import (CAPContext, sts_transmute, CAP_ECHO, CAP_SASL,
-    CAP_LABEL, LABEL_TAG_MAP, resume_transmute)
+    CAP_LABEL, LABEL_TAG_MAP, resume_transmute, CAP_MULTILINE,
+    MULTILINE_CONCAT_TAG)
 from .sasl      import SASLContext, SASLResult
 from .matching  import (ResponseOr, Responses, Response, ANY, SELF, MASK_SELF,
     Folded)
-from .asyncs    import MaybeAwait, WaitFor
+from .asyncs    import (MaybeAwait, WaitFor, WaitForRegistry, LabelRegistry,
+    TEvent)
 from .struct    import Whois
-from .params    import ConnectionParams, SASLParams, STSPolicy, ResumePolicy
+from .snapshot  import USER_KEYS, load_state
+from .          import formatting
+from .sendqueue import (SendQueue, SendQueueFullError, expire as expire_line,
+    expired)
+from .window    import Window
+from .params    import (ConnectionParams, SASLParams, STSPolicy, ResumePolicy,
+    SendQueuePolicy, ThrottleProfile, TrackingLevel)
 from .interface import (IBot, ICapability, IServer, SentLine, SendPriority,
     IMatchResponse)
-from .interface import ITCPTransport, ITCPReader, ITCPWriter
+from .interface import (ITCPTransport, ITCPReader, ITCPBufferReader,
+    ITCPWriter)
 
 THROTTLE_RATE = 4  # lines
 THROTTLE_TIME = 2  # seconds
+THROTTLE_DEFAULT = ThrottleProfile(THROTTLE_RATE, THROTTLE_TIME, THROTTLE_RATE)
+# by casefolded ISUPPORT NETWORK, used when ConnectionParams.throttle is None.
+# roughly what each lets an ordinary client get away with
+THROTTLE_PROFILES: Dict[str, ThrottleProfile] = {
+    "libera.chat": ThrottleProfile(1, 1, 5),
+    "oftc":        ThrottleProfile(1, 1, 5),
+    "efnet":       ThrottleProfile(1, 1, 5),
+    "ircnet":      ThrottleProfile(1, 2, 5),
+    "quakenet":    ThrottleProfile(1, 2, 5),
+}
+
+BACKOFF_TIME  = 30 # seconds
+# how long we go slower after being disconnected for "Excess Flood"
+FLOOD_BACKOFF_TIME = 300 # seconds
+BACKOFF_MAX   = 8  # how many times slower we'll go
 PING_TIMEOUT  = 60 # seconds
 WAIT_TIMEOUT  = 20 # seconds
 
+LINE_MAX      = 512   # bytes, including \r\n
+USERLEN       = 10    # when ISUPPORT doesn't tell us
+HOSTLEN       = 63    # when we don't know our own hostname
+
+WHO_LINE_SIZE = 100   # bytes, a guess at the size of a WHO reply line
+JOIN_TIMEOUT  = 30    # seconds we'll wait to hear back about a JOIN line
+WHO_TIMEOUT   = 60    # seconds we'll wait for the end of a WHO
+
+READ_SIZE_MIN = 1024  # bytes
+READ_SIZE_MAX = 65536 # bytes
+
+CASEFOLD_MAX  = 100000 # names we keep casefolded
+
+ERR_TARGETTOOFAST = "439"
+ERR_TARGCHANGE    = "707"
+# "slow down" numerics
+FLOOD_NUMERICS = {RPL_TRYAGAIN, ERR_TARGETTOOFAST, ERR_TARGCHANGE}
+
+# lines that can add other users to a channel's member list
+MEMBER_COMMANDS = {"JOIN", "PART", "KICK", "MODE", RPL_NAMREPLY}
+
 JOIN_ERR_FIRST = [
     ERR_NOSUCHCHANNEL,
     ERR_BADCHANNAME,
@@ -44,6 +90,90 @@ JOIN_ERR_FIRST = [
     ERR_THROTTLE
 ]
 
+def _in_batch(line: Line) -> bool:
+    # a line inside a batch, or the end of one
+    return ((line.command == "BATCH" and
+            bool(line.params) and
+            line.params[0].startswith("-")) or
+        (line.tags is not None and "batch" in line.tags))
+
+class TokenBucket(object):
+    # `rate_limit` tokens every `period` seconds, saving up to `burst` of
+    # them. `backoff()` slows the refill for a while when the server tells
+    # us we're going too fast
+    def __init__(self,
+            rate_limit: int,
+            period:     float,
+            burst:      Optional[int]=None):
+        self.rate_limit = rate_limit
+        self.period     = period
+        self.burst      = burst or rate_limit
+
+        self._tokens     = float(self.burst)
+        self._last       = monotonic()
+        self._slow       = 1
+        self._slow_until = 0.0
+
+    def _refill(self) -> float:
+        now  = monotonic()
+        rate = self.rate_limit/self.period
+        if now < self._slow_until:
+            rate /= self._slow
+        else:
+            self._slow = 1
+
+        self._tokens = min(
+            float(self.burst), self._tokens+((now-self._last)*rate))
+        self._last   = now
+        return rate
+
+    def available(self) -> int:
+        self._refill()
+        return int(self._tokens)
+
+    def set_rate(self, rate_limit: int, period: float, burst: Optional[int]):
+        # tokens earned at the old rate are kept
+        self._refill()
+        self.rate_limit = rate_limit
+        self.period     = period
+        self.burst      = burst or rate_limit
+        self._tokens    = min(self._tokens, float(self.burst))
+
+    async def acquire_many(self, count: int) -> int:
+        while True:
+            rate = self._refill()
+            if self._tokens >= 1:
+                granted = min(count, int(self._tokens))
+                self._tokens -= granted
+                return granted
+            await asyncio.sleep((1-self._tokens)/rate)
+
+    def refund(self, count: int):
+        # tokens we took but didn't use
+        self._tokens = min(float(self.burst), self._tokens+count)
+
+    async def acquire(self):
+        await self.acquire_many(1)
+    async def __aenter__(self):
+        await self.acquire()
+    async def __aexit__(self, exc_type, exc, tb):
+        pass
+
+    def backoff(self, duration: float=BACKOFF_TIME):
+        self._refill()
+        now = monotonic()
+        if now < self._slow_until:
+            self._slow = min(self._slow*2, BACKOFF_MAX)
+        else:
+            self._slow = 2
+        self._slow_until = max(self._slow_until, now+duration)
+        self._tokens     = min(self._tokens, 0.0)
+
+    def inherit(self, other: "TokenBucket"):
+        # carry on being as slow as `other` for as long as it would have
+        self._slow       = other._slow
+        self._slow_until = other._slow_until
+
 class Server(IServer):
     _reader: ITCPReader
     _writer: ITCPWriter
@@ -55,27 +185,74 @@ class Server(IServer):
 
         self.disconnected = False
 
-        self.throttle = Throttler(rate_limit=100, period=1)
+        self.throttle = TokenBucket(100, 1)
 
         self.sasl_state = SASLResult.NONE
         self.last_read  = monotonic()
 
+        # socket reads and how many bytes they got us
+        self.read_count = 0
+        self.read_bytes = 0
+        self._read_size = READ_SIZE_MIN
+        self._read_buffer: Optional[bytearray] = None
+
+        # name -> casefolded name, least recently used first
+        self._folded:  Dict[str, str] = {}
+        self._folded_casemap: Optional[CaseMap] = None
+        self.casefold_max    = CASEFOLD_MAX
+        self.casefold_hits   = 0
+        self.casefold_misses = 0
+
         self._sent_count:  int = 0
-        self._send_queue: PriorityQueue[SentLine] = PriorityQueue()
+        self._send_queue = SendQueue()
         self.desired_caps: Set[ICapability] = set([])
 
         self._read_queue:    Deque[Line] = deque()
-        self._process_queue: Deque[Tuple[Line, Optional[Emit]]] = deque()
+        self._process_queue: Queue[Tuple[Line, Optional[Emit]]] = Queue()
+        # lines queued for `_on_read()` that it's not finished with, and
+        # how many `wait_for()`s are waiting on a line
+        self._unhandled     = 0
+        self._line_waits    = 0
+        self._handled       = Event()
+        # cleared by `drain()`, to stop us parsing any more lines
+        self._reading       = Event()
+        self._reading.set()
+        self._wait_fors = WaitForRegistry()
+        self._label_waits = LabelRegistry()
+        self._sent_labels: "WeakKeyDictionary[Awaitable[SentLine], str]" = \
+            WeakKeyDictionary()
 
         self._ping_sent   = False
         self._read_lguard = RLock()
         self.read_lock    = self._read_lguard
-        self._read_lwork  = asyncio.Lock()
-        self._wait_for    = asyncio.Event()
 
         self._pending_who: Deque[str] = deque()
+        # channels we've joined and will WHO once we've got their NAMES
+        self._who_names:   Set[str] = set()
+        # channels we've sent a WHO for, weighted by guessed reply size
+        self._whos_sent = Window(WHO_TIMEOUT, self._who_given_up)
+        self._who_start:   Optional[float] = None
+        self.who_done  = 0
+        self.who_total = 0
+        # how long the last full WHO sync took
+        self.sync_time: Optional[float] = None
+
         self._alt_nicks:   List[str] = []
 
+        # joined channels -> how closely we're tracking their members
+        self._tracking: Dict[str, TrackingLevel] = {}
+        self._channel_tracking: Optional[Dict[str, TrackingLevel]] = None
+
+        # snapshotted channels (and their users) we needn't sync again
+        self._warm:       Dict[str, Dict[str, Any]] = {}
+        self._warm_users: Dict[str, Dict[str, Any]] = {}
+
+        # autojoin (channel, key)s we've not sent yet, and the channels of
+        # each JOIN line the server hasn't finished answering
+        self._pending_joins: Deque[Tuple[str, Optional[str]]] = deque()
+        self._joins_sent = Window(JOIN_TIMEOUT, self._next_joins)
+        self._autojoined = False
+
     def hostmask(self) -> str:
         hostmask = self.nickname
         if not self.username is None:
@@ -88,29 +265,126 @@ class Server(IServer):
             ) -> Awaitable[SentLine]:
         return self.send(tokenise(line), priority)
     def send(self,
-            line: Line,
-            priority=SendPriority.DEFAULT
+            line:     Line,
+            priority: int=SendPriority.DEFAULT,
+            expire:   Optional[float]=None,
+            coalesce: bool=False,
+            label:    bool=False
             ) -> Awaitable[SentLine]:
+        # `expire`: seconds after which the line is dropped, and its future
+        #  failed, if it still hasn't been sent
+        # `coalesce`: if an identical line is already queued (and not
+        #  expired), don't queue this one; share the queued one's future
+        # `label`: tag the line for labeled-response, if we have it, so that
+        #  `wait_for(..., sent_aw)` can pick out its replies. the server
+        #  sends an ACK for labeled lines it has nothing else to say about,
+        #  so only label lines something is going to wait on
 
         self.line_presend(line)
-        sent_line = SentLine(self._sent_count, priority, line)
+
+        key: Optional[Hashable] = None
+        if coalesce:
+            key = (line.command, tuple(line.params))
+            pending = self._send_queue.pending(key)
+            if pending is not None and not expired(pending):
+                if pending.deadline is not None:
+                    # the queued line now has to last as long as ours would
+                    if expire is None:
+                        self._expire_at(pending, None)
+                    else:
+                        self._expire_at(pending,
+                            max(pending.deadline, monotonic()+expire))
+                return pending.future
+
+        sent_id = self._sent_count
         self._sent_count += 1
 
-        label = self.cap_available(CAP_LABEL)
-        if not label is None:
-            tag = LABEL_TAG_MAP[label]
+        label_cap: Optional[str] = None
+        if label and (line.tags is None or not "batch" in line.tags):
+            # the label goes on the BATCH line, not on what's inside it
+            label_cap = self.cap_available(CAP_LABEL)
+        label_value: Optional[str] = None
+        if not label_cap is None:
+            tag = LABEL_TAG_MAP[label_cap]
             if line.tags is None or not tag in line.tags:
                 if line.tags is None:
                     line.tags = {}
-                line.tags[tag] = str(sent_line.id)
-
-        self._send_queue.put_nowait(sent_line)
-
-        return sent_line.future
-
-    def set_throttle(self, rate: int, time: float):
-        self.throttle.rate_limit = rate
-        self.throttle.period     = time
+                line.tags[tag] = str(sent_id)
+            label_value = line.tags[tag]
+
+        sent_line = SentLine(sent_id, priority, line)
+        sent_line.key = key
+
+        if expire is not None:
+            self._expire_at(sent_line, monotonic()+expire)
+
+        # a batch, once started, is always finished; the server would hold
+        # on to anything else we sent it until it was
+        if (priority > SendPriority.HIGH and
+                not self._send_queue.in_batch(line) and
+                (self._send_queue.waiting_room() or
+                    self._send_queue.full(len(sent_line.encoded)))):
+            self._send_full(sent_line)
+        else:
+            self._send_queue.put_nowait(sent_line)
+
+        ret: Awaitable[SentLine] = sent_line.future
+
+        if label_value is not None:
+            self._sent_labels[ret] = label_value
+        return ret
+
+    def _expire_at(self, sent_line: SentLine, deadline: Optional[float]):
+        if sent_line.timer is not None:
+            sent_line.timer.cancel()
+            sent_line.timer = None
+        sent_line.deadline = deadline
+        if deadline is not None:
+            sent_line.timer = asyncio.get_event_loop().call_later(
+                deadline-monotonic(), self._expire_line, sent_line)
+    def _expire_line(self, sent_line: SentLine):
+        sent_line.timer = None
+        if self._send_queue.remove(sent_line):
+            expire_line(sent_line)
+
+    def _send_full(self, sent_line: SentLine):
+        # queues `sent_line` as `sendq_policy` says, or raises
+        policy = self.params.sendq_policy
+        error  = SendQueueFullError(f"send queue full ({self.name})")
+        if policy == SendQueuePolicy.WAIT:
+            self._send_queue.put_wait(sent_line)
+        elif (policy == SendQueuePolicy.DROP_LOW and
+                self._send_queue.drop_oldest(SendPriority.LOW, error)):
+            self._send_queue.put_nowait(sent_line)
+        else:
+            if sent_line.timer is not None:
+                sent_line.timer.cancel()
+            raise error
+
+    def send_queue_depth(self) -> Tuple[int, int]:
+        # (lines, bytes) waiting to be sent
+        return (self._send_queue.qsize(), self._send_queue.qbytes())
+
+    def set_throttle(self, rate: int, time: float, burst: Optional[int]=None):
+        self.throttle.set_rate(rate, time, burst)
+    def set_throttle_profile(self, profile: ThrottleProfile):
+        self.set_throttle(profile.rate, profile.period, profile.burst)
+
+    def _throttle_profile(self) -> ThrottleProfile:
+        if self.params.throttle is not None:
+            return self.params.throttle
+        network = (self.isupport.network or "").lower()
+        return THROTTLE_PROFILES.get(network, THROTTLE_DEFAULT)
+
+    def _check_flood(self, line: Line):
+        if line.command in FLOOD_NUMERICS:
+            self.throttle.backoff()
+        elif (line.command == "ERROR" and
+                line.params and
+                "excess flood" in line.params[-1].lower()):
+            # the bot hands this on to our reconnect, which then speeds
+            # back up to the profile's rate
+            self.throttle.backoff(FLOOD_BACKOFF_TIME)
 
     def server_address(self) -> Tuple[str, int]:
         return self._writer.get_peer()
@@ -127,11 +401,73 @@ class Server(IServer):
             tls      =params.tls,
             bindhost =params.bindhost)
 
+        self._setup(reader, writer, params)
+        await self.handshake()
+
+    def _setup(self,
+            reader: ITCPReader,
+            writer: ITCPWriter,
+            params: ConnectionParams):
         self._reader = reader
         self._writer = writer
+        if params.read_buffer and isinstance(reader, ITCPBufferReader):
+            self._read_buffer = bytearray(READ_SIZE_MAX)
+        self._send_queue.max_lines = params.sendq_lines
+        self._send_queue.max_bytes = params.sendq_bytes
 
         self.params = params
-        await self.handshake()
+
+    async def attach(self,
+            reader: ITCPReader,
+            writer: ITCPWriter,
+            params: ConnectionParams,
+            state:  Dict[str, Any],
+            unread: bytes=b"",
+            unsent: bytes=b""):
+        # pick up a connection that's already registered, e.g. one handed
+        # to us by another process (see `handover.py`). no handshake
+        self._setup(reader, writer, params)
+        load_state(self, state)
+        for chan in self.channels:
+            self._tracking[chan] = self.tracking_level(chan)
+        self._autojoined = True
+        self.set_throttle_profile(self._throttle_profile())
+
+        if unsent:
+            self._writer.write(unsent)
+        if unread:
+            for line in self.recv(unread):
+                self.line_preread(line)
+                self._read_queue.append(line)
+
+    async def drain(self):
+        # stop parsing lines and wait for handlers to finish with the ones
+        # we've parsed, so `detach()` doesn't leave any half handled. a
+        # handler waiting on a line holds this up until its wait times out
+        self._reading.clear()
+        while self._unhandled:
+            self._handled.clear()
+            await self._handled.wait()
+    def detach(self) -> Tuple[int, bytes, bytes]:
+        # give up our connection, after `drain()`. returns the socket's
+        # file descriptor, what we've read but not parsed and what we've
+        # queued but not sent. snapshot state before awaiting anything
+        fd = self._writer.detach()
+
+        unread = b"".join(
+            f"{line.format()}\r\n".encode("utf8") for line in self._read_queue)
+        unread += self._decoder.pending()+self._reader.unread()
+        self._read_queue.clear()
+        self._decoder.clear()
+
+        unsent = b""
+        while not self._send_queue.empty():
+            try:
+                unsent += self._send_queue.get_nowait().encoded
+            except QueueEmpty:
+                # the rest had expired
+                break
+        return fd, unread, unsent
     async def disconnect(self):
         if not self._writer is None:
             await self._writer.close()
@@ -165,20 +501,76 @@ class Server(IServer):
     async def line_send(self, line: Line):
         pass
     async def sts_policy(self, sts: STSPolicy):
-        pass
+        await self.bot.sts_policy(self.params.host, sts)
     async def resume_policy(self, resume: ResumePolicy):
         pass
+    def want_who(self, channel: str) -> bool:
+        # do we want member details (WHO) for a channel we've just joined?
+        level = self._tracking.get(channel, TrackingLevel.FULL)
+        return level == TrackingLevel.FULL and not channel in self._warm
+    def tracking_level(self, channel: str) -> TrackingLevel:
+        if self._channel_tracking is None:
+            self._channel_tracking = {self.casefold(k): v for k, v in
+                self.params.channel_tracking.items()}
+        return self._channel_tracking.get(channel, self.params.tracking)
+    async def channels_synced(self, count: int, seconds: float):
+        pass
     # /to be overriden
 
+    def warm_start(self,
+            channels: Dict[str, Any],
+            users:    Dict[str, Any]):
+        # state from a recent snapshot (see `snapshot.py`) that we'll fill
+        # channels in with when we join them, rather than WHO them
+        self._warm       = channels
+        self._warm_users = users
+
+    def _warm_channel(self, chan: str):
+        data = self._warm.pop(chan, None)
+        if data is not None and chan in self.channels:
+            channel = self.channels[chan]
+            if self._tracking.get(chan) == TrackingLevel.FULL:
+                for mode, masks in data["list_modes"].items():
+                    channel.list_modes[mode] = list(masks)
+
+            for nickname_lower in channel.users:
+                user      = self.users.get(nickname_lower)
+                user_data = self._warm_users.get(nickname_lower)
+                if user is not None and user_data is not None:
+                    for key in USER_KEYS:
+                        if getattr(user, key) is None:
+                            setattr(user, key, user_data[key])
+
+        if not self._warm:
+            self._warm_users = {}
+
     async def _on_read(self, line: Line, emit: Optional[Emit]):
+        if (line.command == RPL_ENDOFNAMES and
+                self._warm and
+                len(line.params) > 1):
+            self._warm_channel(self.casefold(line.params[1]))
+        if (line.command == RPL_ENDOFNAMES and
+                len(line.params) > 1 and
+                self.casefold(line.params[1]) in self._who_names):
+            # we know how many members it has now, so how big a WHO is
+            chan = self.casefold(line.params[1])
+            self._who_names.remove(chan)
+            if not (chan in self._pending_who or chan in self._whos_sent):
+                if self._who_start is None:
+                    self._who_start = monotonic()
+                    self.who_done   = 0
+                    self.who_total  = 0
+                self._pending_who.append(chan)
+                self.who_total += 1
+                await self._next_who()
+
         if line.command == "PING":
-            await self.send(build("PONG", line.params))
+            await self.send(build("PONG", line.params), SendPriority.HIGH)
 
         elif line.command == RPL_ENDOFWHO:
             chan = self.casefold(line.params[1])
-            if (self._pending_who and
-                    self._pending_who[0] == chan):
-                self._pending_who.popleft()
+            if self._whos_sent.answered(chan):
+                self.who_done += 1
                 await self._next_who()
         elif (line.command in {
 		ERR_NICKNAMEINUSE, ERR_ERRONEUSNICKNAME, ERR_UNAVAILRESOURCE
@@ -190,6 +582,11 @@ class Server(IServer):
                 await self.send(build("QUIT"))
 
         elif line.command in [RPL_ENDOFMOTD, ERR_NOMOTD]:
+            # ISUPPORT is in by now, so we know how to pack JOINs
+            if self.params.autojoin and not self._autojoined:
+                self._autojoined = True
+                self._batch_joins(self.params.autojoin)
+
             # we didn't get the nickname we wanted. watch for it if we can
             if not self.nickname == self.params.nickname:
                 target = self.params.nickname
@@ -207,13 +604,32 @@ class Server(IServer):
                 line.source is not None):
             await self._check_regain([line.hostmask.nickname])
 
+        elif (self._joins_sent and
+                len(line.params) > 1 and
+                (line.command == RPL_ENDOFNAMES or
+                    line.command[:1] in "45" and line.command.isdigit())):
+            # either we're in or we're not getting in; both free up space
+            # for more autojoin JOINs
+            if line.command == ERR_TOOMANYCHANNELS:
+                self._pending_joins.clear()
+            if self._joins_sent.answered(self.casefold(line.params[1])):
+                self._next_joins()
+
+        elif line.command == RPL_ISUPPORT:
+            # casemapping might have changed
+            self._channel_tracking = None
+            if (self.params.throttle is None and
+                    self.isupport.network is not None and
+                    self.isupport.network.lower() in THROTTLE_PROFILES):
+                self.set_throttle_profile(self._throttle_profile())
+        elif line.command == RPL_YOUREOPER:
+            if self.params.throttle_exempt is not None:
+                self.set_throttle_profile(self.params.throttle_exempt)
+
         elif emit is not None:
             if emit.command == RPL_WELCOME:
-                await self.send(build("WHO", [self.nickname]))
-                self.set_throttle(THROTTLE_RATE, THROTTLE_TIME)
-
-                if self.params.autojoin:
-                    await self._batch_joins(self.params.autojoin)
+                await self.send(build("WHO", [self.nickname]), coalesce=True)
+                self.set_throttle_profile(self._throttle_profile())
 
             elif emit.command == "CAP":
                 if emit.subcommand    == "NEW":
@@ -228,14 +644,18 @@ class Server(IServer):
             elif emit.command == "JOIN":
                 if emit.self and not emit.channel is None:
                     chan  = emit.channel.name_lower
-                    await self.send(build("MODE", [chan]))
+                    await self.send(build("MODE", [chan]), coalesce=True)
 
+                    level = self._tracking.get(chan, TrackingLevel.FULL)
                     modes = "".join(self.isupport.chanmodes.a_modes)
-                    await self.send(build("MODE", [chan, f"+{modes}"]))
+                    if (level == TrackingLevel.FULL and
+                            modes and
+                            not chan in self._warm):
+                        await self.send(
+                            build("MODE", [chan, f"+{modes}"]), coalesce=True)
 
-                    self._pending_who.append(chan)
-                    if len(self._pending_who) == 1:
-                        await self._next_who()
+                    if self.want_who(chan):
+                        self._who_names.add(chan)
 
         await self.line_read(line)
 
@@ -245,23 +665,186 @@ class Server(IServer):
                     not self.nickname == self.params.nickname):
                 await self.send(build("NICK", [self.params.nickname]))
 
-    async def _batch_joins(self,
-            channels: List[str],
-            batch_n:  int=10):
-        #TODO: do as many JOINs in one line as we can fit
-        #TODO: channel keys
+    def _targmax(self, command: str) -> Optional[int]:
+        for token in (self.isupport.raw.get("TARGMAX") or "").split(","):
+            key, _, value = token.partition(":")
+            if key.upper() == command and value.isdigit():
+                return int(value)
+        return None
+
+    def _chanlimits(self) -> Dict[str, int]:
+        # {chantype: how many channels of these types we can be in}
+        limits: Dict[str, int] = {}
+        chanlimit = self.isupport.raw.get("CHANLIMIT")
+        if chanlimit is not None:
+            for token in chanlimit.split(","):
+                types, _, value = token.partition(":")
+                if value.isdigit():
+                    limits[types] = int(value)
+        elif (self.isupport.raw.get("MAXCHANNELS") or "").isdigit():
+            limits["".join(self.isupport.chantypes)] = int(
+                self.isupport.raw["MAXCHANNELS"] or 0)
+        return limits
+
+    def _pack_joins(self,
+            joins: Deque[Tuple[str, Optional[str]]]
+            ) -> Tuple[Line, List[str]]:
+        # take as many (channel, key)s off the front of `joins` as will fit
+        # in one JOIN line. keyed channels need to come first, as the keys
+        # are paired up with channels in order
+        targmax = self._targmax("JOIN")
+        names: List[str] = []
+        keys:  List[str] = []
+        size = len("JOIN  \r\n")
+        while joins and (targmax is None or len(names) < targmax):
+            name, key = joins[0]
+            join_size = len(name.encode("utf8"))+1
+            if key is not None:
+                join_size += len(key.encode("utf8"))+1
+            if names and (size+join_size) > LINE_MAX:
+                break
+
+            joins.popleft()
+            names.append(name)
+            if key is not None:
+                keys.append(key)
+            size += join_size
+
+        params = [",".join(names)]
+        if keys:
+            params.append(",".join(keys))
+        return build("JOIN", params), names
+
+    def _batch_joins(self, channels: List[str]):
+        # "#channel" or "#channel key", keyed channels first
+        split = [channel.split(" ", 1) for channel in channels]
+        joins = sorted(split, key=lambda join: len(join) == 1)
+
+        # don't ask for more channels than we're allowed
+        limits = self._chanlimits()
+        counts = {types: 0 for types in limits}
+        for chan in self.channels.keys():
+            for types in counts:
+                if chan[:1] in types:
+                    counts[types] += 1
+
+        for join in joins:
+            if self.casefold(join[0]) in self.channels:
+                # we'd hear nothing back
+                continue
+            types_l = [types for types in limits if join[0][:1] in types]
+            if types_l:
+                types = types_l[0]
+                if counts[types] >= limits[types]:
+                    continue
+                counts[types] += 1
+            self._pending_joins.append(
+                (join[0], join[1] if len(join) > 1 else None))
+        self._next_joins()
+
+    def _next_joins(self):
+        # only a few JOIN lines at a time; more as the server answers them,
+        # or as we give up on one (see `Window`)
+        while (self._pending_joins and
+                len(self._joins_sent) < max(1, self.params.join_window)):
+            line, names = self._pack_joins(self._pending_joins)
+            try:
+                sent = self.send(line)
+            except SendQueueFullError:
+                break
+            self._joins_sent.add((self.casefold(n) for n in names), sent)
+
+    def _who_size(self, chan: str) -> int:
+        if chan in self.channels:
+            return max(1, len(self.channels[chan].users))*WHO_LINE_SIZE
+        else:
+            return WHO_LINE_SIZE
 
-        for i in range(0, len(channels), batch_n):
-            batch = channels[i:i+batch_n]
-            await self.send(build("JOIN", [",".join(batch)]))
+    def _who_given_up(self):
+        # a WHO timed out or never got sent
+        asyncio.ensure_future(self._next_who())
 
     async def _next_who(self):
-        if self._pending_who:
+        # keep a few WHOs in flight, but not so many that the replies
+        # could overflow the server's buffer for us
+        while (self._pending_who and
+                len(self._whos_sent) < max(1, self.params.who_window)):
             chan = self._pending_who[0]
+            size = self._who_size(chan)
+            if (self._whos_sent and
+                    (self._whos_sent.weight()+size) >
+                    self.params.who_budget):
+                break
+
+            self._pending_who.popleft()
             if self.isupport.whox:
-                await self.send(self.prepare_whox(chan))
+                line = self.prepare_whox(chan)
             else:
-                await self.send(build("WHO", [chan]))
+                line = build("WHO", [chan])
+            try:
+                sent = self.send(line, SendPriority.LOW, coalesce=True,
+                    label=True)
+            except SendQueueFullError:
+                continue
+            self._whos_sent.add([chan], sent, size)
+
+        if (not self._pending_who and
+                not self._whos_sent and
+                self._who_start is not None):
+            self.sync_time  = monotonic()-self._who_start
+            self._who_start = None
+            await self.channels_synced(self.who_done, self.sync_time)
+
+    def sync_progress(self) -> Tuple[int, int]:
+        # (channels WHOed, channels to WHO) for the current or last sync
+        return (self.who_done, self.who_total)
+
+    async def _read(self, byte_count: int) -> bytes:
+        if self._read_buffer is None:
+            return await self._reader.read(byte_count)
+        else:
+            reader = cast(ITCPBufferReader, self._reader)
+            view   = memoryview(self._read_buffer)[:byte_count]
+            return view[:await reader.readinto(view)] # type: ignore
+
+    def _adapt_read_size(self, byte_count: int):
+        self.read_count += 1
+        self.read_bytes += byte_count
+        # a full read means there's probably more waiting; read more at a
+        # time while the data keeps coming and shrink back down once idle
+        if byte_count >= self._read_size:
+            self._read_size = min(self._read_size*2, READ_SIZE_MAX)
+        elif byte_count < self._read_size//4:
+            self._read_size = max(self._read_size//2, READ_SIZE_MIN)
+
+    def casefold(self, s1: str) -> str:
+        # the same few names get casefolded over and over, for every line
+        # ircstates and our matchers look at
+        casemap = self.isupport.casemapping
+        if not casemap == self._folded_casemap:
+            self._folded.clear()
+            self._folded_casemap = casemap
+
+        folded = self._folded.pop(s1, None)
+        if folded is None:
+            self.casefold_misses += 1
+            folded = casefold(casemap, s1)
+            if len(self._folded) >= self.casefold_max:
+                del self._folded[next(iter(self._folded))]
+        else:
+            self.casefold_hits += 1
+        # (re)inserted last, as the most recently used
+        self._folded[s1] = folded
+        return folded
+    def casefold_hit_rate(self) -> float:
+        lookups = self.casefold_hits+self.casefold_misses
+        return (self.casefold_hits/lookups) if lookups else 0.0
+
+    def bytes_per_read(self) -> float:
+        if self.read_count:
+            return self.read_bytes/self.read_count
+        else:
+            return 0.0
 
     async def _read_line(self, timeout: float) -> Optional[Line]:
         while True:
@@ -270,50 +853,162 @@ class Server(IServer):
 
             try:
                 async with timeout_(timeout):
-                    data = await self._reader.read(1024)
+                    data = await self._read(self._read_size)
             except asyncio.TimeoutError:
                 return None
 
             self.last_read = monotonic()
+            self._adapt_read_size(len(data))
             lines          = self.recv(data)
             for line in lines:
                 self.line_preread(line)
                 self._read_queue.append(line)
 
+    def _track(self, line: Line) -> Optional[Line]:
+        # what ircstates gets to see of `line`, or None for nothing at all.
+        # we don't keep other members of TrackingLevel.NONE channels
+        chan_i = 2 if line.command == RPL_NAMREPLY else 0
+        if len(line.params) <= chan_i or line.source is None:
+            return line
+        chan = self.casefold(line.params[chan_i])
+        nick = line.hostmask.nickname
+
+        if line.command == "JOIN" and self.is_me(nick):
+            self._tracking[chan] = self.tracking_level(chan)
+            return line
+        elif ((line.command == "PART" and self.is_me(nick)) or
+                (line.command == "KICK" and
+                    line.params[1:] and self.is_me(line.params[1]))):
+            self._tracking.pop(chan, None)
+            return line
+        elif not self._tracking.get(chan) == TrackingLevel.NONE:
+            return line
+
+        if line.command in ["JOIN", "PART", "KICK"]:
+            return None
+        elif line.command == RPL_NAMREPLY:
+            prefixes = "".join(self.isupport.prefix.prefixes)
+            names    = line.params[3].split(" ") if line.params[3:] else []
+            mine     = [n for n in names
+                if n and self.is_me(n.lstrip(prefixes).split("!", 1)[0])]
+            if not mine:
+                return None
+            return build(line.command, line.params[:3]+[" ".join(mine)],
+                source=line.source, tags=line.tags)
+        else:
+            return self._track_mode(line)
+
+    def _track_mode(self, line: Line) -> Optional[Line]:
+        # drop status modes (e.g. +o) given to members we're not tracking
+        if len(line.params) < 2:
+            return line
+        chanmodes = self.isupport.chanmodes
+        args      = line.params[2:]
+        modes     = ""
+        params: List[str] = []
+
+        modifier = last_modifier = ""
+        for char in line.params[1]:
+            if char in "+-":
+                modifier = char
+                continue
+
+            keep = True
+            arg: Optional[str] = None
+            if char in self.isupport.prefix.modes:
+                arg  = args.pop(0) if args else None
+                keep = arg is not None and self.is_me(arg)
+            elif (char in chanmodes.a_modes or
+                    char in chanmodes.b_modes or
+                    (modifier == "+" and char in chanmodes.c_modes)):
+                arg = args.pop(0) if args else None
+
+            if keep:
+                if not modifier == last_modifier:
+                    modes += modifier
+                    last_modifier = modifier
+                modes += char
+                if arg is not None:
+                    params.append(arg)
+
+        if not modes:
+            return None
+        return build(line.command, [line.params[0], modes]+params,
+            source=line.source, tags=line.tags)
+
+    def _dispatch_line(self, line: Line) -> bool:
+        if line.command in MEMBER_COMMANDS:
+            track = self._track(line)
+            emit  = None if track is None else self.parse_tokens(track)
+        else:
+            emit  = self.parse_tokens(line)
+        self._check_flood(line)
+
+        labeled, resolved = self._label_waits.route(self, line)
+        resolved = self._wait_fors.resolve(self, line, labeled) or resolved
+        self._process_queue.put_nowait((line, emit))
+        self._unhandled += 1
+        return resolved
+
+    async def _until_handled(self):
+        # handlers should see state as of their own line, so we don't parse
+        # another until `_on_read()` is done with what we've given it -
+        # unless anyone's waiting for a line; a handler could be waiting on
+        # them. otherwise we never queue up more than a line ahead of
+        # `_process_lines()`
+        while self._unhandled and not self._line_waits:
+            self._handled.clear()
+            await self._handled.wait()
+
+    async def _line_wait(self, awaitable: Awaitable[TEvent]) -> TEvent:
+        # let the reader carry on while anyone waits for a line, whether
+        # it's a handler or a task a handler might be waiting on
+        self._line_waits += 1
+        self._handled.set()
+        try:
+            return await awaitable
+        finally:
+            self._line_waits -= 1
+
     async def _read_lines(self):
+        # the only task that reads from the socket. parsed lines are handed
+        # to `wait_for()` waiters and then queued up for `_process_lines()`
+        try:
+            while True:
+                await self._reading.wait()
+                line = await self._read_line(PING_TIMEOUT)
+                if not self._reading.is_set():
+                    # `drain()` was called while we were reading
+                    if line is not None:
+                        self._read_queue.appendleft(line)
+                elif line is not None:
+                    self._ping_sent = False
+                    if self._dispatch_line(line):
+                        # let resolved waiters run (and maybe wait again)
+                        # before we hand out the next line
+                        await asyncio.sleep(0)
+                    await self._until_handled()
+                elif not self._ping_sent:
+                    self.send(build("PING", ["hello"]), SendPriority.HIGH)
+                    self._ping_sent = True
+                else:
+                    await self.disconnect()
+                    raise ServerDisconnectedException()
+        except ServerDisconnectedException as e:
+            self._label_waits.reject(e)
+            self._wait_fors.reject(e)
+            raise
+
+    async def _process_lines(self):
         while True:
+            line, emit = await self._process_queue.get()
             async with self._read_lguard:
                 pass
-
-            if not self._process_queue:
-                async with self._read_lwork:
-                    read_aw = asyncio.create_task(self._read_line(PING_TIMEOUT))
-                    wait_aw = asyncio.create_task(self._wait_for.wait())
-                    dones, notdones = await asyncio.wait(
-                        [read_aw, wait_aw],
-                        return_when=asyncio.FIRST_COMPLETED
-                    )
-                    self._wait_for.clear()
-
-                    for done in dones:
-                        if isinstance(done.result(), Line):
-                            self._ping_sent = False
-                            line = done.result()
-                            emit = self.parse_tokens(line)
-                            self._process_queue.append((line, emit))
-                        elif done.result() is None:
-                            if not self._ping_sent:
-                                await self.send(build("PING", ["hello"]))
-                                self._ping_sent = True
-                            else:
-                                await self.disconnect()
-                                raise ServerDisconnectedException()
-                    for notdone in notdones:
-                        notdone.cancel()
-
-            else:
-                line, emit = self._process_queue.popleft()
+            try:
                 await self._on_read(line, emit)
+            finally:
+                self._unhandled -= 1
+                self._handled.set()
 
     async def wait_for(self,
             response: Union[IMatchResponse, Set[IMatchResponse]],
@@ -327,45 +1022,99 @@ class Server(IServer):
         else:
             response_obj = response
 
-        async with self._read_lguard:
-            self._wait_for.set()
-            async with self._read_lwork:
-                async with timeout_(timeout):
-                    while True:
-                        line = await self._read_line(timeout)
-                        if line:
-                            self._ping_sent = False
-                            emit = self.parse_tokens(line)
-                            self._process_queue.append((line, emit))
-                            if response_obj.match(self, line):
-                                return line
+        wait_for = WaitFor(response_obj, monotonic()+timeout)
+
+        label: Optional[str] = None
+        if sent_aw is not None:
+            label = self._sent_labels.get(sent_aw)
+
+        if label is not None:
+            # labeled-response; O(1) lookup and no ambiguity between
+            # responses to identical requests
+            if not self._label_waits.add(self, label, wait_for):
+                self._wait_fors.add(wait_for)
+        else:
+            self._wait_fors.add(wait_for)
+
+        try:
+            async with timeout_(timeout):
+                return await self._line_wait(wait_for)
+        finally:
+            if label is not None:
+                self._label_waits.remove(label, wait_for)
+            self._wait_fors.remove(wait_for)
+
+    async def wait_for_labeled(self,
+            sent_aw: Awaitable[SentLine],
+            timeout: float=WAIT_TIMEOUT
+            ) -> List[Line]:
+        # every line of the labeled response to `sent_aw`; a single line,
+        # the body of a `labeled-response` BATCH or nothing at all for ACK
+        label = self._sent_labels.get(sent_aw)
+        if label is None:
+            raise ValueError("line was not sent with a label")
+
+        response = self._label_waits.response(label, monotonic()+timeout)
+        async with timeout_(timeout):
+            return await self._line_wait(response)
 
     async def _on_send_line(self, line: Line):
         if (line.command in ["PRIVMSG", "NOTICE", "TAGMSG"] and
                 not self.cap_agreed(CAP_ECHO)):
+            # not held back by `_until_handled()`; a handler could be
+            # waiting for this line to be sent
             new_line = line.with_source(self.hostmask())
-            self._read_queue.append(new_line)
+            self.line_preread(new_line)
+            if self._dispatch_line(new_line):
+                await asyncio.sleep(0)
 
     async def _send_lines(self):
+        # a line we took from the queue but had no token left for
+        held: Optional[SentLine] = None
         while True:
-            lines: List[SentLine] = []
-
-            while (not lines or
-                    (len(lines) < 5 and self._send_queue.qsize() > 0)):
-                prio_line = await self._send_queue.get()
-                lines.append(prio_line)
-
+            if held is None:
+                held = await self._send_queue.get()
+            lines: List[SentLine] = [held]
+            held = None
+
+            # take as many lines as the throttle will let us send right now.
+            # a batch is charged as one line; what's in it, and its end, are
+            # free
+            tokens = 0
+            if not _in_batch(lines[0].line):
+                want   = min(self.params.send_batch, 1+self._send_queue.qsize())
+                tokens = await self.throttle.acquire_many(want)-1
+            while (len(lines) < self.params.send_batch and
+                    self._send_queue.qsize() > 0):
+                try:
+                    line = self._send_queue.get_nowait()
+                except QueueEmpty:
+                    # the rest had expired
+                    break
+                if not _in_batch(line.line):
+                    if not tokens:
+                        held = line
+                        break
+                    tokens -= 1
+                lines.append(line)
+            self.throttle.refund(tokens)
+
+            # anything that expired while we waited for the throttle
+            lines = [line for line in lines if not expired(line)]
+            if not lines:
+                continue
             for line in lines:
-                async with self.throttle:
-                    self._writer.write(
-                        f"{line.line.format()}\r\n".encode("utf8"))
+                if line.timer is not None:
+                    line.timer.cancel()
 
+            self._writer.write(b"".join(line.encoded for line in lines))
             await self._writer.drain()
 
             for line in lines:
                 await self._on_send_line(line.line)
                 await self.line_send(line.line)
-                line.future.set_result(line)
+                if not line.future.done():
+                    line.future.set_result(line)
 
     # CAP-related
     def cap_agreed(self, capability: ICapability) -> bool:
@@ -393,7 +1142,7 @@ class Server(IServer):
     # /CAP-related
 
     def send_nick(self, new_nick: str) -> Awaitable[bool]:
-        fut = self.send(build("NICK", [new_nick]))
+        fut = self.send(build("NICK", [new_nick]), label=True)
         async def _assure() -> bool:
             line = await self.wait_for({
                 Response("NICK", [Folded(new_nick)], source=MASK_SELF),
@@ -422,7 +1171,7 @@ class Server(IServer):
             return channels[0]
         return MaybeAwait(_assure)
     def send_part(self, name: str):
-        fut = self.send(build("PART", [name]))
+        fut = self.send(build("PART", [name]), label=True)
 
         async def _assure():
             line = await self.wait_for(
@@ -437,12 +1186,18 @@ class Server(IServer):
             keys:  List[str]=[]
             ) -> Awaitable[List[Channel]]:
 
-        folded_names = [self.casefold(name) for name in names]
+        # keys pair up with the first `len(keys)` names
+        joins: Deque[Tuple[str, Optional[str]]] = deque(zip(names, keys))
+        joins.extend((name, None) for name in names[len(keys):])
 
-        if not keys:
-            fut = self.send(build("JOIN", [",".join(names)]))
-        else:
-            fut = self.send(build("JOIN", [",".join(names)]+keys))
+        futs: List[Awaitable[SentLine]] = []
+        while joins:
+            line, _ = self._pack_joins(joins)
+            futs.append(self.send(line, label=True))
+        fut = futs[0]
+
+        # insertion-ordered set of the channels we've not heard back about
+        folded_names = {self.casefold(name): None for name in names}
 
         async def _assure():
             channels: List[Channel] = []
@@ -464,6 +1219,7 @@ class Server(IServer):
                     chan = line.params[2]
                 elif line.command == ERR_LINKCHANNEL:
                     #XXX i dont like this
+                    folded_names.pop(self.casefold(line.params[1]), None)
                     chan = line.params[2]
                     await self.wait_for(
                         Response(RPL_CHANNELMODEIS, [ANY, Folded(chan)])
@@ -474,26 +1230,127 @@ class Server(IServer):
                 if chan is not None:
                     folded = self.casefold(chan)
                     if folded in folded_names:
-                        folded_names.remove(folded)
-                        channels.append(self.channels[folded])
+                        del folded_names[folded]
+                        # errors leave us without a channel to return
+                        if folded in self.channels:
+                            channels.append(self.channels[folded])
 
             return channels
         return MaybeAwait(_assure)
 
+    def _message_budget(self, command: str, target: str) -> int:
+        # bytes left for message text once the server has relayed our line
+        # to others with our full hostmask. tags have their own budget
+        nickname = self.nickname or self.params.nickname
+        userlen  = int(self.isupport.raw.get("USERLEN") or USERLEN)
+        username = self.username or ("~"+"u"*userlen)
+        hostname = self.hostname or "h"*HOSTLEN
+        overhead = f":{nickname}!{username}@{hostname} {command} {target} :\r\n"
+        return LINE_MAX-len(overhead.encode("utf8"))
+
+    def _multiline_limits(self) -> Optional[Tuple[int, int]]:
+        # (max bytes, max lines) if we can send draft/multiline batches
+        cap = self.cap_available(CAP_MULTILINE)
+        if cap is None:
+            return None
+        limits: Dict[str, str] = {}
+        for token in (self.available_caps.get(cap) or "").split(","):
+            key, _, value = token.partition("=")
+            limits[key] = value
+        if not limits.get("max-bytes", "").isdigit():
+            return None
+        max_lines = limits.get("max-lines", "")
+        return (int(limits["max-bytes"]),
+            int(max_lines) if max_lines.isdigit() else 0)
+
     def send_message(self, target: str, message: str
             ) -> Awaitable[Optional[str]]:
-        fut = self.send(build("PRIVMSG", [target, message]))
+        budget = max(1, self._message_budget("PRIVMSG", target))
+        # (text, continues the previous line?)
+        parts: List[Tuple[str, bool]] = []
+        for message_line in message.split("\n"):
+            if not message_line:
+                # the server won't take an empty PRIVMSG
+                continue
+            chunks = formatting.split(message_line, budget)
+            parts.append((chunks[0], False))
+            parts.extend((chunk, True) for chunk in chunks[1:])
+
+        # (part, future to wait on for its echo)
+        waits: List[Tuple[Tuple[str, bool], Awaitable[SentLine]]] = []
+        multiline = self._multiline_limits()
+        if multiline is not None and len(parts) > 1:
+            max_bytes, max_lines = multiline
+            batch: List[Tuple[str, bool]] = []
+            batch_bytes = 0
+            for part in parts:
+                part_bytes = len(part[0].encode("utf8"))
+                if batch and (
+                        (batch_bytes+part_bytes) > max_bytes or
+                        (max_lines and len(batch) >= max_lines)):
+                    waits.extend(self._send_multiline(target, batch))
+                    batch, batch_bytes = [], 0
+                batch.append(part)
+                batch_bytes += part_bytes
+            waits.extend(self._send_multiline(target, batch))
+        else:
+            for part in parts:
+                fut = self.send(
+                    build("PRIVMSG", [target, part[0]]), label=True)
+                waits.append((part, fut))
+
         async def _assure():
-            line = await self.wait_for(
-                Response("PRIVMSG", [Folded(target), ANY], source=MASK_SELF),
-                fut
-            )
-            if line.command == "PRIVMSG":
-                return line.params[1]
-            else:
+            if not waits:
                 return None
+            out = ""
+            for (_, concat), fut in waits:
+                line = await self.wait_for(
+                    Response("PRIVMSG", [Folded(target), ANY],
+                        source=MASK_SELF),
+                    fut
+                )
+                if line.command == "PRIVMSG":
+                    if out or concat:
+                        out += "" if concat else "\n"
+                    out += line.params[1]
+                else:
+                    return None
+            return out
         return MaybeAwait(_assure)
 
+    def _send_multiline(self,
+            target: str,
+            parts:  List[Tuple[str, bool]]
+            ) -> List[Tuple[Tuple[str, bool], Awaitable[SentLine]]]:
+        if len(parts) == 1:
+            fut = self.send(
+                build("PRIVMSG", [target, parts[0][0]]), label=True)
+            return [(parts[0], fut)]
+
+        ref  = f"ml{self._sent_count}"
+        futs = [self.send(
+            build("BATCH", [f"+{ref}", "draft/multiline", target]),
+            label=True)]
+        for text, concat in parts:
+            tags = {"batch": ref}
+            if concat:
+                tags[MULTILINE_CONCAT_TAG] = ""
+            line = build("PRIVMSG", [target, text])
+            line.tags = tags
+            futs.append(self.send(line))
+        futs.append(self.send(build("BATCH", [f"-{ref}"])))
+
+        # the whole batch is sent (or failed) together
+        async def _sent() -> SentLine:
+            for fut in futs:
+                await fut
+            return await futs[0]
+        sent = MaybeAwait(_sent)
+        label = self._sent_labels.get(futs[0])
+        if label is not None:
+            self._sent_labels[sent] = label
+        return [(part, sent) for part in parts]
+
     def send_whois(self,
             target: str,
             remote: bool=False
@@ -502,7 +1359,7 @@ class Server(IServer):
         if remote:
             args.append(target)
 
-        fut = self.send(build("WHOIS", args))
+        fut = self.send(build("WHOIS", args), label=True)
         async def _assure() -> Optional[Whois]:
             folded = self.casefold(target)
             params = [ANY, Folded(folded)]
@@ -0,0 +1,131 @@
+import asyncio, json, os
+from dataclasses import asdict
+from time        import time
+from typing      import Any, Dict, Optional
+
+from ircstates.names import Name
+
+from .interface import IServer
+from .params    import ConnectionParams, STSPolicy, ResumePolicy
+
+VERSION    = 1
+FRESH_TIME = 600 # seconds a snapshot's channels are good for
+USER_KEYS  = ["username", "hostname", "realname", "account", "away"]
+
+def snapshot(server: IServer) -> Dict[str, Any]:
+    # everything we'd rather not have to ask the server for again, as
+    # something `json` can write
+    channels: Dict[str, Any] = {}
+    for name_lower, channel in server.channels.items():
+        channels[name_lower] = {
+            "name":       channel.name,
+            "topic":      channel.topic,
+            "modes":      channel.modes,
+            "list_modes": channel.list_modes,
+            "users":      {nick: sorted(channel_user.modes)
+                for nick, channel_user in channel.users.items()}
+        }
+    users: Dict[str, Any] = {}
+    for nickname_lower, user in server.users.items():
+        users[nickname_lower] = {k: getattr(user, k) for k in USER_KEYS}
+        users[nickname_lower]["nickname"] = user.nickname
+
+    params = server.params
+    return {
+        "version":  VERSION,
+        "time":     time(),
+        "name":     server.name,
+        "nickname": server.nickname,
+        "caps":     sorted(server.agreed_caps),
+        "available_caps": server.available_caps,
+        "isupport": server.isupport.raw,
+        "self":     {k: getattr(server, k) for k in USER_KEYS},
+        "modes":    sorted(server.modes),
+        "sts":      None if params.sts is None else asdict(params.sts),
+        "resume":   None if params.resume is None else asdict(params.resume),
+        "channels": channels,
+        "users":    users
+    }
+
+def _write(path: str, data: Dict[str, Any]):
+    # write-then-rename so a crash can't leave half a snapshot
+    temp = f"{path}.tmp"
+    with open(temp, "w") as file:
+        json.dump(data, file)
+    os.replace(temp, path)
+
+async def save(server: IServer, path: str):
+    data = snapshot(server)
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, _write, path, data)
+
+def load(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path) as file:
+            data = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or not data.get("version") == VERSION:
+        return None
+    return data
+
+def restore(server: IServer,
+        params:  ConnectionParams,
+        data:    Dict[str, Any],
+        max_age: float=FRESH_TIME):
+    # call before `connect()`. STS and resume policies carry over as long
+    # as we don't already have newer ones; channel state only while fresh
+    if params.sts is None and data["sts"] is not None:
+        params.sts = STSPolicy(**data["sts"])
+    if params.resume is None and data["resume"] is not None:
+        params.resume = ResumePolicy(**data["resume"])
+
+    if (time()-data["time"]) <= max_age:
+        server.warm_start(data["channels"], data["users"])
+
+def load_state(server: IServer, data: Dict[str, Any]):
+    # rebuild a registered server's state from a snapshot, for when we're
+    # picking up a connection that's already registered (see handover.py)
+    server.isupport.from_tokens([
+        k if v is None else f"{k}={v}" for k, v in data["isupport"].items()])
+    server.registered     = True
+    server.nickname       = data["nickname"]
+    server.nickname_lower = server.casefold(data["nickname"])
+    for key, value in data["self"].items():
+        setattr(server, key, value)
+    server.modes          = set(data["modes"])
+    server.available_caps = data["available_caps"]
+    server.agreed_caps    = data["caps"]
+
+    for nickname_lower, user_data in data["users"].items():
+        user = server.create_user(Name(user_data["nickname"], nickname_lower))
+        for key in USER_KEYS:
+            setattr(user, key, user_data[key])
+        server.users[nickname_lower] = user
+
+    for name_lower, channel_data in data["channels"].items():
+        channel = server.create_channel(
+            Name(channel_data["name"], name_lower))
+        channel.topic      = channel_data["topic"]
+        channel.modes      = channel_data["modes"]
+        channel.list_modes = channel_data["list_modes"]
+        server.channels[name_lower] = channel
+
+        for nickname_lower, modes in channel_data["users"].items():
+            if nickname_lower in server.users:
+                user = server.users[nickname_lower]
+                channel_user = server._user_join(channel, user)
+                channel_user.modes.update(modes)
+
+async def autosave(server: IServer, path: str, interval: float):
+    # save every `interval` seconds and once more when we're stopped
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            if server.registered:
+                await save(server, path)
+    finally:
+        # an ERROR from the server leaves us with no channels; keep the
+        # snapshot we had from before then
+        if server.channels:
+            _write(path, snapshot(server))
@@ -0,0 +1,53 @@
+import json, os
+from dataclasses import asdict
+from time        import time
+from typing      import Dict, Optional
+
+from .params import STSPolicy
+
+class STSStore(object):
+    # STS policies we've been given, by hostname, so that we can go
+    # straight to TLS next time instead of finding out over plaintext.
+    # kept in a JSON file if we're given a path
+    def __init__(self, path: Optional[str]=None):
+        self.path = path
+        self._policies: Dict[str, STSPolicy] = {}
+        if path is not None:
+            self.load()
+
+    def load(self):
+        try:
+            with open(self.path or "") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return
+        for hostname, policy in data.items():
+            self._policies[hostname] = STSPolicy(**policy)
+
+    def save(self):
+        if self.path is not None:
+            data = {h: asdict(p) for h, p in self._policies.items()}
+            temp = f"{self.path}.tmp"
+            with open(temp, "w") as file:
+                json.dump(data, file)
+            os.replace(temp, self.path)
+
+    def get(self, hostname: str) -> Optional[STSPolicy]:
+        policy = self._policies.get(hostname.lower())
+        if (policy is not None and
+                (time()-policy.created) > policy.duration):
+            self.remove(hostname)
+            return None
+        return policy
+
+    def set(self, hostname: str, policy: STSPolicy):
+        if policy.duration == 0:
+            # "duration=0" means forget about us
+            self.remove(hostname)
+        else:
+            self._policies[hostname.lower()] = policy
+            self.save()
+
+    def remove(self, hostname: str):
+        if self._policies.pop(hostname.lower(), None) is not None:
+            self.save()
@@ -1,12 +1,71 @@
 from hashlib       import sha512
 from ssl           import SSLContext
-from typing        import Optional, Tuple
-from asyncio       import StreamReader, StreamWriter
-from async_stagger import open_connection
+from time          import perf_counter
+from typing        import Any, Dict, Optional, Tuple, cast
+from socket        import socket
+from asyncio       import (BaseTransport, BufferedProtocol, Event, Future,
+    StreamReader, StreamReaderProtocol, StreamWriter, Transport,
+    get_running_loop)
+from async_stagger import create_connection
 
-from .interface import ITCPTransport, ITCPReader, ITCPWriter
+from .interface import (ITCPTransport, ITCPReader, ITCPBufferReader,
+    ITCPWriter)
 from .security  import (tls_context, TLS, TLSNoVerify, TLSVerifyHash,
-    TLSVerifySHA512)
+    TLSVerifySHA512, TLSConnect, TLS_CONNECT)
+
+class TLSStats(object):
+    # how our TLS handshakes are going, across every connection
+    def __init__(self):
+        self.handshakes     = 0
+        self.resumed        = 0
+        self.handshake_time = 0.0 # seconds, total
+
+    def resume_rate(self) -> float:
+        return (self.resumed/self.handshakes) if self.handshakes else 0.0
+    def average_time(self) -> float:
+        return (self.handshake_time/self.handshakes) if self.handshakes else 0.0
+TLS_STATS = TLSStats()
+
+READ_BUFFER = 65536 # bytes
+
+class PushbackReader(StreamReader):
+    # a StreamReader that keeps its own copy of what it's been fed but
+    # nobody's read yet, so it can be given back (see `TCPReader.unread()`).
+    # don't read from it after that
+    def __init__(self):
+        super().__init__()
+        self._pushback = bytearray()
+
+    def feed_data(self, data: bytes): # type: ignore
+        self._pushback += data
+        super().feed_data(data)
+    async def read(self, n: int=-1) -> bytes:
+        data = await super().read(n)
+        if n >= 0:
+            # a read to EOF comes back through here a block at a time
+            del self._pushback[:len(data)]
+        return data
+    def unread(self) -> bytes:
+        data = bytes(self._pushback)
+        self._pushback.clear()
+        return data
+
+async def open_stream(
+        sock: Optional[socket]=None,
+        **kwargs: Any
+        ) -> Tuple[PushbackReader, StreamWriter]:
+    # `open_connection()`, but with a `PushbackReader`. `sock` is an
+    # already connected socket, otherwise see `create_connection()`
+    loop   = get_running_loop()
+    reader = PushbackReader()
+    if sock is None:
+        transport, protocol = await create_connection(
+            lambda: StreamReaderProtocol(reader), **kwargs)
+    else:
+        transport, protocol = await loop.create_connection(
+            lambda: StreamReaderProtocol(reader), sock=sock)
+    writer = StreamWriter(transport, protocol, reader, loop)
+    return reader, writer
 
 class TCPReader(ITCPReader):
     def __init__(self, reader: StreamReader):
@@ -14,6 +73,12 @@ class TCPReader(ITCPReader):
 
     async def read(self, byte_count: int) -> bytes:
         return await self._reader.read(byte_count)
+    def unread(self) -> bytes:
+        # whatever's been read off the socket but not read from us. only a
+        # `PushbackReader` knows; see `open_stream()`
+        if isinstance(self._reader, PushbackReader):
+            return self._reader.unread()
+        return b""
 class TCPWriter(ITCPWriter):
     def __init__(self, writer: StreamWriter):
         self._writer = writer
@@ -24,6 +89,11 @@ class TCPWriter(ITCPWriter):
 
     def write(self, data: bytes):
         self._writer.write(data)
+    def detach(self) -> int:
+        # stop reading and give up the socket's file descriptor, leaving
+        # the connection open for whoever we give it to
+        self._writer.transport.pause_reading() # type: ignore
+        return self._writer.transport.get_extra_info("socket").fileno()
 
     async def drain(self):
         await self._writer.drain()
@@ -32,6 +102,51 @@ class TCPWriter(ITCPWriter):
         self._writer.close()
         await self._writer.wait_closed()
 
+def _connect_args(
+        hostname: str,
+        tls:      Optional[TLS],
+        bindhost: Optional[str]
+        ) -> Dict[str, Any]:
+    cur_ssl: Optional[SSLContext] = None
+    if tls is not None:
+        cur_ssl = tls_context(
+            not isinstance(tls, TLSNoVerify), tls.client_keypair)
+
+    local_addr: Optional[Tuple[str, int]] = None
+    if not bindhost is None:
+        local_addr = (bindhost, 0)
+
+    server_hostname = hostname if tls else None
+    return {
+        "server_hostname": server_hostname,
+        "ssl":             cur_ssl,
+        "local_addr":      local_addr
+    }
+
+def _connected(
+        transport: BaseTransport,
+        hostname:  str,
+        tls:       Optional[TLS],
+        connect:   TLSConnect):
+    ssl_object = transport.get_extra_info("ssl_object")
+    if ssl_object is not None and connect.started is not None:
+        TLS_STATS.handshakes     += 1
+        TLS_STATS.handshake_time += perf_counter()-connect.started
+        if ssl_object.session_reused:
+            TLS_STATS.resumed    += 1
+
+    if isinstance(tls, TLSVerifyHash):
+        cert: bytes = ssl_object.getpeercert(True)
+        if isinstance(tls, TLSVerifySHA512):
+            sum = sha512(cert).hexdigest()
+        else:
+            raise ValueError(f"unknown hash pinning {type(tls)}")
+
+        if not sum == tls.sum:
+            raise ValueError(
+                f"pinned hash for {hostname} does not match ({sum})"
+            )
+
 class TCPTransport(ITCPTransport):
     async def connect(self,
             hostname: str,
@@ -40,39 +155,174 @@ class TCPTransport(ITCPTransport):
             bindhost: Optional[str]=None
             ) -> Tuple[ITCPReader, ITCPWriter]:
 
-        cur_ssl: Optional[SSLContext] = None
-        if tls is not None:
-            cur_ssl = tls_context(not isinstance(tls, TLSNoVerify))
-            if tls.client_keypair is not None:
-                (client_cert, client_key) = tls.client_keypair
-                cur_ssl.load_cert_chain(client_cert, keyfile=client_key)
-
-        local_addr: Optional[Tuple[str, int]] = None
-        if not bindhost is None:
-            local_addr = (bindhost, 0)
-
-        server_hostname = hostname if tls else None
-
-        reader, writer = await open_connection(
-            hostname,
-            port,
-            server_hostname=server_hostname,
-            ssl            =cur_ssl,
-            local_addr     =local_addr)
-
-        if isinstance(tls, TLSVerifyHash):
-            cert: bytes = writer.transport.get_extra_info(
-                "ssl_object"
-            ).getpeercert(True)
-            if isinstance(tls, TLSVerifySHA512):
-                sum = sha512(cert).hexdigest()
-            else:
-                raise ValueError(f"unknown hash pinning {type(tls)}")
-
-            if not sum == tls.sum:
-                raise ValueError(
-                    f"pinned hash for {hostname} does not match ({sum})"
-                )
+        connect = TLSConnect(hostname, port)
+        token   = TLS_CONNECT.set(connect)
+        try:
+            reader, writer = await open_stream(
+                host=hostname,
+                port=port,
+                **_connect_args(hostname, tls, bindhost))
+        finally:
+            TLS_CONNECT.reset(token)
 
+        _connected(writer.transport, hostname, tls, connect)
         return (TCPReader(reader), TCPWriter(writer))
 
+class _LineProtocol(BufferedProtocol):
+    # the event loop reads straight into our buffer. readers are only
+    # woken once there's at least one whole line (or the buffer's full,
+    # or the connection's gone) rather than for every packet
+    def __init__(self, buffer_size: int):
+        self._buffer   = bytearray(buffer_size)
+        self._view     = memoryview(self._buffer)
+        self._end      = 0 # bytes in _buffer
+        self._line_end = 0 # bytes in _buffer up to and including the last \n
+        self._paused   = False
+        self.eof       = False
+        self.lost      = False
+
+        self._transport: Optional[Transport] = None
+        self._readable = Event()
+        self._writable = Event()
+        self._writable.set()
+        self._lost: "Future[None]" = get_running_loop().create_future()
+
+    def connection_made(self, transport: BaseTransport):
+        self._transport = cast(Transport, transport)
+    def connection_lost(self, exc: Optional[Exception]):
+        self.eof  = True
+        self.lost = True
+        self._readable.set()
+        self._writable.set()
+        if not self._lost.done():
+            self._lost.set_result(None)
+
+    def get_buffer(self, sizehint: int) -> memoryview:
+        return self._view[self._end:]
+    def buffer_updated(self, nbytes: int):
+        start      = self._end
+        self._end += nbytes
+
+        line_end = self._buffer.rfind(b"\n", start, self._end)
+        if not line_end == -1:
+            self._line_end = line_end+1
+            self._readable.set()
+        if self._end == len(self._buffer):
+            # nobody's reading; stop until they do
+            self._transport.pause_reading() # type: ignore
+            self._paused = True
+            self._readable.set()
+    def eof_received(self) -> bool:
+        self.eof = True
+        self._readable.set()
+        return False
+
+    def pause_writing(self):
+        self._writable.clear()
+    def resume_writing(self):
+        self._writable.set()
+
+    def _ready(self) -> bool:
+        return (self._line_end > 0 or
+            self._end == len(self._buffer) or
+            self.eof)
+
+    async def wait_readable(self):
+        while not self._ready():
+            self._readable.clear()
+            await self._readable.wait()
+    async def wait_writable(self):
+        await self._writable.wait()
+    async def wait_lost(self):
+        await self._lost
+
+    def peek(self, byte_count: int) -> memoryview:
+        # whole lines, if we've got any, up to `byte_count` bytes
+        count = self._line_end or self._end
+        if count > byte_count:
+            count = self._buffer.rfind(b"\n", 0, byte_count)+1 or byte_count
+        return self._view[:count]
+    def pending(self) -> memoryview:
+        return self._view[:self._end]
+    def consume(self, byte_count: int):
+        rest = self._end-byte_count
+        self._view[:rest] = self._view[byte_count:self._end]
+        self._end      = rest
+        self._line_end = max(self._line_end-byte_count, 0)
+
+        if self._paused and not self._transport is None:
+            self._paused = False
+            self._transport.resume_reading()
+
+class LineReader(ITCPBufferReader):
+    def __init__(self, protocol: _LineProtocol):
+        self._protocol = protocol
+
+    async def read(self, byte_count: int) -> bytes:
+        await self._protocol.wait_readable()
+        data = bytes(self._protocol.peek(byte_count))
+        self._protocol.consume(len(data))
+        return data
+    async def readinto(self, buffer: memoryview) -> int:
+        await self._protocol.wait_readable()
+        data  = self._protocol.peek(len(buffer))
+        count = len(data)
+        buffer[:count] = data
+        self._protocol.consume(count)
+        return count
+    def unread(self) -> bytes:
+        # whatever's been read off the socket but not read from us
+        data = bytes(self._protocol.pending())
+        self._protocol.consume(len(data))
+        return data
+class LineWriter(ITCPWriter):
+    def __init__(self, transport: Transport, protocol: _LineProtocol):
+        self._transport = transport
+        self._protocol  = protocol
+
+    def get_peer(self) -> Tuple[str, int]:
+        address, port, *_ = self._transport.get_extra_info("peername")
+        return (address, port)
+
+    def write(self, data: bytes):
+        self._transport.write(data)
+    def detach(self) -> int:
+        # see `TCPWriter.detach()`
+        self._transport.pause_reading()
+        return self._transport.get_extra_info("socket").fileno()
+
+    async def drain(self):
+        if self._protocol.lost:
+            raise ConnectionResetError("connection lost")
+        await self._protocol.wait_writable()
+
+    async def close(self):
+        self._transport.close()
+        await self._protocol.wait_lost()
+
+class LineTransport(ITCPTransport):
+    # an alternative to `TCPTransport` that skips `StreamReader`; see
+    # `_LineProtocol`. `buffer_size` must fit the longest line we'll get
+    def __init__(self, buffer_size: int=READ_BUFFER):
+        self._buffer_size = buffer_size
+
+    async def connect(self,
+            hostname: str,
+            port:     int,
+            tls:      Optional[TLS],
+            bindhost: Optional[str]=None
+            ) -> Tuple[ITCPReader, ITCPWriter]:
+
+        connect = TLSConnect(hostname, port)
+        token   = TLS_CONNECT.set(connect)
+        try:
+            transport, protocol = await create_connection(
+                lambda: _LineProtocol(self._buffer_size),
+                hostname,
+                port,
+                **_connect_args(hostname, tls, bindhost))
+        finally:
+            TLS_CONNECT.reset(token)
+
+        _connected(transport, hostname, tls, connect)
+        return (LineReader(protocol), LineWriter(transport, protocol))
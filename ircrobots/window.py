@@ -0,0 +1,66 @@
+from asyncio import Future, TimerHandle, ensure_future, get_event_loop
+from typing  import Awaitable, Callable, Iterable, List, Optional, Set
+
+from .interface import SentLine
+
+class _Request(object):
+    def __init__(self, names: Set[str], weight: int):
+        self.names  = names
+        self.weight = weight
+        self.timer: Optional[TimerHandle] = None
+
+class Window(object):
+    # requests in flight, each waiting on an answer about some names. a
+    # request is over once every name has been answered, once its line has
+    # failed to send (e.g. expired) or `timeout` seconds after it was sent,
+    # whichever comes first. `given_up()` is called for the latter two
+    def __init__(self, timeout: float, given_up: Callable[[], None]):
+        self.timeout   = timeout
+        self._given_up = given_up
+        self._requests: List[_Request] = []
+
+    def __len__(self) -> int:
+        return len(self._requests)
+    def __contains__(self, name: str) -> bool:
+        return any(name in request.names for request in self._requests)
+
+    def weight(self) -> int:
+        return sum(request.weight for request in self._requests)
+
+    def add(self,
+            names:  Iterable[str],
+            sent:   Awaitable[SentLine],
+            weight: int=0):
+        request = _Request(set(names), weight)
+        self._requests.append(request)
+        ensure_future(sent).add_done_callback(
+            lambda fut: self._sent(request, fut))
+
+    def _sent(self, request: _Request, fut: "Future[SentLine]"):
+        if not request in self._requests:
+            pass
+        elif fut.cancelled() or fut.exception() is not None:
+            self._give_up(request)
+        else:
+            request.timer = get_event_loop().call_later(
+                self.timeout, self._give_up, request)
+
+    def answered(self, name: str) -> bool:
+        # True if that was the last name its request was waiting on
+        for request in self._requests:
+            if name in request.names:
+                request.names.remove(name)
+                if not request.names:
+                    self._remove(request)
+                    return True
+                break
+        return False
+
+    def _remove(self, request: _Request):
+        self._requests.remove(request)
+        if request.timer is not None:
+            request.timer.cancel()
+    def _give_up(self, request: _Request):
+        if request in self._requests:
+            self._remove(request)
+            self._given_up()
@@ -1 +1,20 @@
+from .asyncs import *
+from .bot import *
+from .casefold import *
+from .formatting import *
 from .glob import *
+from .handover import *
+from .joins import *
+from .matching import *
+from .multiline import *
+from .reader import *
+from .scheduler import *
+from .scram import *
+from .security import *
+from .sendqueue import *
+from .snapshot import *
+from .sts import *
+from .throttle import *
+from .tracking import *
+from .transport import *
+from .who import *
@@ -0,0 +1,143 @@
+import asyncio, unittest
+from time      import monotonic
+from irctokens import tokenise
+from ircstates import Server
+from ircrobots.asyncs   import WaitFor, WaitForRegistry, LabelRegistry
+from ircrobots.matching import Response, ANY
+
+def _run(coro):
+    return asyncio.run(coro)
+
+def _wait(command: str) -> WaitFor:
+    return WaitFor(Response(command, [ANY]), monotonic()+10)
+
+class WaitForRegistryTestResolve(unittest.TestCase):
+    def test_command(self):
+        async def _test():
+            server  = Server("test")
+            waits   = WaitForRegistry()
+            pong    = _wait("PONG")
+            privmsg = _wait("PRIVMSG")
+            waits.add(pong)
+            waits.add(privmsg)
+
+            self.assertTrue(waits.resolve(server, tokenise("PONG :x")))
+            self.assertEqual((await pong).command, "PONG")
+            self.assertFalse(privmsg.done())
+            self.assertEqual(len(waits), 1)
+        _run(_test())
+
+    def test_labeled(self):
+        # labeled waiters only see lines outside a labeled response
+        async def _test():
+            server = Server("test")
+            waits  = WaitForRegistry()
+            pong   = _wait("PONG")
+            pong.with_label("1")
+            waits.add(pong)
+
+            self.assertFalse(waits.resolve(server, tokenise("PONG :x"), True))
+            self.assertTrue(waits.resolve(server, tokenise("PONG :x")))
+            self.assertEqual(len(waits), 0)
+        _run(_test())
+
+    def test_remove_reject(self):
+        async def _test():
+            waits = WaitForRegistry()
+            pong  = _wait("PONG")
+            ping  = _wait("PING")
+            waits.add(pong)
+            waits.add(ping)
+            waits.remove(pong)
+            self.assertEqual(len(waits), 1)
+
+            waits.reject(ValueError())
+            self.assertEqual(len(waits), 0)
+            with self.assertRaises(ValueError):
+                await ping
+        _run(_test())
+
+class LabelRegistryTestRoute(unittest.TestCase):
+    def test_single(self):
+        async def _test():
+            server = Server("test")
+            labels = LabelRegistry()
+            pong   = _wait("PONG")
+            self.assertFalse(labels.add(server, "1", pong))
+
+            line = tokenise("@label=1 :srv PONG :x")
+            self.assertEqual(labels.route(server, line), (True, True))
+            self.assertIs(await pong, line)
+            # finished and forgotten
+            self.assertEqual(labels._labels, {})
+        _run(_test())
+
+    def test_unknown(self):
+        server = Server("test")
+        labels = LabelRegistry()
+        line   = tokenise("@label=1 :srv PONG :x")
+        self.assertEqual(labels.route(server, line), (False, False))
+
+    def test_batch(self):
+        async def _test():
+            server   = Server("test")
+            labels   = LabelRegistry()
+            response = labels.response("1", monotonic()+10)
+
+            for line in [
+                    "@label=1 :srv BATCH +b labeled-response",
+                    "@batch=b :srv 311 nick target u h * :real",
+                    "@batch=b :srv 318 nick target :end"]:
+                self.assertTrue(labels.route(server, tokenise(line))[0])
+            self.assertFalse(response.finished)
+
+            labels.route(server, tokenise(":srv BATCH -b"))
+            lines = await response
+            self.assertEqual([l.command for l in lines], ["311", "318"])
+        _run(_test())
+
+    def test_buffered(self):
+        # a reply read before anything waits on it isn't lost
+        async def _test():
+            server = Server("test")
+            labels = LabelRegistry()
+            labels.response("1", monotonic()+10)
+            labels.route(server,
+                tokenise("@label=1 :srv BATCH +b labeled-response"))
+            labels.route(server, tokenise("@batch=b :srv PONG :x"))
+
+            pong = _wait("PONG")
+            self.assertTrue(labels.add(server, "1", pong))
+            self.assertEqual((await pong).command, "PONG")
+        _run(_test())
+
+    def test_ack(self):
+        async def _test():
+            server   = Server("test")
+            labels   = LabelRegistry()
+            response = labels.response("1", monotonic()+10)
+            labels.route(server, tokenise("@label=1 :srv ACK"))
+            self.assertEqual(await response, [])
+        _run(_test())
+
+    def test_late(self):
+        # waiting on a response that's already finished doesn't make a new
+        # entry that'd never finish
+        async def _test():
+            server = Server("test")
+            labels = LabelRegistry()
+            pong   = _wait("PONG")
+            labels.add(server, "1", pong)
+            labels.route(server, tokenise("@label=1 :srv PONG :x"))
+            labels.remove("1", pong)
+            self.assertEqual(labels._labels, {})
+
+            response = labels.response("1", monotonic()+10)
+            self.assertTrue(response.finished)
+            self.assertEqual([l.command for l in await response], ["PONG"])
+
+            pong = _wait("PONG")
+            self.assertFalse(labels.add(server, "1", pong))
+            labels.remove("1", pong)
+            self.assertEqual(labels._labels, {})
+        _run(_test())
@@ -0,0 +1,46 @@
+import asyncio, unittest
+from ircrobots.bot      import Bot
+from ircrobots.params   import ConnectionParams
+from ircrobots.security import TLSVerifyChain
+from .ircd import FakeIRCd, run_bot, wait_until
+
+class BotTestSTS(unittest.TestCase):
+    def test_upgrade(self):
+        # a plaintext connection told about STS reconnects with TLS
+        ircd = FakeIRCd(caps="sts=port=6697")
+        async def _test(bot):
+            params = ConnectionParams("bot", "localhost", 6667, tls=None)
+            await bot.add_server("test", params, transport=ircd)
+            await wait_until(lambda: len(ircd.connects) > 1)
+            return bot
+        bot = run_bot(_test)
+
+        self.assertEqual(ircd.connects[0], (6667, None))
+        port, tls = ircd.connects[1]
+        self.assertEqual(port, 6697)
+        self.assertIsInstance(tls, TLSVerifyChain)
+        self.assertIn("test", bot.servers)
+
+class BotTestConnects(unittest.TestCase):
+    def test_before_run(self):
+        # more servers than `connect_max` can be added before `run()`
+        async def _test():
+            bot   = Bot(connect_max=2)
+            ircds = [FakeIRCd() for _ in range(3)]
+            for i, ircd in enumerate(ircds):
+                params = ConnectionParams("bot", "localhost", 6667, tls=None)
+                await asyncio.wait_for(
+                    bot.add_server(str(i), params, transport=ircd), 1)
+
+            run = asyncio.ensure_future(bot.run())
+            try:
+                await wait_until(lambda: all(
+                    server.registered for server in bot.servers.values()))
+                return bot.connects.active()
+            finally:
+                run.cancel()
+                try:
+                    await run
+                except BaseException:
+                    pass
+        self.assertEqual(asyncio.run(_test()), 0)
@@ -0,0 +1,31 @@
+import unittest
+from irctokens import tokenise
+from ircrobots.bot import Bot
+from ircrobots.server import Server
+
+class CasefoldTestCache(unittest.TestCase):
+    def test_hits(self):
+        server = Server(Bot(), "test")
+        self.assertEqual(server.casefold("Nick[a]"), "nick{a}")
+        self.assertEqual(server.casefold("Nick[a]"), "nick{a}")
+        self.assertEqual(server.casefold_misses, 1)
+        self.assertEqual(server.casefold_hits, 1)
+        self.assertEqual(server.casefold_hit_rate(), 0.5)
+
+    def test_bounded(self):
+        server = Server(Bot(), "test")
+        server.casefold_max = 2
+        server.casefold("A")
+        server.casefold("B")
+        server.casefold("A")
+        # B is the least recently used now
+        server.casefold("C")
+        self.assertEqual(set(server._folded), {"A", "C"})
+
+    def test_casemapping(self):
+        server = Server(Bot(), "test")
+        self.assertEqual(server.casefold("Nick[a]"), "nick{a}")
+        server.parse_tokens(tokenise(
+            ":srv 005 bot CASEMAPPING=ascii :are supported"))
+        self.assertEqual(server.casefold("Nick[a]"), "nick[a]")
+        self.assertEqual(server.casefold_misses, 2)
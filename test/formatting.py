@@ -0,0 +1,66 @@
+import unittest
+from ircrobots import formatting
+
+class FormattingTestSplit(unittest.TestCase):
+    def test_space(self):
+        chunks = formatting.split("hello there world", 12)
+        self.assertEqual(chunks, ["hello there ", "world"])
+
+    def test_no_space(self):
+        chunks = formatting.split("a"*25, 10)
+        self.assertEqual(chunks, ["a"*10, "a"*10, "a"*5])
+
+    def test_utf8(self):
+        chunks = formatting.split("ü"*5, 3)
+        self.assertEqual(chunks, ["ü"]*5)
+
+    def test_colour(self):
+        chunks = formatting.split("ab\x0304,12cd", 4)
+        self.assertEqual(chunks, ["ab", "\x0304,12", "cd"])
+
+    def test_background(self):
+        # the same colour codes as `tokens()`
+        chunks = formatting.split("ab\x03,12cd", 4)
+        self.assertEqual(chunks, ["ab", "\x03,12", "cd"])
+
+    def test_join(self):
+        s      = "the quick \x02brown\x02 fox jumps ö"*40
+        chunks = formatting.split(s, 50)
+        self.assertEqual("".join(chunks), s)
+        for chunk in chunks:
+            self.assertLessEqual(len(chunk.encode("utf8")), 50)
+
+class FormattingTestTokens(unittest.TestCase):
+    def test_tokens(self):
+        tokens = formatting.tokens("a\x0304,12b\x03,5c\x03d\x034,e\x02\x1d")
+        self.assertEqual(tokens,
+            ["\x0304,12", "\x03,5", "\x03", "\x034", "\x02", "\x1d"])
+
+    def test_strip(self):
+        stripped = formatting.strip("\x02hi\x0f \x0304,12the\x03re\x034,")
+        self.assertEqual(stripped, "hi there,")
+
+class FormattingTestSpans(unittest.TestCase):
+    def test_spans(self):
+        spans = formatting.spans("a \x02b\x0304,12c\x03d\x0fe")
+        Style = formatting.Style
+        self.assertEqual(spans, [
+            ("a ", Style()),
+            ("b",  Style(bold=True)),
+            ("c",  Style(bold=True, foreground=4, background=12)),
+            ("d",  Style(bold=True)),
+            ("e",  Style())
+        ])
+
+    def test_merge(self):
+        spans = formatting.spans("\x1fa\x02\x02b\x0fc\x03")
+        self.assertEqual(spans, [
+            ("ab", formatting.Style(underline=True)),
+            ("c",  formatting.Style())
+        ])
+
+    def test_foreground(self):
+        # a new foreground keeps the background
+        spans = formatting.spans("\x033,4a\x035b")
+        self.assertEqual([(s.foreground, s.background) for _, s in spans],
+            [(3, 4), (5, 4)])
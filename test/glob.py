@@ -1,4 +1,5 @@
 import unittest
+from ircstates.casemap import CaseMap
 from ircrobots import glob
 
 class GlobTestCollapse(unittest.TestCase):
@@ -14,3 +15,65 @@ class GlobTestCollapse(unittest.TestCase):
 
         c4 = glob.collapse("a*?*a?**")
         self.assertEqual(c4, "a?*a?*")
+
+class GlobTestMatch(unittest.TestCase):
+    def test_literal(self):
+        g = glob.compile("nick!user@host")
+        self.assertTrue(g.match("nick!user@host"))
+        self.assertFalse(g.match("nick!user@hos"))
+        self.assertFalse(g.match("nick!user@hostt"))
+
+    def test_wildcards(self):
+        g = glob.compile("*!?ser@*.example.*")
+        self.assertTrue(g.match("nick!user@a.example.com"))
+        self.assertTrue(g.match("!user@.example."))
+        self.assertFalse(g.match("nick!user@example.com"))
+        self.assertFalse(g.match("nick!ser@a.example.com"))
+
+    def test_trailing(self):
+        self.assertTrue(glob.compile("a*").match("a"))
+        self.assertTrue(glob.compile("*").match(""))
+        self.assertFalse(glob.compile("?*").match(""))
+
+    def test_overlap(self):
+        # the tail mustn't reuse what the head matched
+        self.assertFalse(glob.compile("ab*ba").match("aba"))
+        self.assertTrue(glob.compile("ab*ba").match("abba"))
+
+    def test_casemap(self):
+        g = glob.compile("Nick[A]!*@*", CaseMap.RFC1459)
+        self.assertTrue(g.match("nick{a}!u@h"))
+        g = glob.compile("Nick[A]!*@*", CaseMap.ASCII)
+        self.assertFalse(g.match("nick{a}!u@h"))
+        self.assertFalse(glob.compile("Nick!*@*").match("nick!u@h"))
+
+class GlobTestSet(unittest.TestCase):
+    PATTERNS = [
+        "nick!user@host",
+        "*!*@*.example.com",
+        "bad*!*@*",
+        "*!~ident@*",
+        "*!*@10.0.?.*",
+        "*"
+    ]
+
+    def test_match(self):
+        globs = glob.GlobSet(self.PATTERNS)
+        self.assertEqual(sorted(globs.match("nick!user@host")),
+            ["*", "nick!user@host"])
+        self.assertEqual(sorted(globs.match("badger!~ident@a.example.com")),
+            ["*", "*!*@*.example.com", "*!~ident@*", "bad*!*@*"])
+        self.assertEqual(sorted(globs.match("n!u@10.0.1.2")),
+            ["*", "*!*@10.0.?.*"])
+
+    def test_remove(self):
+        globs = glob.GlobSet(self.PATTERNS)
+        globs.remove("*")
+        globs.remove("*!*@*.example.com")
+        self.assertEqual(len(globs), 4)
+        self.assertFalse(globs.any("n!u@a.example.com"))
+        self.assertTrue(globs.any("n!~ident@a.example.com"))
+
+    def test_casemap(self):
+        globs = glob.GlobSet(["Nick[A]!*@*"], CaseMap.RFC1459)
+        self.assertEqual(globs.match("NICK{a}!u@h"), ["Nick[A]!*@*"])
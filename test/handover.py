@@ -0,0 +1,79 @@
+import asyncio, os, tempfile, threading, unittest
+from typing    import List
+from irctokens import build, Line
+from ircrobots.bot      import Bot
+from ircrobots.server   import Server
+from ircrobots.params   import ConnectionParams
+from ircrobots.sendqueue import SendExpiredError
+from ircrobots.handover import _send, _receive
+from .ircd import FakeIRCd, FakeReader, FakeWriter, run_bot, wait_until
+
+class HandoverTestFDs(unittest.TestCase):
+    def test(self):
+        # file descriptors make it across, along with the payload
+        read_fd, write_fd = os.pipe()
+        with tempfile.TemporaryDirectory() as dir:
+            path     = os.path.join(dir, "handover")
+            received = []
+            thread   = threading.Thread(
+                target=lambda: received.append(_receive(path)))
+            thread.start()
+            while not os.path.exists(path):
+                pass
+            _send(path, b"payload", [write_fd])
+            thread.join()
+        os.close(write_fd)
+
+        payload, fds = received[0]
+        self.assertEqual(payload, b"payload")
+        os.write(fds[0], b"hello")
+        os.close(fds[0])
+        self.assertEqual(os.read(read_fd, 5), b"hello")
+        os.close(read_fd)
+
+class DrainServer(Server):
+    def __init__(self, bot: Bot, name: str):
+        super().__init__(bot, name)
+        self.read: List[str] = []
+    async def line_read(self, line: Line):
+        if line.command == "NOTICE":
+            await asyncio.sleep(0.1)
+        self.read.append(line.command)
+
+class DrainBot(Bot):
+    def create_server(self, name: str):
+        return DrainServer(self, name)
+
+class HandoverTestDetach(unittest.TestCase):
+    def test_drain(self):
+        # lines that were parsed get handled before we detach; the rest
+        # are handed over unparsed
+        ircd = FakeIRCd()
+        async def _test(bot):
+            params = ConnectionParams("bot", "localhost", 6667, tls=None)
+            await bot.add_server("test", params, transport=ircd)
+            server = bot.servers["test"]
+            await wait_until(lambda: "422" in server.read)
+            ircd.push(":nick!u@h NOTICE bot :slow",
+                *[":nick!u@h PRIVMSG bot :hi there"]*3)
+            await asyncio.sleep(0.01)
+            await server.drain()
+            return server, server.detach()
+        server, (fd, unread, unsent) = run_bot(_test, bot_type=DrainBot)
+        self.assertEqual(server.read[-1], "NOTICE")
+        self.assertEqual(unread, b":nick!u@h PRIVMSG bot :hi there\r\n"*3)
+
+    def test_expired(self):
+        # queued lines that have expired aren't handed over
+        async def _test():
+            ircd   = FakeIRCd()
+            reader = FakeReader()
+            server = Server(Bot(), "test")
+            server._setup(reader, FakeWriter(ircd, reader),
+                ConnectionParams("bot", "localhost", 6667, tls=None))
+            sent = server.send(build("PRIVMSG", ["#chan", "hi"]), expire=0.01)
+            await asyncio.sleep(0.05)
+            return server.detach(), sent.exception()
+        (fd, unread, unsent), error = asyncio.run(_test())
+        self.assertEqual(unsent, b"")
+        self.assertIsInstance(error, SendExpiredError)
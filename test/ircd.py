@@ -0,0 +1,111 @@
+import asyncio
+from typing    import Callable, List, Optional, Tuple
+from irctokens import Line, tokenise
+from ircrobots.bot       import Bot
+from ircrobots.interface import (ITCPTransport, ITCPReader, ITCPBufferReader,
+    ITCPWriter)
+from ircrobots.security  import TLS
+
+# an IRC server to test against, without the network. it answers
+# registration and whatever `handler` is given the lines we send
+
+class FakeReader(ITCPBufferReader):
+    def __init__(self):
+        self.queue: "asyncio.Queue[bytes]" = asyncio.Queue()
+    async def read(self, byte_count: int) -> bytes:
+        return await self.queue.get()
+    async def readinto(self, buffer: memoryview) -> int:
+        data = await self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+    def unread(self) -> bytes:
+        return b""
+
+class FakeWriter(ITCPWriter):
+    def __init__(self, ircd: "FakeIRCd", reader: FakeReader):
+        self._ircd   = ircd
+        self._reader = reader
+        self._buffer = b""
+        self.closed  = False
+    def write(self, data: bytes):
+        self._buffer += data
+        while b"\r\n" in self._buffer:
+            line, _, self._buffer = self._buffer.partition(b"\r\n")
+            self._ircd.received(tokenise(line.decode("utf8")))
+    def detach(self) -> int:
+        return -1
+    def get_peer(self) -> Tuple[str, int]:
+        return ("127.0.0.1", 6667)
+    async def drain(self):
+        pass
+    async def close(self):
+        self.closed = True
+        self._reader.queue.put_nowait(b"")
+
+class FakeIRCd(ITCPTransport):
+    def __init__(self,
+            caps:     str="",
+            isupport: str="CASEMAPPING=rfc1459",
+            handler:  Optional[Callable[["FakeIRCd", Line], None]]=None):
+        self.caps     = caps
+        self.isupport = isupport
+        self.handler  = handler
+        # (port, tls) for each connection we've been asked to make
+        self.connects: List[Tuple[int, Optional[TLS]]] = []
+        # every line we've been sent
+        self.lines: List[Line] = []
+
+    async def connect(self,
+            hostname: str,
+            port:     int,
+            tls:      Optional[TLS],
+            bindhost: Optional[str]=None
+            ) -> Tuple[ITCPReader, ITCPWriter]:
+        self.connects.append((port, tls))
+        self.reader = FakeReader()
+        self.writer = FakeWriter(self, self.reader)
+        return (self.reader, self.writer)
+
+    def push(self, *lines: str):
+        # all in one read
+        data = "".join(f"{line}\r\n" for line in lines).encode("utf8")
+        self.reader.queue.put_nowait(data)
+
+    def hangup(self):
+        self.reader.queue.put_nowait(b"")
+
+    def received(self, line: Line):
+        self.lines.append(line)
+        if line.command == "CAP" and line.params[0] == "LS":
+            self.push(f":srv CAP * LS :{self.caps}")
+        elif line.command == "USER":
+            self.push(
+                ":srv 001 bot :welcome",
+                f":srv 005 bot {self.isupport} :are supported",
+                ":srv 422 bot :no motd")
+        if self.handler is not None:
+            self.handler(self, line)
+
+def run_bot(
+        test:    Callable[[Bot], "asyncio.Future"],
+        timeout: float=5,
+        bot_type: Callable[[], Bot]=Bot):
+    # run `test(bot)` alongside `bot.run()`
+    async def _run():
+        bot = bot_type()
+        run = asyncio.ensure_future(bot.run())
+        try:
+            return await asyncio.wait_for(test(bot), timeout)
+        finally:
+            run.cancel()
+            try:
+                await run
+            except BaseException:
+                pass
+    return asyncio.run(_run())
+
+async def wait_until(check: Callable[[], bool], timeout: float=2):
+    async def _wait():
+        while not check():
+            await asyncio.sleep(0.01)
+    await asyncio.wait_for(_wait(), timeout)
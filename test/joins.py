@@ -0,0 +1,98 @@
+import asyncio, unittest
+from collections   import deque
+from typing        import List
+from unittest.mock import patch
+from irctokens import Line
+from ircrobots.bot import Bot
+from ircrobots.params import ConnectionParams
+from ircrobots.server import Server, LINE_MAX
+from ircrobots.sendqueue import SendExpiredError
+from .ircd import FakeIRCd, run_bot, wait_until
+
+def _server(isupport: str="") -> Server:
+    server = Server(Bot(), "test")
+    if isupport:
+        server.isupport.from_tokens(isupport.split(" "))
+    return server
+
+class JoinsTestPack(unittest.TestCase):
+    def test_keys(self):
+        joins = deque([("#a", "k1"), ("#b", "k2"), ("#c", None)])
+        line, names = _server()._pack_joins(joins)
+        self.assertEqual(line.params, ["#a,#b,#c", "k1,k2"])
+        self.assertEqual(names, ["#a", "#b", "#c"])
+        self.assertEqual(len(joins), 0)
+
+    def test_length(self):
+        joins  = deque((f"#channel{i}", None) for i in range(1000))
+        server = _server()
+        lines  = []
+        while joins:
+            line, _ = server._pack_joins(joins)
+            lines.append(line)
+        self.assertEqual(
+            sum(len(line.params[0].split(",")) for line in lines), 1000)
+        for line in lines:
+            self.assertLessEqual(len(f"{line.format()}\r\n"), LINE_MAX)
+        self.assertGreater(len(lines[0].format()), LINE_MAX-16)
+
+    def test_targmax(self):
+        joins = deque((f"#{i}", None) for i in range(10))
+        line, names = _server("TARGMAX=JOIN:4,PRIVMSG:")._pack_joins(joins)
+        self.assertEqual(len(names), 4)
+        self.assertEqual(len(joins), 6)
+
+def _autojoin(ircd: FakeIRCd, autojoin: List[str], count: int):
+    # the first `count` JOIN lines we send
+    async def _test(bot):
+        params = ConnectionParams("bot", "localhost", 6667, tls=None,
+            autojoin=autojoin, join_window=1)
+        await bot.add_server("test", params, transport=ircd)
+        await wait_until(lambda: len(_joins(ircd)) >= count)
+        await asyncio.sleep(0.05)
+        return _joins(ircd)
+    return run_bot(_test)
+
+def _joins(ircd: FakeIRCd) -> List[str]:
+    return [" ".join(l.params) for l in ircd.lines if l.command == "JOIN"]
+
+class JoinsTestAutojoin(unittest.TestCase):
+    def test_limit(self):
+        # keyed channels first, and no more than CHANLIMIT allows
+        ircd = FakeIRCd(isupport="CHANLIMIT=#:2,&:")
+        joins = _autojoin(ircd, ["#a", "#b key", "#c", "&d"], 1)
+        self.assertEqual(joins, ["#b,#a,&d key"])
+
+    def test_window(self):
+        # one JOIN line at a time; the next once the server's answered
+        def _handler(ircd: FakeIRCd, line: Line):
+            if line.command == "JOIN":
+                chan = line.params[0]
+                if chan == "#b":
+                    ircd.push(f":srv 474 bot {chan} :banned")
+                else:
+                    ircd.push(f":bot!u@h JOIN {chan}",
+                        f":srv 366 bot {chan} :end")
+        ircd = FakeIRCd(isupport="TARGMAX=JOIN:1", handler=_handler)
+        joins = _autojoin(ircd, ["#a", "#b", "#c"], 3)
+        self.assertEqual(joins, ["#a", "#b", "#c"])
+
+    def test_timeout(self):
+        # a JOIN we hear nothing back about doesn't hold up the rest
+        ircd = FakeIRCd(isupport="TARGMAX=JOIN:1")
+        with patch("ircrobots.server.JOIN_TIMEOUT", 0.05):
+            joins = _autojoin(ircd, ["#a", "#b"], 2)
+        self.assertEqual(joins, ["#a", "#b"])
+
+    def test_send_failed(self):
+        # nor does one that never got sent
+        async def _test():
+            server = _server("TARGMAX=JOIN:1")
+            server.params = ConnectionParams("bot", "localhost", 6667,
+                join_window=1)
+            server._batch_joins(["#a", "#b"])
+            line = server._send_queue.get_nowait()
+            line.future.set_exception(SendExpiredError())
+            await asyncio.sleep(0)
+            return server._send_queue.get_nowait().line.params[0]
+        self.assertEqual(asyncio.run(_test()), "#b")
@@ -0,0 +1,58 @@
+import unittest
+from irctokens import hostmask, tokenise
+from ircstates import Server
+from ircrobots.matching import (Response, Responses, ResponseOr,
+    CompiledResponses, ANY, SELF, Folded, Regex, Masks)
+
+LINES = [
+    ":srv 001 nick :hello",
+    ":srv 311 nick other user host * :real",
+    ":srv 311 nick Target user host * :real",
+    ":srv 318 nick target :end",
+    ":srv CAP * ACK :sasl",
+    ":srv CAP * NAK :sasl",
+    ":nick!u@h PRIVMSG #chan :hello world",
+    ":nick!u@h PRIVMSG #chan",
+    "PING :123",
+]
+
+class CompiledResponsesTestMatch(unittest.TestCase):
+    def test(self):
+        server = Server("test")
+        server.nickname = server.nickname_lower = "nick"
+
+        responses = [
+            Response("001"),
+            Responses(["311", "318"], [SELF, Folded("target")]),
+            Response("CAP", [ANY, "ACK"]),
+            Response("PRIVMSG", ["#chan", Regex("^hello")]),
+            Response("PRIVMSG", ["#other", ANY]),
+        ]
+        or_    = ResponseOr(*responses)
+        compiled = CompiledResponses(*responses)
+
+        for line_s in LINES:
+            line = tokenise(line_s)
+            self.assertEqual(
+                compiled.match(server, line),
+                or_.match(server, line),
+                line_s)
+
+    def test_commands(self):
+        compiled = CompiledResponses(
+            Response("001"), Responses(["311", "318"]))
+        self.assertEqual(compiled.commands(), {"001", "311", "318"})
+
+class MasksTestMatch(unittest.TestCase):
+    def test(self):
+        server = Server("test")
+        masks  = Masks(["*!*@*.example.com", "Bad*!*@*"])
+
+        self.assertTrue(masks.match(server, hostmask("n!u@a.example.com")))
+        self.assertTrue(masks.match(server, hostmask("BADGER!u@h")))
+        self.assertFalse(masks.match(server, hostmask("n!u@h")))
+
+        masks.add("*!*@h")
+        masks.remove("Bad*!*@*")
+        self.assertEqual(masks.matches(server, hostmask("badger!u@h")),
+            ["*!*@h"])
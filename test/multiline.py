@@ -0,0 +1,68 @@
+import asyncio, unittest
+from typing    import List
+from irctokens import tokenise
+from ircrobots.bot       import Bot
+from ircrobots.server    import Server, TokenBucket
+from ircrobots.params    import ConnectionParams
+from ircrobots.interface import ITCPWriter
+
+class Writer(ITCPWriter):
+    def __init__(self):
+        self.written: List[bytes] = []
+    def write(self, data: bytes):
+        self.written.extend(data.splitlines())
+    async def drain(self):
+        pass
+
+def _server(*caps: str) -> Server:
+    server = Server(Bot(), "test")
+    server.params = ConnectionParams("bot", "localhost", 6667)
+    server.available_caps = {
+        "draft/multiline":  "max-bytes=4096,max-lines=10",
+        "labeled-response": "",
+        "echo-message":     ""}
+    server.agreed_caps = list(caps)
+    return server
+
+def _queued(server: Server) -> List[str]:
+    queue = server._send_queue
+    return [queue.get_nowait().line.format() for _ in range(queue.qsize())]
+
+class MultilineTestSend(unittest.TestCase):
+    def test_label(self):
+        # only the opening BATCH is labeled
+        async def _test():
+            server = _server("draft/multiline", "labeled-response")
+            server.send_message("#a", "one\ntwo")
+            return _queued(server)
+        lines = [tokenise(l) for l in asyncio.run(_test())]
+        self.assertEqual([l.command for l in lines],
+            ["BATCH", "PRIVMSG", "PRIVMSG", "BATCH"])
+        self.assertIn("label", lines[0].tags)
+        self.assertNotIn("label", lines[3].tags or {})
+
+    def test_empty(self):
+        # a trailing (or doubled) newline doesn't send an empty PRIVMSG
+        async def _test():
+            server = _server()
+            server.send_message("#a", "one\n\ntwo\n")
+            return _queued(server)
+        self.assertEqual(asyncio.run(_test()),
+            ["PRIVMSG #a one", "PRIVMSG #a two"])
+
+    def test_throttle(self):
+        # a batch costs the throttle one line, however long it is
+        async def _test():
+            server = _server("draft/multiline", "echo-message")
+            server._writer = writer = Writer()
+            server.throttle = TokenBucket(1, 100)
+            server.send_message("#a", "one\ntwo\nthree")
+            server.send_message("#a", "four")
+
+            task = asyncio.ensure_future(server._send_lines())
+            await asyncio.sleep(0.05)
+            task.cancel()
+            return writer.written
+        written = asyncio.run(_test())
+        self.assertEqual(len(written), 5)
+        self.assertTrue(written[-1].startswith(b"BATCH -"))
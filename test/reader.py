@@ -0,0 +1,95 @@
+import asyncio, unittest
+from typing    import List, Optional, Tuple
+from irctokens import build, Line
+from ircrobots.bot      import Bot
+from ircrobots.server   import Server
+from ircrobots.params   import ConnectionParams
+from ircrobots.matching import Response, ANY
+from .ircd import FakeIRCd, run_bot, wait_until
+
+# lines `line_read()` has seen, and what it could see of the server
+class ReadServer(Server):
+    def __init__(self, bot: Bot, name: str):
+        super().__init__(bot, name)
+        self.read:    List[Tuple[str, bool, int]] = []
+        self.preread: List[Line] = []
+        self.worker:  Optional["asyncio.Future[Line]"] = None
+    def line_preread(self, line: Line):
+        self.preread.append(line)
+    async def line_read(self, line: Line):
+        self.read.append((line.command, "#chan" in self.channels,
+            self._process_queue.qsize()))
+        if line.command == "NOTICE" and line.params[-1] == "wait":
+            reply = await self.wait_for(Response("PRIVMSG", [ANY, ANY]))
+            self.read.append(("waited", reply.params[-1] == "hi", 0))
+        elif line.command == "NOTICE" and line.params[-1] == "worker":
+            reply = await self.worker
+            self.read.append(("worked", reply.params[-1] == "hi", 0))
+
+class ReadBot(Bot):
+    def create_server(self, name: str):
+        return ReadServer(self, name)
+
+def _run(test, **kwargs) -> ReadServer:
+    ircd = FakeIRCd(**kwargs)
+    async def _test(bot):
+        params = ConnectionParams("bot", "localhost", 6667, tls=None)
+        await bot.add_server("test", params, transport=ircd)
+        server = bot.servers["test"]
+        await wait_until(lambda: any(c == "422" for c, _, _ in server.read))
+        await test(ircd, server)
+        return server
+    return run_bot(_test, bot_type=ReadBot)
+
+class ReaderTestOrdering(unittest.TestCase):
+    def test_own_line(self):
+        # a JOIN and PART in one read; the JOIN's handler still sees the
+        # channel it joined
+        async def _test(ircd, server):
+            ircd.push(":bot!u@h JOIN #chan", ":bot!u@h PART #chan")
+            await wait_until(lambda: server.read[-1][0] == "PART")
+        server = _run(_test)
+        self.assertEqual(server.read[-2], ("JOIN", True, 0))
+        self.assertEqual(server.read[-1], ("PART", False, 0))
+
+    def test_bounded(self):
+        # lots of lines in one read never queue up ahead of `line_read()`
+        async def _test(ircd, server):
+            ircd.push(*[":nick!u@h PRIVMSG #chan :hello"]*100)
+            await wait_until(lambda: len(server.read) > 100)
+        server = _run(_test)
+        # (registration reads ahead, as we wait for 001 meanwhile)
+        self.assertEqual(max(depth for command, _, depth in server.read
+            if command == "PRIVMSG"), 0)
+
+    def test_handler_wait(self):
+        # a handler waiting for a later line doesn't stop it being read
+        async def _test(ircd, server):
+            ircd.push(":srv NOTICE bot :wait")
+            await asyncio.sleep(0.05)
+            ircd.push(":nick!u@h PRIVMSG bot :hi")
+            await wait_until(lambda: server.read[-1][0] == "PRIVMSG")
+        server = _run(_test)
+        self.assertEqual(server.read[-2], ("waited", True, 0))
+
+    def test_worker_wait(self):
+        # nor does a handler waiting on a task that's waiting for a line
+        async def _test(ircd, server):
+            server.worker = asyncio.ensure_future(
+                server.wait_for(Response("PRIVMSG", [ANY, ANY])))
+            ircd.push(":srv NOTICE bot :worker")
+            await asyncio.sleep(0.05)
+            ircd.push(":nick!u@h PRIVMSG bot :hi")
+            await wait_until(lambda: server.read[-1][0] == "PRIVMSG")
+        server = _run(_test)
+        self.assertEqual(server.read[-2], ("worked", True, 0))
+
+    def test_echo_preread(self):
+        # lines we echo to ourselves go through `line_preread()` too
+        async def _test(ircd, server):
+            await server.send(build("PRIVMSG", ["#chan", "hello"]))
+            await wait_until(lambda: server.read[-1][0] == "PRIVMSG")
+        server = _run(_test)
+        line = server.preread[-1]
+        self.assertEqual(line.command, "PRIVMSG")
+        self.assertTrue(line.source.startswith("bot"))
@@ -0,0 +1,42 @@
+import asyncio, unittest
+from ircrobots.scheduler import ConnectScheduler
+
+class SchedulerTest(unittest.TestCase):
+    def test_concurrency(self):
+        async def _test():
+            scheduler = ConnectScheduler(2)
+            order = []
+            async def _connect(name, weight):
+                await scheduler.acquire(name, weight)
+                order.append(name)
+
+            await scheduler.acquire("a")
+            await scheduler.acquire("b")
+            tasks = [asyncio.ensure_future(_connect(n, w))
+                for n, w in [("light", 0), ("heavy", 10)]]
+            await asyncio.sleep(0)
+            queue = [name for name, _, _ in scheduler.queue()]
+
+            scheduler.release()
+            await asyncio.sleep(0.01)
+            first = list(order)
+            scheduler.release()
+            await asyncio.gather(*tasks)
+            return queue, first, order
+        queue, first, order = asyncio.run(_test())
+        self.assertEqual(queue, ["heavy", "light"])
+        self.assertEqual(first, ["heavy"])
+        self.assertEqual(order, ["heavy", "light"])
+
+    def test_delay(self):
+        async def _test():
+            scheduler = ConnectScheduler(1)
+            task = asyncio.ensure_future(scheduler.acquire("a", delay=0.05))
+            await asyncio.sleep(0)
+            (name, _, due), = scheduler.queue()
+            await task
+            return due, scheduler.queue(), scheduler.active()
+        due, queue, active = asyncio.run(_test())
+        self.assertGreater(due, 0)
+        self.assertEqual(queue, [])
+        self.assertEqual(active, 1)
@@ -0,0 +1,53 @@
+import asyncio, unittest
+from unittest.mock import patch
+from ircrobots import scram
+from ircrobots.scram import SCRAMAlgorithm, SCRAMContext, SCRAMState
+
+# https://tools.ietf.org/html/rfc7677#section-3
+NONCE        = b"rOprNGfwEbeRWgbNEkqO"
+SERVER_FIRST = (b"r=rOprNGfwEbeRWgbNEkqO%hvYDpWUa2RaTCAfuxFIlj)hNlF$k0,"
+    b"s=W22ZaJ0SNY7soEsUEjb6gQ==,i=4096")
+CLIENT_FINAL = (b"c=biws,r=rOprNGfwEbeRWgbNEkqO%hvYDpWUa2RaTCAfuxFIlj)hNlF$k0,"
+    b"p=dHzbZapWIk4jUhN+Ute9ytag9zjfMHgsqmmiz7AndVQ=")
+SERVER_FINAL = b"v=6rriTRBi23WpRR/wtup+mMhUZUn/dB5nLTJRsjl95G4="
+
+def _context() -> SCRAMContext:
+    context = SCRAMContext(SCRAMAlgorithm.SHA_256, "user", "pencil")
+    with patch("ircrobots.scram._scram_nonce", return_value=NONCE):
+        context.client_first()
+    return context
+
+class SCRAMTest(unittest.TestCase):
+    def setUp(self):
+        scram._KEYS.clear()
+
+    def test_sync(self):
+        context = _context()
+        self.assertEqual(context.server_first(SERVER_FIRST), CLIENT_FINAL)
+        self.assertTrue(context.server_final(SERVER_FINAL))
+        self.assertEqual(context.state, SCRAMState.SUCCESS)
+
+    def test_async(self):
+        context = _context()
+        client_final = asyncio.run(context.server_first_async(SERVER_FIRST))
+        self.assertEqual(client_final, CLIENT_FINAL)
+        self.assertTrue(context.server_final(SERVER_FINAL))
+
+    def test_cached(self):
+        _context().server_first(SERVER_FIRST)
+        self.assertEqual(len(scram._KEYS), 1)
+
+        context = _context()
+        with patch("ircrobots.scram._scram_keys") as keys:
+            client_final = asyncio.run(
+                context.server_first_async(SERVER_FIRST))
+        keys.assert_not_called()
+        self.assertEqual(client_final, CLIENT_FINAL)
+        self.assertTrue(context.server_final(SERVER_FINAL))
+
+    def test_cache_max(self):
+        for i in range(scram.KEY_CACHE_MAX+1):
+            scram._cache_keys(
+                (SCRAMAlgorithm.SHA_1, b"", b"%d" % i, 1), (b"", b""))
+        self.assertEqual(len(scram._KEYS), scram.KEY_CACHE_MAX)
+        self.assertNotIn((SCRAMAlgorithm.SHA_1, b"", b"0", 1), scram._KEYS)
@@ -0,0 +1,11 @@
+import ssl, unittest
+from ircrobots.security import tls_context
+
+class SecurityTestContext(unittest.TestCase):
+    def test_cached(self):
+        self.assertIs(tls_context(), tls_context())
+        self.assertIsNot(tls_context(True), tls_context(False))
+
+    def test_verify(self):
+        self.assertEqual(tls_context(True).verify_mode, ssl.CERT_REQUIRED)
+        self.assertEqual(tls_context(False).verify_mode, ssl.CERT_NONE)
@@ -0,0 +1,309 @@
+import asyncio, unittest
+from unittest.mock import patch
+from typing    import List
+from irctokens import build
+from time import monotonic
+from ircrobots.bot       import Bot
+from ircrobots.server    import Server, TokenBucket
+from ircrobots.interface import SentLine, SendPriority, ITCPWriter
+from ircrobots.params    import ConnectionParams, SendQueuePolicy
+from ircrobots.sendqueue import (SendQueue, SendExpiredError,
+    SendQueueFullError, AGE_TIME)
+
+def _line(id: int, target: str, priority=SendPriority.DEFAULT) -> SentLine:
+    return SentLine(id, priority, build("PRIVMSG", [target, str(id)]))
+
+class SendQueueTestOrder(unittest.TestCase):
+    def test_fair(self):
+        async def _test():
+            queue = SendQueue()
+            for i in range(3):
+                queue.put_nowait(_line(i, "#spam"))
+            queue.put_nowait(_line(3, "#quiet"))
+            return [queue.get_nowait().id for _ in range(queue.qsize())]
+        self.assertEqual(asyncio.run(_test()), [0, 3, 1, 2])
+
+    def test_priority(self):
+        async def _test():
+            queue = SendQueue()
+            queue.put_nowait(_line(0, "#a", SendPriority.LOW))
+            queue.put_nowait(_line(1, "#a", SendPriority.HIGH))
+            queue.put_nowait(_line(2, "#b", SendPriority.LOW))
+            queue.put_nowait(_line(3, "#a", SendPriority.HIGH))
+            return [queue.get_nowait().id for _ in range(queue.qsize())]
+        self.assertEqual(asyncio.run(_test()), [1, 3, 0, 2])
+
+    def test_arrivals(self):
+        # lines served out of arrival order are forgotten once the lines
+        # ahead of them are served, even if the level never empties
+        async def _test():
+            queue = SendQueue()
+            sizes = []
+            for i in range(1000):
+                queue.put_nowait(_line(i, "#spam"))
+                if i % 10 == 0:
+                    queue.put_nowait(_line(-i-1, "#quiet"))
+                if i > 60:
+                    queue.get_nowait()
+                    level = queue._levels[SendPriority.DEFAULT]
+                    sizes.append(len(level.arrivals)+len(level.served))
+            return max(sizes), queue.qsize()
+        most, size = asyncio.run(_test())
+        self.assertLess(most, size*2)
+
+class SendQueueTestAging(unittest.TestCase):
+    def _order(self, old, new):
+        # `old` lines queued more than AGE_TIME before `new` lines
+        async def _test():
+            queue = SendQueue()
+            for id, priority in old:
+                queue.put_nowait(_line(id, "#old", priority))
+            with patch("ircrobots.sendqueue.monotonic",
+                    return_value=monotonic()+AGE_TIME+1):
+                for id, priority in new:
+                    queue.put_nowait(_line(id, "#new", priority))
+                return [queue.get_nowait().id for _ in range(queue.qsize())]
+        return asyncio.run(_test())
+
+    def test_high(self):
+        # however long a line's waited, it doesn't hold up HIGH
+        order = self._order(
+            [(0, SendPriority.MEDIUM), (1, SendPriority.LOW)],
+            [(2, SendPriority.HIGH), (3, SendPriority.HIGH),
+                (4, SendPriority.HIGH)])
+        self.assertEqual(order, [2, 3, 4, 1, 0])
+
+    def test_turns(self):
+        # aged lines take turns with the level above them
+        order = self._order(
+            [(0, SendPriority.LOW), (1, SendPriority.LOW)],
+            [(2, SendPriority.MEDIUM), (3, SendPriority.MEDIUM),
+                (4, SendPriority.MEDIUM)])
+        self.assertEqual(order, [0, 2, 1, 3, 4])
+
+    def test_one_level(self):
+        # and only the level above them
+        order = self._order(
+            [(0, SendPriority.LOW)],
+            [(1, SendPriority.DEFAULT-1), (2, SendPriority.DEFAULT)])
+        self.assertEqual(order, [1, 0, 2])
+
+class SendQueueTestExpire(unittest.TestCase):
+    def test(self):
+        async def _test():
+            queue = SendQueue()
+            expired = _line(0, "#a")
+            expired.deadline = 0
+            queue.put_nowait(expired)
+            queue.put_nowait(_line(1, "#a"))
+            line = queue.get_nowait()
+            return line.id, queue.qsize(), expired.future.exception()
+        id, size, error = asyncio.run(_test())
+        self.assertEqual((id, size), (1, 0))
+        self.assertIsInstance(error, SendExpiredError)
+
+    def test_room(self):
+        # expired lines stop taking up room as soon as they expire
+        async def _test():
+            server = _full_server(SendQueuePolicy.RAISE, max_lines=2)
+            first  = server.send(build("PRIVMSG", ["#a", "1"]), expire=0.01)
+            second = server.send(build("PRIVMSG", ["#a", "2"]), expire=0.01)
+            await asyncio.sleep(0.05)
+            depth = server.send_queue_depth()
+            server.send(build("PRIVMSG", ["#a", "3"]))
+            return depth, first.exception(), second.exception()
+        depth, *errors = asyncio.run(_test())
+        self.assertEqual(depth, (0, 0))
+        for error in errors:
+            self.assertIsInstance(error, SendExpiredError)
+
+    def test_waiting_room(self):
+        # or while they're waiting for room
+        async def _test():
+            server = _full_server(SendQueuePolicy.WAIT)
+            server.send(build("PRIVMSG", ["#a", "1"]))
+            waiting = server.send(build("PRIVMSG", ["#a", "2"]), expire=0.01)
+            await asyncio.sleep(0.05)
+            return server._send_queue.waiting_room(), waiting.exception()
+        waiting, error = asyncio.run(_test())
+        self.assertEqual(waiting, 0)
+        self.assertIsInstance(error, SendExpiredError)
+
+class SendQueueTestCoalesce(unittest.TestCase):
+    def test_extend(self):
+        # a coalesced send with a later deadline keeps the queued line alive
+        async def _test():
+            server = Server(Bot(), "test")
+            line   = build("MODE", ["#chan"])
+            first  = server.send(line, expire=0.01, coalesce=True)
+            second = server.send(line, expire=10, coalesce=True)
+            await asyncio.sleep(0.05)
+            return first is second, first.done(), server._send_queue.qsize()
+        self.assertEqual(asyncio.run(_test()), (True, False, 1))
+
+    def test_expired(self):
+        # nothing coalesces in to a line that's already expired
+        async def _test():
+            server = Server(Bot(), "test")
+            line   = build("WHO", ["#chan"])
+            first  = server.send(line, expire=0.01, coalesce=True)
+            await asyncio.sleep(0.05)
+            second = server.send(line, coalesce=True)
+            sent   = server._send_queue.get_nowait()
+            return first, second, sent
+        first, second, sent = asyncio.run(_test())
+        self.assertIsNot(first, second)
+        self.assertIsInstance(first.exception(), SendExpiredError)
+        self.assertIs(sent.future, second)
+
+    def test_pending_key(self):
+        # dropping an expired line doesn't forget the line that took its key
+        async def _test():
+            queue   = SendQueue()
+            expired = _line(0, "#a")
+            expired.key      = "key"
+            expired.deadline = 0
+            queue.put_nowait(expired)
+            queue.put_nowait(_line(1, "#a"))
+            line = _line(2, "#a", SendPriority.LOW)
+            line.key = "key"
+            queue.put_nowait(line)
+
+            queue.get_nowait()
+            return queue.pending("key") is line, expired.future.exception()
+        pending, error = asyncio.run(_test())
+        self.assertTrue(pending)
+        self.assertIsInstance(error, SendExpiredError)
+
+class SendQueueTestPending(unittest.TestCase):
+    def test(self):
+        async def _test():
+            queue = SendQueue()
+            line = _line(0, "#a")
+            line.key = "key"
+            queue.put_nowait(line)
+            before = queue.pending("key")
+            queue.get_nowait()
+            return before, queue.pending("key")
+        before, after = asyncio.run(_test())
+        self.assertIsNotNone(before)
+        self.assertIsNone(after)
+
+def _full_server(policy: SendQueuePolicy, max_lines: int=1) -> Server:
+    server = Server(Bot(), "test")
+    server.params = ConnectionParams("bot", "localhost", 6667,
+        sendq_policy=policy)
+    server._send_queue.max_lines = max_lines
+    return server
+
+class SendQueueTestPolicy(unittest.TestCase):
+    def test_wait(self):
+        # held back until there's room, without counting against the queue
+        async def _test():
+            server = _full_server(SendQueuePolicy.WAIT)
+            for i in range(100):
+                server.send(build("PRIVMSG", ["#a", str(i)]))
+            before = (server._send_queue.qsize(),
+                server._send_queue.waiting_room())
+            sent = server._send_queue.get_nowait().line.params[1]
+            after = (server._send_queue.qsize(),
+                server._send_queue.waiting_room())
+            return before, sent, after
+        before, sent, after = asyncio.run(_test())
+        self.assertEqual(before, (1, 99))
+        self.assertEqual(sent, "0")
+        self.assertEqual(after, (1, 98))
+
+    def test_wait_order(self):
+        # nothing jumps the lines that are waiting for room
+        async def _test():
+            server = _full_server(SendQueuePolicy.WAIT)
+            server.send(build("PRIVMSG", ["#a", "1"]))
+            server.send(build("PRIVMSG", ["#b", "2"]))
+            server._send_queue.get_nowait()
+            server.send(build("PRIVMSG", ["#c", "3"]))
+            return [server._send_queue.get_nowait().line.params[1]
+                for _ in range(2)]
+        self.assertEqual(asyncio.run(_test()), ["2", "3"])
+
+    def test_raise(self):
+        # fails straight away, not when awaited
+        async def _test():
+            server = _full_server(SendQueuePolicy.RAISE)
+            server.send(build("PRIVMSG", ["#a", "1"]))
+            with self.assertRaises(SendQueueFullError):
+                server.send(build("PRIVMSG", ["#a", "2"]))
+            return server._send_queue.qsize()
+        self.assertEqual(asyncio.run(_test()), 1)
+
+    def test_drop_low(self):
+        async def _test():
+            server = _full_server(SendQueuePolicy.DROP_LOW)
+            low = server.send(build("WHO", ["#a"]), SendPriority.LOW)
+            server.send(build("PRIVMSG", ["#a", "1"]))
+            sent = server._send_queue.get_nowait()
+            return low, sent.line.params[1], server._send_queue.qsize()
+        low, sent, size = asyncio.run(_test())
+        self.assertIsInstance(low.exception(), SendQueueFullError)
+        self.assertEqual((sent, size), ("1", 0))
+
+    def test_drop_low_none(self):
+        # nothing LOW to drop
+        async def _test():
+            server = _full_server(SendQueuePolicy.DROP_LOW)
+            server.send(build("PRIVMSG", ["#a", "1"]))
+            with self.assertRaises(SendQueueFullError):
+                server.send(build("PRIVMSG", ["#a", "2"]))
+        asyncio.run(_test())
+
+    def test_batch(self):
+        # a batch that's been started is always finished
+        async def _test():
+            server = _full_server(SendQueuePolicy.RAISE, max_lines=2)
+            server._send_multiline("#a", [("1", False), ("2", False)])
+            return [server._send_queue.get_nowait().line.command
+                for _ in range(server._send_queue.qsize())]
+        self.assertEqual(asyncio.run(_test()),
+            ["BATCH", "PRIVMSG", "PRIVMSG", "BATCH"])
+
+class Writer(ITCPWriter):
+    # every write() on its own
+    def __init__(self):
+        self.writes: List[List[bytes]] = []
+    def write(self, data: bytes):
+        self.writes.append(data.splitlines())
+    async def drain(self):
+        pass
+
+class SendLinesTest(unittest.TestCase):
+    def _send(self, count: int, tokens: int):
+        # queue `count` lines and see how `_send_lines()` writes them out
+        # with `tokens` to spend and no refill
+        async def _test():
+            server = Server(Bot(), "test")
+            server.params = ConnectionParams("bot", "localhost", 6667,
+                send_batch=3)
+            server.agreed_caps = ["echo-message"]
+            server._writer = writer = Writer()
+            server.throttle = TokenBucket(1, 1000, tokens)
+            for i in range(count):
+                server.send(build("PRIVMSG", ["#a", str(i)]))
+
+            task = asyncio.ensure_future(server._send_lines())
+            await asyncio.sleep(0.05)
+            task.cancel()
+            return ([len(lines) for lines in writer.writes],
+                server.throttle.available())
+        return asyncio.run(_test())
+
+    def test_batched(self):
+        # up to `send_batch` lines a write, a token a line
+        writes, tokens = self._send(7, 10)
+        self.assertEqual(writes, [3, 3, 1])
+        self.assertEqual(tokens, 3)
+
+    def test_throttled(self):
+        # no more lines than we've got tokens for
+        writes, tokens = self._send(5, 2)
+        self.assertEqual(writes, [2])
+        self.assertEqual(tokens, 0)
@@ -0,0 +1,65 @@
+import asyncio, json, unittest
+from irctokens import tokenise
+from ircrobots import snapshot
+from ircrobots.bot import Bot
+from ircrobots.server import Server
+from ircrobots.params import ConnectionParams, STSPolicy
+
+def _server() -> Server:
+    server = Server(Bot(), "test")
+    server.params = ConnectionParams("bot", "localhost", 6667)
+    for line in [
+            ":srv 001 bot :hi",
+            ":bot!u@h JOIN #chan",
+            ":srv 353 bot = #chan :@bot other"]:
+        server._dispatch_line(tokenise(line))
+    return server
+
+class SnapshotTest(unittest.TestCase):
+    def test_warm(self):
+        server = _server()
+        server.params.sts = STSPolicy(1, 6697, 60, False)
+        server.users["other"].account = "acct"
+        server.channels["#chan"].list_modes["b"] = ["*!*@bad"]
+        data = json.loads(json.dumps(snapshot.snapshot(server)))
+
+        params = ConnectionParams("bot", "localhost", 6667)
+        server = Server(Bot(), "test")
+        server.params = params
+        snapshot.restore(server, params, data)
+        self.assertEqual(params.sts, STSPolicy(1, 6697, 60, False))
+
+        server._dispatch_line(tokenise(":srv 001 bot :hi"))
+        server._dispatch_line(tokenise(":bot!u@h JOIN #chan"))
+        server._dispatch_line(tokenise(":srv 353 bot = #chan :@bot other"))
+        self.assertFalse(server.want_who("#chan"))
+
+        asyncio.run(server._on_read(tokenise(":srv 366 bot #chan :end"), None))
+        self.assertEqual(server.users["other"].account, "acct")
+        self.assertEqual(server.channels["#chan"].list_modes["b"], ["*!*@bad"])
+
+    def test_stale(self):
+        data = snapshot.snapshot(_server())
+        data["time"] -= snapshot.FRESH_TIME+1
+
+        params = ConnectionParams("bot", "localhost", 6667)
+        server = Server(Bot(), "test")
+        server.params = params
+        snapshot.restore(server, params, data)
+        self.assertEqual(server._warm, {})
+
+class SnapshotTestLoadState(unittest.TestCase):
+    def test(self):
+        old = _server()
+        old._dispatch_line(tokenise(":srv 005 bot NETWORK=test :ok"))
+        old.users["other"].account = "acct"
+        data = json.loads(json.dumps(snapshot.snapshot(old)))
+
+        new = Server(Bot(), "test")
+        snapshot.load_state(new, data)
+        self.assertTrue(new.registered)
+        self.assertEqual(new.nickname, "bot")
+        self.assertEqual(new.isupport.network, "test")
+        self.assertEqual(new.users["other"].account, "acct")
+        self.assertEqual(new.users["other"].channels, {"#chan"})
+        self.assertEqual(new.channels["#chan"].users["bot"].modes, {"o"})
@@ -0,0 +1,29 @@
+import os, tempfile, unittest
+from time import time
+from ircrobots.params import STSPolicy
+from ircrobots.sts import STSStore
+
+class STSTestStore(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+        os.remove(self.path)
+    def tearDown(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def test_persist(self):
+        policy = STSPolicy(int(time()), 6697, 3600, False)
+        STSStore(self.path).set("IRC.example.com", policy)
+        self.assertEqual(STSStore(self.path).get("irc.example.com"), policy)
+
+    def test_expired(self):
+        store = STSStore(self.path)
+        store.set("irc.example.com", STSPolicy(int(time())-60, 6697, 30, False))
+        self.assertIsNone(store.get("irc.example.com"))
+
+    def test_zero_duration(self):
+        store = STSStore(self.path)
+        store.set("irc.example.com", STSPolicy(int(time()), 6697, 60, False))
+        store.set("irc.example.com", STSPolicy(int(time()), 6697, 0, False))
+        self.assertIsNone(STSStore(self.path).get("irc.example.com"))
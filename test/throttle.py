@@ -0,0 +1,93 @@
+import asyncio, unittest
+from unittest.mock import patch
+from ircrobots.server import TokenBucket, BACKOFF_MAX
+from ircrobots.params import ConnectionParams
+from .ircd import FakeIRCd, run_bot, wait_until
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+    def __call__(self) -> float:
+        return self.now
+
+class TokenBucketTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self._patch = patch("ircrobots.server.monotonic", self.clock)
+        self._patch.start()
+    def tearDown(self):
+        self._patch.stop()
+
+    def test_burst(self):
+        bucket = TokenBucket(1, 1, 5)
+        self.assertEqual(bucket.available(), 5)
+        self.clock.now += 100
+        self.assertEqual(bucket.available(), 5)
+
+    def test_refill(self):
+        bucket = TokenBucket(2, 1, 4)
+        self.assertEqual(asyncio.run(bucket.acquire_many(10)), 4)
+        self.assertEqual(bucket.available(), 0)
+        self.clock.now += 1
+        self.assertEqual(bucket.available(), 2)
+
+    def test_set_rate(self):
+        # tokens earned at the old rate aren't lost to the new one
+        bucket = TokenBucket(1, 1, 4)
+        asyncio.run(bucket.acquire_many(4))
+        self.clock.now += 2
+        bucket.set_rate(1, 10, 4)
+        self.assertEqual(bucket.available(), 2)
+
+        # and don't go over the new burst
+        self.clock.now += 100
+        bucket.set_rate(1, 1, 3)
+        self.assertEqual(bucket.available(), 3)
+
+    def test_backoff(self):
+        bucket = TokenBucket(4, 1, 4)
+        bucket.backoff(10)
+        self.assertEqual(bucket.available(), 0)
+        self.clock.now += 1
+        self.assertEqual(bucket.available(), 2)
+
+        # repeats slow us down further, up to a limit
+        for _ in range(10):
+            bucket.backoff(10)
+        self.assertEqual(bucket._slow, BACKOFF_MAX)
+
+        # and we recover afterwards
+        self.clock.now += 11
+        bucket.available()
+        self.assertEqual(bucket._slow, 1)
+
+    def test_inherit(self):
+        old = TokenBucket(4, 1, 4)
+        old.backoff(10)
+        new = TokenBucket(4, 1, 4)
+        new.inherit(old)
+        # slowed down, but with the tokens it started with
+        self.assertEqual(new.available(), 4)
+        self.assertEqual(new._refill(), 2)
+
+class ThrottleTestExcessFlood(unittest.TestCase):
+    def test_reconnect(self):
+        # the connection after an "Excess Flood" starts slow, without
+        # touching our params
+        ircd = FakeIRCd()
+        async def _test(bot):
+            params = ConnectionParams("bot", "localhost", 6667, tls=None)
+            params.reconnect = 0
+            await bot.add_server("test", params, transport=ircd)
+            first = bot.servers["test"]
+            await wait_until(lambda: first.registered)
+
+            ircd.push("ERROR :Closing Link: bot (Excess Flood)")
+            ircd.hangup()
+            await wait_until(lambda: len(ircd.connects) > 1)
+            return params, first, bot.servers["test"]
+        params, first, second = run_bot(_test)
+
+        self.assertIsNot(first, second)
+        self.assertIsNone(params.throttle)
+        self.assertEqual(second.throttle._slow, 2)
@@ -0,0 +1,47 @@
+import unittest
+from irctokens import tokenise
+from ircrobots.bot import Bot
+from ircrobots.server import Server
+from ircrobots.params import ConnectionParams, TrackingLevel
+
+def _server(level: TrackingLevel) -> Server:
+    server = Server(Bot(), "test")
+    server.params = ConnectionParams("bot", "localhost", 6667)
+    server.params.channel_tracking = {"#Chan": level}
+    for line in [
+            ":srv 001 bot :hi",
+            ":bot!u@h JOIN #chan",
+            ":srv 353 bot = #chan :@bot +a b",
+            ":a!u@h JOIN #chan",
+            ":c!u@h JOIN #chan",
+            ":srv MODE #chan +ov-o c bot b",
+            ":srv MODE #chan +l 10",
+            ":c!u@h PART #chan"]:
+        server._dispatch_line(tokenise(line))
+    return server
+
+class TrackingTestLevel(unittest.TestCase):
+    def test_full(self):
+        server = _server(TrackingLevel.FULL)
+        self.assertEqual(set(server.channels["#chan"].users), {"bot", "a", "b"})
+        self.assertTrue(server.want_who("#chan"))
+
+    def test_names(self):
+        server = _server(TrackingLevel.NAMES)
+        self.assertEqual(set(server.channels["#chan"].users), {"bot", "a", "b"})
+        self.assertFalse(server.want_who("#chan"))
+
+    def test_none(self):
+        server = _server(TrackingLevel.NONE)
+        channel = server.channels["#chan"]
+        self.assertEqual(set(channel.users), {"bot"})
+        self.assertEqual(channel.users["bot"].modes, {"o", "v"})
+        self.assertEqual(channel.modes, {"l": "10"})
+        self.assertEqual(set(server.users), {"bot"})
+        self.assertFalse(server.want_who("#chan"))
+
+    def test_part(self):
+        server = _server(TrackingLevel.NONE)
+        server._dispatch_line(tokenise(":bot!u@h PART #chan"))
+        self.assertEqual(server.channels, {})
+        self.assertEqual(server._tracking, {})
@@ -0,0 +1,76 @@
+import asyncio, unittest
+from ircrobots.transport import LineTransport, TCPTransport
+
+class LineTransportTest(unittest.TestCase):
+    def _read(self, chunks, buffer_size=65536, into=False):
+        async def _test():
+            async def _serve(reader, writer):
+                for chunk in chunks:
+                    writer.write(chunk)
+                    await writer.drain()
+                    await asyncio.sleep(0.01)
+                writer.close()
+            server = await asyncio.start_server(_serve, "127.0.0.1", 0)
+            port   = server.sockets[0].getsockname()[1]
+
+            reader, writer = await LineTransport(buffer_size).connect(
+                "127.0.0.1", port, None)
+            reads = []
+            buffer = memoryview(bytearray(1024))
+            while True:
+                if into:
+                    data = bytes(buffer[:await reader.readinto(buffer)])
+                else:
+                    data = await reader.read(1024)
+                if not data:
+                    break
+                reads.append(data)
+
+            await writer.close()
+            server.close()
+            await server.wait_closed()
+            return reads
+        return asyncio.run(_test())
+
+    def test_whole_lines(self):
+        reads = self._read([b"PING :a", b"bc\r\nPI", b"NG :def\r\n"])
+        self.assertEqual(reads, [b"PING :abc\r\n", b"PING :def\r\n"])
+
+    def test_readinto(self):
+        reads = self._read([b"PING :a", b"bc\r\nPI", b"NG :def\r\n"],
+            into=True)
+        self.assertEqual(reads, [b"PING :abc\r\n", b"PING :def\r\n"])
+
+    def test_eof_partial(self):
+        reads = self._read([b"PING :a\r\nPING :b"])
+        self.assertEqual(reads, [b"PING :a\r\n", b"PING :b"])
+
+    def test_full_buffer(self):
+        # a line longer than the buffer still gets through, in pieces
+        reads = self._read([b"x"*20, b"\r\n"], buffer_size=16)
+        self.assertEqual(b"".join(reads), b"x"*20+b"\r\n")
+
+class TCPReaderTestUnread(unittest.TestCase):
+    def test(self):
+        # what's come in but not been read from us is given back, once
+        async def _test():
+            async def _serve(reader, writer):
+                writer.write(b"PING :a\r\nPING :b\r\n")
+                await writer.drain()
+                writer.close()
+            server = await asyncio.start_server(_serve, "127.0.0.1", 0)
+            port   = server.sockets[0].getsockname()[1]
+
+            reader, writer = await TCPTransport().connect(
+                "127.0.0.1", port, None)
+            first = await reader.read(9)
+            await asyncio.sleep(0.05)
+            unread = (reader.unread(), reader.unread())
+
+            await writer.close()
+            server.close()
+            await server.wait_closed()
+            return first, unread
+        first, unread = asyncio.run(_test())
+        self.assertEqual(first, b"PING :a\r\n")
+        self.assertEqual(unread, (b"PING :b\r\n", b""))
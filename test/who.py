@@ -0,0 +1,71 @@
+import asyncio, unittest
+from typing        import List
+from unittest.mock import patch
+from irctokens import Line
+from ircrobots.params import ConnectionParams, ThrottleProfile
+from .ircd import FakeIRCd, run_bot, wait_until
+
+def _joiner(members: int, who: bool):
+    # answers JOIN with NAMES of `members` users, and WHO if `who`
+    def _handler(ircd: FakeIRCd, line: Line):
+        if line.command == "JOIN":
+            for chan in line.params[0].split(","):
+                nicks = " ".join(f"{chan[1:]}{i}" for i in range(members))
+                ircd.push(f":bot!u@h JOIN {chan}",
+                    f":srv 353 bot = {chan} :bot {nicks}",
+                    f":srv 366 bot {chan} :end")
+        elif line.command == "WHO" and who:
+            ircd.push(f":srv 315 bot {line.params[0]} :end")
+    return _handler
+
+def _sync(ircd: FakeIRCd, autojoin: List[str], count: int, **kwargs):
+    # channels we sent a WHO for once `count` have been, and sync progress
+    async def _test(bot):
+        params = ConnectionParams("bot", "localhost", 6667, tls=None,
+            autojoin=autojoin, throttle=ThrottleProfile(100, 1, 100),
+            **kwargs)
+        await bot.add_server("test", params, transport=ircd)
+        await wait_until(lambda: len(_whos(ircd)) >= count)
+        await asyncio.sleep(0.05)
+        return _whos(ircd), bot.servers["test"].sync_progress()
+    return run_bot(_test)
+
+def _whos(ircd: FakeIRCd) -> List[str]:
+    return [l.params[0] for l in ircd.lines
+        if l.command == "WHO" and l.params[0].startswith("#")]
+
+class WhoTestWindow(unittest.TestCase):
+    def test_answered(self):
+        ircd = FakeIRCd(handler=_joiner(1, True))
+        whos, progress = _sync(ircd, ["#a", "#b", "#c"], 3, who_window=1)
+        self.assertEqual(whos, ["#a", "#b", "#c"])
+        self.assertEqual(progress, (3, 3))
+
+    def test_budget(self):
+        # sizes are guessed from NAMES, so two big channels don't fit in
+        # the budget together
+        ircd = FakeIRCd(handler=_joiner(50, False))
+        whos, _ = _sync(ircd, ["#a", "#b"], 1, who_budget=6000)
+        self.assertEqual(whos, ["#a"])
+
+    def test_timeout(self):
+        # a WHO that never ends doesn't hold up the rest
+        ircd = FakeIRCd(handler=_joiner(1, False))
+        with patch("ircrobots.server.WHO_TIMEOUT", 0.05):
+            whos, progress = _sync(ircd, ["#a", "#b"], 2, who_window=1)
+        self.assertEqual(whos, ["#a", "#b"])
+        self.assertEqual(progress, (0, 2))
+
+class WhoTestLabel(unittest.TestCase):
+    def test(self):
+        # WHOs are labeled when the server has labeled-response
+        joiner = _joiner(1, True)
+        def _handler(ircd: FakeIRCd, line: Line):
+            if line.command == "CAP" and line.params[0] == "REQ":
+                ircd.push(f":srv CAP * ACK :{line.params[1]}")
+            joiner(ircd, line)
+        ircd = FakeIRCd(caps="labeled-response", handler=_handler)
+        _sync(ircd, ["#a"], 1)
+        who = [l for l in ircd.lines
+            if l.command == "WHO" and l.params[0] == "#a"][0]
+        self.assertIn("label", who.tags or {})